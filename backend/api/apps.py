@@ -1,7 +1,50 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
     verbose_name = 'Апишечка'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+
+        from recipes.image_variants import image_fields
+        from recipes.models import Ingredient, Recipe
+        from recipes.signals import bulk_data_loaded, recipe_ingredients_changed
+
+        from . import response_cache
+        from .images import on_image_saved
+
+        for model in image_fields():
+            post_save.connect(
+                on_image_saved,
+                sender=model,
+                dispatch_uid=f'image_variants_on_{model.__name__}_save',
+            )
+
+        for signal, event in ((post_save, 'save'), (post_delete, 'delete')):
+            signal.connect(
+                response_cache.on_recipe_changed,
+                sender=Recipe,
+                dispatch_uid=f'response_cache_on_recipe_{event}',
+            )
+            signal.connect(
+                response_cache.on_ingredient_changed,
+                sender=Ingredient,
+                dispatch_uid=f'response_cache_on_ingredient_{event}',
+            )
+        recipe_ingredients_changed.connect(
+            response_cache.on_recipe_ingredients_changed,
+            dispatch_uid='response_cache_on_ingredients_change',
+        )
+        bulk_data_loaded.connect(
+            response_cache.on_bulk_data_loaded,
+            dispatch_uid='response_cache_on_bulk_load',
+        )
+        post_save.connect(
+            response_cache.on_user_saved,
+            sender=get_user_model(),
+            dispatch_uid='response_cache_on_user_save',
+        )
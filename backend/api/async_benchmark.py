@@ -0,0 +1,359 @@
+"""
+Сравнение синхронных и асинхронных версий горячих эндпоинтов.
+
+Работает по набору данных из api.benchmark (seed_dataset) в тестовой БД.
+
+Сначала проверяется равенство ответов: один и тот же план запросов
+(чтение, переключатели, ошибки) проходит через DRF-вью роутера и через
+api.async_views, каждый раз в откатываемой транзакции. Статус, тело и
+заголовки Content-Type/Allow/WWW-Authenticate/Vary должны совпасть.
+
+Затем — конкурентный прогон. Синхронный стек обслуживает запросы в
+`workers` потоках, как столько же синхронных воркеров gunicorn.
+Асинхронный — корутинами в одном цикле событий, не больше
+`concurrency` одновременно; каждый запрос в своём
+ThreadSensitiveContext, как под ASGIHandler. Опция `db_latency`
+добавляет задержку к каждому SQL, изображая сеть до БД.
+"""
+import asyncio
+import importlib
+import queue
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from asgiref.sync import ThreadSensitiveContext, async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import clear_url_caches, reverse
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Recipe
+
+from .benchmark import User, _percentile
+
+COMPARED_HEADERS = ("Content-Type", "Allow", "WWW-Authenticate", "Vary")
+MISSING_ID = 10 ** 9
+
+
+def _reload_urls():
+    from . import urls
+
+    importlib.reload(urls)
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+@contextmanager
+def api_views(use_async):
+    """URLconf с async-версиями эндпоинтов или без них."""
+    try:
+        with override_settings(API_ASYNC_VIEWS=use_async):
+            _reload_urls()
+            yield
+    finally:
+        _reload_urls()
+
+
+@contextmanager
+def db_latency(seconds):
+    """Задержка перед каждым SQL во всех соединениях, включая новые."""
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        # Соединение открывается уже внутри execute_wrapper() middleware,
+        # который на выходе снимает последнюю обёртку, — встаём первыми.
+        connection.execute_wrappers.insert(0, wrapper)
+
+    if not seconds:
+        yield
+        return
+    current = connections.all()
+    for connection in current:
+        connection.execute_wrappers.append(wrapper)
+    connection_created.connect(install)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+        for connection in current:
+            connection.execute_wrappers.remove(wrapper)
+
+
+class Call:
+    """Запрос к API: метод, путь и токен (None — аноним)."""
+
+    def __init__(self, method, path, token=None, accept=None):
+        self.method = method
+        self.path = path
+        self.token = token
+        self.accept = accept
+
+    def headers(self):
+        headers = {}
+        if self.token is not None:
+            headers["Authorization"] = f"Token {self.token}"
+        if self.accept is not None:
+            headers["Accept"] = self.accept
+        return headers
+
+    def __str__(self):
+        return f"{self.method.upper()} {self.path}"
+
+
+def user_token(user):
+    return Token.objects.get_or_create(user=user)[0].key
+
+
+def parity_plan(context):
+    """Запросы, на которых сравниваются стеки; идут по порядку."""
+    token = user_token(context["user"])
+    recipe = reverse("recipe-detail", args=(context["recipe_id"],))
+    missing = reverse("recipe-detail", args=(MISSING_ID,))
+    favorite = reverse("recipe-favorite", args=(context["recipe_id"],))
+    cart = reverse("recipe-shopping-cart", args=(context["recipe_id"],))
+    subscribe = reverse(
+        "users-subscribe", args=(context["unfollowed_author_id"],))
+    ingredients = reverse("ingredient-list")
+    return [
+        Call("get", ingredients),
+        Call("get", f"{ingredients}?name=а"),
+        Call("get", recipe),
+        Call("get", recipe, token),
+        Call("get", f"{recipe}?author={context['author_id']}"),
+        Call("get", missing, token),
+        Call("get", recipe, "invalid"),
+        Call("get", recipe, accept="text/html"),
+        Call("post", favorite),
+        *(
+            Call(method, path, token)
+            for path in (favorite, cart, f"{subscribe}?recipes_limit=2")
+            for method in ("post", "post", "delete", "delete")
+        ),
+        Call("post", reverse("recipe-favorite", args=(MISSING_ID,)), token),
+        Call("post", reverse("users-subscribe", args=(context["user"].pk,)),
+             token),
+        Call("put", favorite, token),
+    ]
+
+
+def _snapshot(response):
+    return (
+        response.status_code,
+        response.content,
+        *(response.get(header) for header in COMPARED_HEADERS),
+    )
+
+
+def _run_sync_plan(plan):
+    client = Client()
+    return [
+        _snapshot(getattr(client, call.method)(
+            call.path, headers=call.headers()))
+        for call in plan
+    ]
+
+
+async def _run_async_plan(plan):
+    client = AsyncClient()
+    return [
+        _snapshot(await getattr(client, call.method)(
+            call.path, headers=call.headers()))
+        for call in plan
+    ]
+
+
+def _rolled_back(run):
+    with transaction.atomic():
+        result = run()
+        transaction.set_rollback(True)
+    return result
+
+
+def check_parity(context):
+    """Список расхождений ответов синхронного и асинхронного стеков."""
+    plan = parity_plan(context)
+    with api_views(use_async=False):
+        expected = _rolled_back(lambda: _run_sync_plan(plan))
+    with api_views(use_async=True):
+        actual = _rolled_back(
+            lambda: async_to_sync(_run_async_plan)(plan))
+    fields = ("status", "body", *COMPARED_HEADERS)
+    mismatches = []
+    for call, sync_result, async_result in zip(plan, expected, actual):
+        diff = {
+            field: {"sync": _printable(left), "async": _printable(right)}
+            for field, left, right in zip(fields, sync_result, async_result)
+            if left != right
+        }
+        if diff:
+            mismatches.append({"request": str(call), "diff": diff})
+    return {"checked": len(plan), "mismatches": mismatches}
+
+
+def _printable(value):
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")[:200]
+    return value
+
+
+def _favorite_pairs(count):
+    """
+    (токен, путь) избранного для разных пользователей и рецептов,
+    которых у них в избранном нет: пока одновременных задач не больше
+    `count`, переключатели не мешают друг другу.
+    """
+    pairs = []
+    users = User.objects.filter(
+        username__startswith="bench").order_by("pk")[:count]
+    for user in users:
+        recipe_id = (
+            Recipe.objects.exclude(favorites__user=user)
+            .order_by("pk").values_list("pk", flat=True).first()
+        )
+        pairs.append((
+            user_token(user),
+            reverse("recipe-favorite", args=(recipe_id,)),
+        ))
+    return pairs
+
+
+def concurrency_scenarios(context, pairs):
+    """{имя: функция(i) -> список Call} — запросы i-й задачи."""
+    token = user_token(context["user"])
+    recipe = reverse("recipe-detail", args=(context["recipe_id"],))
+    ingredients = reverse("ingredient-list")
+
+    def toggle(index):
+        pair_token, path = pairs[index % len(pairs)]
+        return [Call("post", path, pair_token),
+                Call("delete", path, pair_token)]
+
+    return {
+        "ingredient-list": lambda index: [
+            Call("get", f"{ingredients}?name=а", token)],
+        "recipe-detail": lambda index: [Call("get", recipe, token)],
+        "recipe-favorite POST+DELETE": toggle,
+    }
+
+
+def _summary(timings, statuses, errors, elapsed):
+    return {
+        "p50_ms": round(statistics.median(timings), 3) if timings else None,
+        "p95_ms": round(_percentile(timings, 95), 3) if timings else None,
+        "rps": round(len(timings) / elapsed, 1) if elapsed else None,
+        "status": {str(code): count for code, count in sorted(
+            statuses.items())},
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+    }
+
+
+def run_sync(calls_for, requests, workers):
+    """`requests` задач в `workers` потоках через WSGI-клиент."""
+    tasks = queue.Queue()
+    for index in range(requests):
+        tasks.put(index)
+    timings, statuses, errors = [], {}, []
+    lock = threading.Lock()
+
+    def worker():
+        client = Client()
+        try:
+            while True:
+                try:
+                    index = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                for call in calls_for(index):
+                    started = time.perf_counter()
+                    try:
+                        response = getattr(client, call.method)(
+                            call.path, headers=call.headers())
+                    except Exception as error:
+                        with lock:
+                            errors.append(repr(error))
+                        continue
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        timings.append(elapsed * 1000)
+                        statuses[response.status_code] = (
+                            statuses.get(response.status_code, 0) + 1)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return _summary(timings, statuses, errors,
+                    time.perf_counter() - started)
+
+
+async def _run_async(calls_for, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    client = AsyncClient()
+    timings, statuses, errors = [], {}, []
+
+    async def task(index):
+        async with semaphore, ThreadSensitiveContext():
+            for call in calls_for(index):
+                started = time.perf_counter()
+                try:
+                    response = await getattr(client, call.method)(
+                        call.path, headers=call.headers())
+                except Exception as error:
+                    errors.append(repr(error))
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+                statuses[response.status_code] = (
+                    statuses.get(response.status_code, 0) + 1)
+            # Тестовый клиент не закрывает соединения после запроса.
+            await sync_to_async(connections.close_all)()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(task(index) for index in range(requests)))
+    return _summary(timings, statuses, errors,
+                    time.perf_counter() - started)
+
+
+def run_async(calls_for, requests, concurrency):
+    """`requests` задач корутинами, не больше `concurrency` сразу."""
+    # Цикл событий — в отдельном потоке, как у uvicorn. Под
+    # async_to_sync весь thread-sensitive код шёл бы в вызвавший
+    # поток, а не в поток своего запроса.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(
+            asyncio.run, _run_async(calls_for, requests, concurrency)
+        ).result()
+
+
+def run_async_benchmark(context, requests=200, workers=4, concurrency=32,
+                        latency=0.0, only=None):
+    """Отчёт: равенство ответов и конкурентные прогоны по сценариям."""
+    # Сравнение идёт по одному запросу, и счёт SQL в нём точный:
+    # превышение бюджета в любом из стеков роняет прогон.
+    with override_settings(QUERY_BUDGET_ENFORCE=True):
+        report = {"parity": check_parity(context)}
+    pairs = _favorite_pairs(max(workers, concurrency))
+    results = {}
+    with db_latency(latency):
+        for name, calls_for in concurrency_scenarios(context, pairs).items():
+            if only and not any(part in name for part in only):
+                continue
+            with api_views(use_async=False):
+                sync_result = run_sync(calls_for, requests, workers)
+            with api_views(use_async=True):
+                async_result = run_async(calls_for, requests, concurrency)
+            results[name] = {"sync": sync_result, "async": async_result}
+    report["concurrency"] = results
+    return report
@@ -0,0 +1,282 @@
+"""
+Асинхронные версии самых нагруженных эндпоинтов для ASGI.
+
+Поиск ингредиентов, карточка рецепта и переключатели избранного,
+корзины и подписки обслуживаются корутинами: токен проверяется и
+простые запросы идут через async ORM, а синхронные куски (сериализаторы
+с кэшем фрагментов, кэш ответов, изменения в transaction.atomic, как у
+синхронных вью) — одним sync_to_async на запрос.
+Пока БД или медленный клиент заняты, воркер обслуживает другие запросы.
+
+Ответы совпадают с DRF-вью: тот же JSON-рендерер и согласование
+формата, те же обработчик ошибок, тексты исключений и заголовки
+Allow/WWW-Authenticate. Остальные методы тех же URL и запросы с
+сессионной кукой (SessionAuthentication с CSRF-проверкой) отдаются
+исходной DRF-вью из роутера.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+from .instrumentation import measure
+from .loaders import attach_limited_recipes, parse_recipes_limit
+from .serializers import RecipeSummarySerializer, UserWithRecipesSerializer
+
+User = get_user_model()
+
+TOKEN_KEYWORD = TokenAuthentication.keyword.lower().encode()
+SUMMARY_FIELDS = ("id", "name", "image", "image_variants", "cooking_time")
+
+
+async def authenticate(request):
+    """TokenAuthentication DRF на async ORM: пользователь или аноним."""
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != TOKEN_KEYWORD:
+        # Сессионной куки нет (иначе запрос ушёл бы в синхронную вью),
+        # так что это аноним; обращение к сессии, как у
+        # SessionAuthentication, добавляет ответу тот же Vary: Cookie.
+        return await request.auser()
+    if len(auth) == 1:
+        raise exceptions.AuthenticationFailed(
+            _('Invalid token header. No credentials provided.'))
+    if len(auth) > 2:
+        raise exceptions.AuthenticationFailed(
+            _('Invalid token header. Token string should not contain '
+              'spaces.'))
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed(
+            _('Invalid token header. Token string should not contain '
+              'invalid characters.'))
+    try:
+        token = await Token.objects.select_related('user').aget(key=key)
+    except Token.DoesNotExist:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    return token.user
+
+
+def require_authenticated(request):
+    if not request.user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    return request.user
+
+
+def default_headers(fallback):
+    """Заголовки, которые DRF-вью `fallback` добавляет к каждому ответу."""
+    actions = dict(fallback.actions)
+    if 'get' in actions:
+        actions.setdefault('head', actions['get'])
+    view = fallback.cls(**fallback.initkwargs)
+    for method, action in actions.items():
+        setattr(view, method, getattr(view, action))
+    return view.default_response_headers
+
+
+def handle_exception(exc):
+    """Как APIView.handle_exception: ответ с ошибкой или повторный raise."""
+    if isinstance(exc, (exceptions.NotAuthenticated,
+                        exceptions.AuthenticationFailed)):
+        exc.auth_header = TokenAuthentication.keyword
+    response = api_settings.EXCEPTION_HANDLER(exc, {})
+    if response is None:
+        raise exc
+    response.exception = True
+    return response
+
+
+def make_viewset(fallback, request, args, kwargs):
+    """Экземпляр вьюсета `fallback` в том состоянии, что даёт dispatch()."""
+    view = fallback.cls(**fallback.initkwargs)
+    view.action_map = fallback.actions
+    view.action = fallback.actions.get(request.method.lower())
+    view.request = request
+    view.args = args
+    view.kwargs = kwargs
+    view.format_kwarg = None
+    view.headers = {}
+    return view
+
+
+def async_api_view(handler, fallback, methods):
+    """
+    Оборачивает корутину `handler(request, view, **kwargs) -> Response`
+    в Django-вью с аутентификацией, обработкой ошибок и рендерингом как
+    у DRF; `view` — экземпляр вьюсета для get_object(), контекста
+    сериализатора и т. п. Методы не из `methods` и сессионные запросы
+    уходят в синхронную `fallback` — вью роутера для того же URL.
+    """
+    headers = default_headers(fallback)
+    negotiator = DefaultContentNegotiation()
+    renderers = [
+        renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES]
+    run_fallback = sync_to_async(fallback)
+
+    @csrf_exempt
+    @wraps(handler)
+    async def view(request, *args, **kwargs):
+        if (
+            request.method not in methods
+            or settings.SESSION_COOKIE_NAME in request.COOKIES
+        ):
+            return await run_fallback(request, *args, **kwargs)
+
+        drf_request = Request(request)
+        renderer, media_type = renderers[0], renderers[0].media_type
+        try:
+            # Порядок как в APIView.initial(): согласование, затем токен.
+            renderer, media_type = negotiator.select_renderer(
+                drf_request, renderers)
+            drf_request.user = await authenticate(request)
+            response = await handler(
+                drf_request,
+                make_viewset(fallback, drf_request, args, kwargs),
+                *args, **kwargs,
+            )
+        except Exception as exc:
+            response = handle_exception(exc)
+
+        response.accepted_renderer = renderer
+        response.accepted_media_type = media_type
+        response.renderer_context = {
+            'request': drf_request, 'response': response,
+            'args': args, 'kwargs': kwargs,
+        }
+        for key, value in headers.items():
+            response[key] = value
+        # Отдаём готовое HttpResponse: у DRF Response есть render(),
+        # и Django отрендерил бы его ещё раз через sync_to_async.
+        with measure('render'):
+            response.render()
+        rendered = HttpResponse(
+            response.content, status=response.status_code)
+        if 'Content-Type' not in response:
+            del rendered['Content-Type']  # пустое тело, как у DRF
+        for key, value in response.items():
+            rendered[key] = value
+        return rendered
+
+    # Для бюджета запросов в ServerTimingMiddleware — как у as_view().
+    view.cls = fallback.cls
+    view.actions = fallback.actions
+    view.initkwargs = fallback.initkwargs
+    return view
+
+
+async def ingredient_list(request, view):
+    return Response(
+        await ingredient_index.asearch(request.query_params.get('name', ''))
+    )
+
+
+async def recipe_detail(request, view, pk):
+    # Кэш ответов, get_object() с фильтрами вьюсета и сериализатор с
+    # кэшем фрагментов синхронные — весь retrieve идёт одним переходом.
+    return await sync_to_async(view.retrieve)(request, pk=pk)
+
+
+@transaction.atomic
+def _toggle_relation(relation_model, user, recipe, adding):
+    """
+    Создаёт или удаляет связь одной транзакцией, как синхронная вью:
+    счётчики рецепта и on_commit-задачи идут вместе со связью.
+    Возвращает, изменилось ли что-нибудь.
+    """
+    if adding:
+        _, created = relation_model.objects.get_or_create(
+            user=user, recipe=recipe)
+        return created
+    relation = relation_model.objects.filter(user=user, recipe=recipe).first()
+    if relation is None:
+        return False
+    relation.delete()
+    return True
+
+
+def recipe_relation(relation_model):
+    """Переключатель избранного или корзины — handle_recipe_relation_toggle."""
+    async def toggle(request, view, pk):
+        user = require_authenticated(request)
+        recipe = await aget_object_or_404(
+            Recipe.objects.only(*SUMMARY_FIELDS), pk=pk)
+        adding = request.method == 'POST'
+        changed = await sync_to_async(_toggle_relation)(
+            relation_model, user, recipe, adding)
+
+        if adding:
+            if not changed:
+                raise ValidationError('Рецепт уже добавлен в список')
+            return Response(
+                RecipeSummarySerializer(
+                    recipe, context={'request': request}).data,
+                status=status.HTTP_201_CREATED,
+            )
+        if not changed:
+            raise ValidationError({'errors': 'Рецепт отсутствует в списке'})
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    toggle.__name__ = f'{relation_model.__name__.lower()}_toggle'
+    return toggle
+
+
+recipe_favorite = recipe_relation(Favorite)
+recipe_shopping_cart = recipe_relation(ShoppingCart)
+
+
+def _subscription_data(request, view, author):
+    attach_limited_recipes([author], parse_recipes_limit(request))
+    return UserWithRecipesSerializer(
+        author, context=view.get_serializer_context()).data
+
+
+@transaction.atomic
+def _toggle_subscription(request, view, user, author):
+    """Тело subscribe синхронной вью — в одной транзакции."""
+    following = user.following.filter(author=author)
+    if request.method == 'POST':
+        if following.exists():
+            raise ValidationError({'errors': 'Подписка уже существует'})
+        user.following.create(author=author)
+        return Response(_subscription_data(request, view, author),
+                        status=status.HTTP_201_CREATED)
+
+    if not following.exists():
+        raise ValidationError({'errors': 'Подписка не найдена'})
+    following.delete()
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+async def user_subscribe(request, view, id):
+    user = require_authenticated(request)
+    author = await aget_object_or_404(User.objects.all(), id=id)
+    if author == user:
+        raise ValidationError({'errors': 'Нельзя подписаться на себя'})
+    try:
+        return await sync_to_async(_toggle_subscription)(
+            request, view, user, author)
+    except IntegrityError:
+        # Подписку успел создать параллельный запрос.
+        raise ValidationError({'errors': 'Подписка уже существует'})
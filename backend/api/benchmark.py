@@ -0,0 +1,589 @@
+"""
+Бенчмарк эндпоинтов API.
+
+Во временной тестовой БД (SQLite или PostgreSQL — по DB_ENGINE)
+генерируется набор данных с фиксированным seed, затем каждый маршрут
+из api/urls.py прогоняется через тестовый клиент. Для каждого
+сценария считаются p50/p95 задержки и число SQL-запросов; отчёт —
+JSON, который удобно сравнивать между релизами.
+
+Маршруты без сценария попадают в отчёт в `uncovered`, так что новый
+эндпоинт не потеряется незаметно.
+
+Запросы идут с токеном в заголовке, как у фронтенда, поэтому поиск
+токена входит в число SQL. Максимум по сценарию сверяется с
+query_budgets его вьюсета; превышения собираются в `over_budget`.
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, reset_queries
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, resolve, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.derived import refresh_derived_data
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeLshBucket,
+    ShoppingCart,
+)
+from users.models import Follow
+
+from .instrumentation import is_cache_sql, is_transaction_sql
+from .middleware import view_query_budget
+
+User = get_user_model()
+
+PASSWORD = "benchmark-password-1"
+IMAGE = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA"
+    "DUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+BATCH_SIZE = 2000
+HTTP_METHODS = ("get", "post", "put", "patch", "delete")
+# Размер «плана питания» в сценариях пакетного избранного и корзины
+BULK_PLAN_SIZE = 20
+
+# Маршруты смены e-mail, активации и сброса пароля шлют письма
+# и требуют токенов из них — в бенчмарк они не входят.
+EXCLUDED_ROUTES = {
+    "users-activation",
+    "users-resend-activation",
+    "users-reset-password",
+    "users-reset-password-confirm",
+    "users-reset-username",
+    "users-reset-username-confirm",
+    "users-set-username",
+}
+
+
+def seed_dataset(users=200, recipes=1000, ingredients=500,
+                 ingredients_per_recipe=(3, 10), favorites_per_user=20,
+                 carts_per_user=5, follows_per_user=10, seed=42):
+    """
+    Заполняет БД пачками bulk_create и пересобирает производные данные.
+    При одинаковых параметрах и seed набор получается одинаковым.
+    """
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        [
+            User(
+                email=f"bench{index}@example.com",
+                username=f"bench{index}",
+                first_name=f"Имя{index}",
+                last_name=f"Фамилия{index}",
+                password=password,
+            )
+            for index in range(users)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(
+        User.objects.filter(username__startswith="bench")
+        .order_by("pk").values_list("pk", flat=True)
+    )
+    Ingredient.objects.bulk_create(
+        [
+            Ingredient(name=f"ингредиент {index}", measurement_unit="г")
+            for index in range(ingredients)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    ingredient_ids = list(
+        Ingredient.objects.order_by("pk").values_list("pk", flat=True)
+    )
+    Recipe.objects.bulk_create(
+        [
+            Recipe(
+                author_id=rng.choice(user_ids),
+                name=f"Рецепт {index}",
+                text=f"Описание рецепта {index}: нарезать, смешать, подать.",
+                cooking_time=rng.randint(5, 180),
+                image="recipes/images/benchmark.png",
+            )
+            for index in range(recipes)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    recipe_ids = list(Recipe.objects.order_by("pk").values_list("pk", flat=True))
+    RecipeIngredient.objects.bulk_create(
+        [
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in rng.sample(
+                ingredient_ids,
+                min(rng.randint(*ingredients_per_recipe), len(ingredient_ids)),
+            )
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    for model, per_user, targets, target_field in (
+        (Favorite, favorites_per_user, recipe_ids, "recipe_id"),
+        (ShoppingCart, carts_per_user, recipe_ids, "recipe_id"),
+        (Follow, follows_per_user, user_ids, "author_id"),
+    ):
+        model.objects.bulk_create(
+            [
+                model(user_id=user_id, **{target_field: target_id})
+                for user_id in user_ids
+                for target_id in rng.sample(
+                    targets, min(per_user, len(targets)))
+                if target_id != user_id or target_field != "author_id"
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+    refresh_derived_data()
+
+
+class Scenario:
+    """
+    Один замеряемый запрос.
+
+    `path` и `data` — функции от контекста бенчмарка; `setup` готовит
+    состояние перед каждым повтором и возвращает дополнение к
+    контексту, `undo` откатывает последствия после него. Ни то ни
+    другое в замер не входит.
+    """
+
+    def __init__(self, name, route, method, path, data=None, auth=True,
+                 setup=None, undo=None):
+        self.name = name
+        self.route = route
+        self.method = method
+        self.path = path
+        self.data = data
+        self.auth = auth
+        self.setup = setup
+        self.undo = undo
+
+
+def _recipe_body(context):
+    return {
+        "ingredients": [
+            {"id": ingredient_id, "amount": 10}
+            for ingredient_id in context["ingredient_ids"][:3]
+        ],
+        "name": "Рецепт из бенчмарка",
+        "text": "Смешать всё.",
+        "cooking_time": 15,
+        "image": IMAGE,
+    }
+
+
+def _created_recipe(context, client):
+    response = client.post(
+        reverse("recipe-list"), _recipe_body(context), format="json")
+    return {"new_recipe_id": response.data["id"]}
+
+
+def _delete_created_recipe(context, client, response):
+    Recipe.objects.filter(pk=response.data["id"]).delete()
+
+
+def _registered_user(context, client, response):
+    User.objects.filter(pk=response.data["id"]).delete()
+
+
+def _throwaway_user(context, client):
+    suffix = time.perf_counter_ns()
+    user = User.objects.create_user(
+        email=f"gone{suffix}@example.com", username=f"gone{suffix}",
+        first_name="Удаляемый", last_name="Пользователь", password=PASSWORD,
+    )
+    return {"user": user}
+
+
+def _uploaded_avatar(context, client):
+    client.put(reverse("users-avatar"), {"avatar": IMAGE}, format="json")
+    return {}
+
+
+def _profile_body(context):
+    user = context["user"]
+    return {
+        "email": user.email,
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+    }
+
+
+def _relation_toggle(route, target_key):
+    """POST и DELETE одной связи: каждый откатывает другой."""
+    def path(context):
+        return reverse(route, args=(context[target_key],))
+
+    def post(context, client):
+        client.post(path(context))
+        return {}
+
+    def delete(context, client, response=None):
+        client.delete(path(context))
+
+    return [
+        Scenario(f"{route} POST", route, "post", path,
+                 undo=delete),
+        Scenario(f"{route} DELETE", route, "delete", path,
+                 setup=post),
+    ]
+
+
+def _bulk_relation_toggle(route):
+    """Пакетные POST и DELETE плана из BULK_PLAN_SIZE рецептов."""
+    def path(context):
+        return reverse(route)
+
+    def data(context):
+        return {"recipes": context["bulk_recipe_ids"]}
+
+    def post(context, client):
+        client.post(path(context), data(context), format="json")
+        return {}
+
+    def delete(context, client, response=None):
+        client.delete(path(context), data(context), format="json")
+
+    return [
+        Scenario(f"{route} POST", route, "post", path, data=data,
+                 undo=delete),
+        Scenario(f"{route} DELETE", route, "delete", path, data=data,
+                 setup=post),
+    ]
+
+
+def build_scenarios():
+    ingredients_query = (
+        lambda context: ",".join(map(str, context["ingredient_ids"][:3]))
+    )
+    return [
+        Scenario("api-root", "api-root", "get",
+                 lambda context: reverse("api-root"), auth=False),
+        Scenario("users-list (аноним)", "users-list", "get",
+                 lambda context: reverse("users-list") + "?limit=10",
+                 auth=False),
+        Scenario("users-list", "users-list", "get",
+                 lambda context: reverse("users-list") + "?limit=10"),
+        Scenario(
+            "users-list POST (регистрация)", "users-list", "post",
+            lambda context: reverse("users-list"),
+            data=lambda context: {
+                "email": f"new{time.perf_counter_ns()}@example.com",
+                "username": f"new{time.perf_counter_ns()}",
+                "first_name": "Новый",
+                "last_name": "Пользователь",
+                "password": PASSWORD,
+            },
+            auth=False, undo=_registered_user,
+        ),
+        Scenario("users-detail (аноним)", "users-detail", "get",
+                 lambda context: reverse(
+                     "users-detail", args=(context["unfollowed_author_id"],)),
+                 auth=False),
+        Scenario("users-detail", "users-detail", "get",
+                 lambda context: reverse(
+                     "users-detail", args=(context["unfollowed_author_id"],))),
+        Scenario("users-detail PUT", "users-detail", "put",
+                 lambda context: reverse(
+                     "users-detail", args=(context["author_id"],)),
+                 data=_profile_body),
+        Scenario("users-detail PATCH", "users-detail", "patch",
+                 lambda context: reverse(
+                     "users-detail", args=(context["author_id"],)),
+                 data=lambda context: {"first_name": "Имя"}),
+        Scenario("users-detail DELETE", "users-detail", "delete",
+                 lambda context: reverse(
+                     "users-detail", args=(context["user"].pk,)),
+                 data=lambda context: {"current_password": PASSWORD},
+                 setup=_throwaway_user),
+        Scenario("users-me", "users-me", "get",
+                 lambda context: reverse("users-me")),
+        Scenario("users-subscriptions", "users-subscriptions", "get",
+                 lambda context: reverse("users-subscriptions")
+                 + "?recipes_limit=3"),
+        Scenario(
+            "users-set-password", "users-set-password", "post",
+            lambda context: reverse("users-set-password"),
+            data=lambda context: {
+                "current_password": PASSWORD, "new_password": PASSWORD,
+                "re_new_password": PASSWORD,
+            },
+        ),
+        Scenario(
+            "users-avatar PUT", "users-avatar", "put",
+            lambda context: reverse("users-avatar"),
+            data=lambda context: {"avatar": IMAGE},
+        ),
+        Scenario("users-avatar DELETE", "users-avatar", "delete",
+                 lambda context: reverse("users-avatar"),
+                 setup=_uploaded_avatar),
+        *_relation_toggle("users-subscribe", "unfollowed_author_id"),
+        Scenario("ingredient-list", "ingredient-list", "get",
+                 lambda context: reverse("ingredient-list") + "?name=ингр",
+                 auth=False),
+        Scenario("ingredient-detail", "ingredient-detail", "get",
+                 lambda context: reverse(
+                     "ingredient-detail", args=(context["ingredient_ids"][0],)),
+                 auth=False),
+        Scenario("recipe-list (аноним)", "recipe-list", "get",
+                 lambda context: reverse("recipe-list") + "?limit=10",
+                 auth=False),
+        Scenario("recipe-list", "recipe-list", "get",
+                 lambda context: reverse("recipe-list") + "?limit=10"),
+        Scenario("recipe-list cursor", "recipe-list", "get",
+                 lambda context: reverse("recipe-list") + "?cursor="),
+        Scenario("recipe-list is_favorited", "recipe-list", "get",
+                 lambda context: reverse("recipe-list")
+                 + "?is_favorited=1&limit=10"),
+        Scenario("recipe-list author", "recipe-list", "get",
+                 lambda context: reverse("recipe-list")
+                 + f"?author={context['author_id']}&limit=10"),
+        Scenario("recipe-list ingredients", "recipe-list", "get",
+                 lambda context: reverse("recipe-list")
+                 + f"?ingredients={ingredients_query(context)}"
+                 "&ingredients_match=any&limit=10"),
+        Scenario("recipe-list search", "recipe-list", "get",
+                 lambda context: reverse("recipe-list")
+                 + "?search=рецепт&limit=10"),
+        Scenario("recipe-list POST", "recipe-list", "post",
+                 lambda context: reverse("recipe-list"),
+                 data=_recipe_body, undo=_delete_created_recipe),
+        Scenario("recipe-detail (аноним)", "recipe-detail", "get",
+                 lambda context: reverse(
+                     "recipe-detail", args=(context["recipe_id"],)),
+                 auth=False),
+        Scenario("recipe-detail", "recipe-detail", "get",
+                 lambda context: reverse(
+                     "recipe-detail", args=(context["recipe_id"],))),
+        Scenario("recipe-detail PATCH", "recipe-detail", "patch",
+                 lambda context: reverse(
+                     "recipe-detail", args=(context["own_recipe_id"],)),
+                 data=_recipe_body),
+        Scenario("recipe-detail PUT", "recipe-detail", "put",
+                 lambda context: reverse(
+                     "recipe-detail", args=(context["own_recipe_id"],)),
+                 data=_recipe_body),
+        Scenario("recipe-detail DELETE", "recipe-detail", "delete",
+                 lambda context: reverse(
+                     "recipe-detail", args=(context["new_recipe_id"],)),
+                 setup=_created_recipe),
+        *_relation_toggle("recipe-favorite", "recipe_id"),
+        *_relation_toggle("recipe-shopping-cart", "recipe_id"),
+        *_bulk_relation_toggle("recipe-favorite-bulk"),
+        *_bulk_relation_toggle("recipe-shopping-cart-bulk"),
+        Scenario("recipe-get-link", "recipe-get-link", "get",
+                 lambda context: reverse(
+                     "recipe-get-link", args=(context["recipe_id"],))),
+        Scenario("recipe-similar (аноним)", "recipe-similar", "get",
+                 lambda context: reverse(
+                     "recipe-similar", args=(context["similar_recipe_id"],)),
+                 auth=False),
+        Scenario("recipe-similar", "recipe-similar", "get",
+                 lambda context: reverse(
+                     "recipe-similar", args=(context["similar_recipe_id"],))),
+        Scenario("recipe-pantry", "recipe-pantry", "get",
+                 lambda context: reverse("recipe-pantry")
+                 + f"?ingredients={ingredients_query(context)}"
+                 "&min_coverage=0.3"),
+        Scenario("recipe-feed", "recipe-feed", "get",
+                 lambda context: reverse("recipe-feed") + "?limit=10"),
+        Scenario("recipe-download-shopping-cart",
+                 "recipe-download-shopping-cart", "get",
+                 lambda context: reverse("recipe-download-shopping-cart")),
+        Scenario("recipe-link", "recipe-link", "get",
+                 lambda context: reverse(
+                     "recipe-link", args=(context["recipe_id"],)),
+                 auth=False),
+        Scenario(
+            "login", "login", "post", lambda context: reverse("login"),
+            data=lambda context: {
+                "email": context["user"].email, "password": PASSWORD,
+            },
+            auth=False,
+        ),
+        Scenario("logout", "logout", "post",
+                 lambda context: reverse("logout")),
+    ]
+
+
+def api_routes():
+    """{(имя маршрута, метод)} всех маршрутов api/urls.py."""
+    from api import urls
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                yield pattern
+
+    routes = set()
+    for pattern in walk(urls.urlpatterns):
+        actions = getattr(pattern.callback, "actions", None)
+        view_class = getattr(pattern.callback, "cls", None)
+        routes.update(
+            (pattern.name, method) for method in HTTP_METHODS
+            if (method in actions if actions is not None
+                else hasattr(view_class, method))
+        )
+    return routes
+
+
+def benchmark_context():
+    """Пользователь, от имени которого идут запросы, и id нужных объектов."""
+    user = (
+        User.objects.filter(username__startswith="bench")
+        .exclude(recipes=None).exclude(carts=None)
+        .order_by("pk").first()
+    )
+    followed = Follow.objects.filter(user=user).values("author_id")
+    untouched = (
+        Recipe.objects.exclude(favorites__user=user)
+        .exclude(in_carts__user=user).order_by("pk")
+    )
+    recipe_id = untouched.exclude(author=user).first().pk
+    shared_buckets = (
+        RecipeLshBucket.objects.values("bucket")
+        .annotate(recipes=Count("recipe_id")).filter(recipes__gt=1)
+        .values("bucket")
+    )
+    return {
+        "user": user,
+        "author_id": user.pk,
+        "own_recipe_id": user.recipes.order_by("pk").first().pk,
+        "recipe_id": recipe_id,
+        "bulk_recipe_ids": list(
+            untouched.exclude(pk=recipe_id)
+            .values_list("pk", flat=True)[:BULK_PLAN_SIZE]),
+        "unfollowed_author_id": (
+            User.objects.exclude(pk=user.pk).exclude(pk__in=followed)
+            .order_by("pk").first().pk
+        ),
+        "ingredient_ids": list(
+            RecipeIngredient.objects.filter(recipe__author=user)
+            .order_by("pk").values_list("ingredient_id", flat=True)
+        ),
+        # Рецепт с непустым списком похожих: у пустого меньше запросов
+        "similar_recipe_id": (
+            RecipeLshBucket.objects
+            .filter(bucket__in=shared_buckets)
+            .order_by("recipe_id").values_list("recipe_id", flat=True)
+            .first()
+        ) or recipe_id,
+    }
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def _authenticate(client, user):
+    """Токен в заголовке, как у фронтенда: его поиск входит в замер."""
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+
+def _view_queries(captured):
+    """SQL вью так, как их считает бюджет (см. api.instrumentation)."""
+    return sum(
+        not is_transaction_sql(query["sql"])
+        and not is_cache_sql(query["sql"], connection)
+        for query in captured.captured_queries
+    )
+
+
+def run_scenario(scenario, context, iterations, warmup):
+    client = APIClient()
+    timings, queries, statuses = [], [], set()
+    budget = None
+    for step in range(warmup + iterations):
+        step_context = context
+        # Токен пересоздаётся на каждом шаге: logout его удаляет.
+        if scenario.auth:
+            _authenticate(client, context["user"])
+        if scenario.setup is not None:
+            step_context = {**context, **scenario.setup(context, client)}
+            if scenario.auth and step_context["user"] != context["user"]:
+                _authenticate(client, step_context["user"])
+        data = scenario.data(step_context) if scenario.data else None
+        path = scenario.path(step_context)
+        if budget is None:
+            budget = view_query_budget(
+                resolve(path.partition("?")[0]).func, scenario.method)
+        # Журнал запросов соединения ограничен по длине: без сброса
+        # счётчик перестаёт расти на длинных прогонах.
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            if scenario.method == "get":
+                response = client.get(path)
+            else:
+                response = getattr(client, scenario.method)(
+                    path, data, format="json")
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        # Считаем до undo: его запрос сбрасывает журнал соединения
+        # (request_started), и срез captured_queries съехал бы на него.
+        view_queries = _view_queries(captured)
+        if scenario.undo is not None:
+            scenario.undo(step_context, client, response)
+        if step < warmup:
+            continue
+        timings.append(elapsed * 1000)
+        queries.append(view_queries)
+        statuses.add(response.status_code)
+    return {
+        "route": scenario.route,
+        "method": scenario.method.upper(),
+        "status": sorted(statuses),
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(_percentile(timings, 95), 3),
+        "queries": round(statistics.median(queries)),
+        "queries_max": max(queries),
+        "query_budget": budget[1] if budget else None,
+    }
+
+
+def run_benchmark(iterations=20, warmup=3, only=None):
+    """Прогоняет сценарии по уже заполненной БД и возвращает отчёт."""
+    context = benchmark_context()
+    scenarios = build_scenarios()
+    results = {}
+    for scenario in scenarios:
+        if only and not any(part in scenario.name for part in only):
+            continue
+        results[scenario.name] = run_scenario(
+            scenario, context, iterations, warmup)
+    covered = {
+        (scenario.route, scenario.method) for scenario in scenarios
+    }
+    uncovered = sorted(
+        f"{method.upper()} {route}"
+        for route, method in api_routes() - covered
+        if route not in EXCLUDED_ROUTES
+    )
+    over_budget = {
+        name: f"{result['queries_max']} > {result['query_budget']}"
+        for name, result in results.items()
+        if result["query_budget"] is not None
+        and result["queries_max"] > result["query_budget"]
+    }
+    return {"endpoints": results, "uncovered": uncovered,
+            "over_budget": over_budget}
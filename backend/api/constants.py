@@ -2,4 +2,14 @@
 
 # Константы для валидации полей
 MIN_VALUE = 1
-MAX_VALUE = 32000
\ No newline at end of file
+MAX_VALUE = 32000
+
+# Минимальная доля ингредиентов рецепта, которая должна быть в «кладовой»
+PANTRY_MIN_COVERAGE = 0.5
+
+# Сколько похожих рецептов отдавать по умолчанию и максимум
+SIMILAR_RECIPES_LIMIT = 10
+SIMILAR_RECIPES_MAX_LIMIT = 50
+
+# Сколько рецептов можно передать в пакетное избранное/корзину за раз
+BULK_RELATION_MAX_RECIPES = 100
@@ -0,0 +1,281 @@
+import codecs
+import csv
+import hashlib
+import io
+import zlib
+from pathlib import Path
+
+from .truetype import load_font
+
+# Сколько строк тянуть с сервера БД за один fetch серверного курсора
+ITERATOR_CHUNK_SIZE = 500
+
+
+class ShoppingListExporter:
+    """
+    Базовый потоковый экспортёр списка покупок.
+
+    Принимает ленивые итераторы ингредиентов и рецептов и отдаёт
+    байтовые куски по мере чтения курсора, не собирая отчёт в памяти.
+    """
+
+    extension = 'txt'
+    content_type = 'text/plain; charset=utf-8'
+
+    def __init__(self, username, created_at):
+        self.username = username
+        self.created_at = created_at
+
+    def filename(self):
+        stamp = self.created_at.strftime('%Y%m%d_%H%M%S')
+        return f'shopping_list_{stamp}.{self.extension}'
+
+    def lines(self, ingredients, recipes):
+        yield f'Список покупок пользователя {self.username}'
+        yield f"Дата создания: {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
+        yield ''
+        yield '=== ПРОДУКТЫ ==='
+        for index, ingredient in enumerate(ingredients, start=1):
+            yield (
+                f"{index}. {ingredient['name'].title()} "
+                f"({ingredient['measurement_unit']}) — "
+                f"{ingredient['total_amount']}"
+            )
+        yield ''
+        yield '=== РЕЦЕПТЫ ==='
+        for recipe in recipes:
+            yield f'• {recipe.name} (автор: {recipe.author.username})'
+
+    def stream(self, ingredients, recipes):
+        first = True
+        for line in self.lines(ingredients, recipes):
+            yield (line if first else f'\n{line}').encode('utf-8')
+            first = False
+
+
+class CsvShoppingListExporter(ShoppingListExporter):
+    """CSV-таблица продуктов; BOM нужен, чтобы Excel понял UTF-8."""
+
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def stream(self, ingredients, recipes):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(('Продукт', 'Ед. измерения', 'Количество'))
+        yield codecs.BOM_UTF8 + buffer.getvalue().encode('utf-8')
+        for ingredient in ingredients:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow((
+                ingredient['name'],
+                ingredient['measurement_unit'],
+                ingredient['total_amount'],
+            ))
+            yield buffer.getvalue().encode('utf-8')
+
+
+FONT_PATH = Path(__file__).resolve().parent / 'fonts' / 'DejaVuSans.ttf'
+TO_UNICODE_BLOCK = 100
+
+
+def _subset_tag(glyphs):
+    """Префикс имени подмножества шрифта: шесть заглавных букв."""
+    digest = hashlib.md5(repr(sorted(glyphs)).encode()).digest()
+    return ''.join(chr(ord('A') + byte % 26) for byte in digest[:6])
+
+
+class PdfShoppingListExporter(ShoppingListExporter):
+    """
+    Простой PDF без внешних зависимостей.
+
+    Страницы пишутся по мере чтения данных, смещения объектов
+    запоминаются для таблицы xref, а дерево страниц, шрифт и каталог
+    дописываются в конце. Текст набран встроенным подмножеством DejaVu
+    Sans (api/fonts): стандартный Helvetica без кириллицы показывал
+    список пустым или точками в зависимости от просмотрщика. Строки
+    кодируются номерами глифов (/Identity-H), а /ToUnicode оставляет
+    текст копируемым и доступным для поиска.
+    """
+
+    extension = 'pdf'
+    content_type = 'application/pdf'
+    lines_per_page = 50
+    font_size = 11
+    leading = 15
+    page_width, page_height = 595, 842
+    margin = 50
+
+    PAGES_ID, CATALOG_ID, FONT_ID = 1, 2, 3
+
+    def stream(self, ingredients, recipes):
+        self._offsets = {}
+        self._position = 0
+        self._next_id = 4
+        self._font = load_font(str(FONT_PATH))
+        self._missing = self._font.glyph('?')
+        self._chars = {}
+        page_ids = []
+
+        yield self._emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+        page = []
+        for line in self.lines(ingredients, recipes):
+            page.append(line)
+            if len(page) == self.lines_per_page:
+                yield from self._page(page, page_ids)
+                page = []
+        if page or not page_ids:
+            yield from self._page(page, page_ids)
+
+        yield from self._font_objects()
+        kids = ' '.join(f'{page_id} 0 R' for page_id in page_ids)
+        yield self._object(self.PAGES_ID, (
+            f'<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>'
+        ).encode('ascii'))
+        yield self._object(self.CATALOG_ID, (
+            f'<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>'
+        ).encode('ascii'))
+        yield self._xref()
+
+    def _emit(self, chunk):
+        self._position += len(chunk)
+        return chunk
+
+    def _object(self, object_id, body):
+        self._offsets[object_id] = self._position
+        return self._emit(
+            f'{object_id} 0 obj\n'.encode('ascii') + body + b'\nendobj\n'
+        )
+
+    def _stream_object(self, object_id, data, **entries):
+        entries = ''.join(f' /{key} {value}' for key, value in entries.items())
+        return self._object(
+            object_id,
+            f'<< /Length {len(data)}{entries} >>\nstream\n'.encode('ascii')
+            + data + b'\nendstream',
+        )
+
+    def _allocate(self, count):
+        first = self._next_id
+        self._next_id += count
+        return range(first, first + count)
+
+    def _encode(self, line):
+        """Строка как hex-последовательность двухбайтовых номеров глифов."""
+        glyphs = []
+        for char in line:
+            glyph = self._font.glyph(char) or self._missing
+            self._chars.setdefault(glyph, char)
+            glyphs.append(f'{glyph:04X}')
+        return f"<{''.join(glyphs)}>".encode('ascii')
+
+    def _page(self, lines, page_ids):
+        top = self.page_height - self.margin
+        content = [
+            f'BT /F1 {self.font_size} Tf {self.leading} TL '
+            f'{self.margin} {top} Td'.encode('ascii')
+        ]
+        content += [self._encode(line) + b' Tj T*' for line in lines]
+        content.append(b'ET')
+
+        content_id, page_id = self._allocate(2)
+        page_ids.append(page_id)
+        yield self._stream_object(content_id, b'\n'.join(content))
+        yield self._object(page_id, (
+            f'<< /Type /Page /Parent {self.PAGES_ID} 0 R '
+            f'/MediaBox [0 0 {self.page_width} {self.page_height}] '
+            f'/Resources << /Font << /F1 {self.FONT_ID} 0 R >> >> '
+            f'/Contents {content_id} 0 R >>'
+        ).encode('ascii'))
+
+    def _scaled(self, value):
+        return round(value * 1000 / self._font.units_per_em)
+
+    def _font_objects(self):
+        """Type0-шрифт с подмножеством глифов, набранных на страницах."""
+        font = self._font
+        glyphs = sorted(self._chars)
+        name = f'{_subset_tag(glyphs)}+DejaVuSans'
+        cid_id, descriptor_id, file_id, unicode_id = self._allocate(4)
+
+        yield self._object(self.FONT_ID, (
+            f'<< /Type /Font /Subtype /Type0 /BaseFont /{name} '
+            f'/Encoding /Identity-H /DescendantFonts [{cid_id} 0 R] '
+            f'/ToUnicode {unicode_id} 0 R >>'
+        ).encode('ascii'))
+        widths = ' '.join(
+            f'{glyph} [{font.width(glyph)}]' for glyph in glyphs)
+        yield self._object(cid_id, (
+            f'<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{name} '
+            '/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) '
+            '/Supplement 0 >> '
+            f'/FontDescriptor {descriptor_id} 0 R /CIDToGIDMap /Identity '
+            f'/W [{widths}] >>'
+        ).encode('ascii'))
+        bbox = ' '.join(str(self._scaled(value)) for value in font.bbox)
+        ascent = self._scaled(font.ascent)
+        yield self._object(descriptor_id, (
+            f'<< /Type /FontDescriptor /FontName /{name} /Flags 32 '
+            f'/FontBBox [{bbox}] /ItalicAngle 0 /Ascent {ascent} '
+            f'/Descent {self._scaled(font.descent)} /CapHeight {ascent} '
+            f'/StemV 80 /FontFile2 {file_id} 0 R >>'
+        ).encode('ascii'))
+        subset = font.subset(glyphs)
+        yield self._stream_object(
+            file_id, zlib.compress(subset),
+            Filter='/FlateDecode', Length1=len(subset))
+        yield self._stream_object(unicode_id, self._to_unicode(glyphs))
+
+    def _to_unicode(self, glyphs):
+        rows = [
+            '/CIDInit /ProcSet findresource begin',
+            '12 dict begin',
+            'begincmap',
+            '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) '
+            '/Supplement 0 >> def',
+            '/CMapName /Adobe-Identity-UCS def',
+            '/CMapType 2 def',
+            '1 begincodespacerange',
+            '<0000> <FFFF>',
+            'endcodespacerange',
+        ]
+        for start in range(0, len(glyphs), TO_UNICODE_BLOCK):
+            block = glyphs[start:start + TO_UNICODE_BLOCK]
+            rows.append(f'{len(block)} beginbfchar')
+            rows += [
+                f"<{glyph:04X}> "
+                f"<{self._chars[glyph].encode('utf-16-be').hex().upper()}>"
+                for glyph in block
+            ]
+            rows.append('endbfchar')
+        rows += [
+            'endcmap',
+            'CMapName currentdict /CMap defineresource pop',
+            'end',
+            'end',
+        ]
+        return '\n'.join(rows).encode('ascii')
+
+    def _xref(self):
+        size = self._next_id
+        rows = ['xref', f'0 {size}', '0000000000 65535 f ']
+        rows += [
+            f'{self._offsets[object_id]:010d} 00000 n '
+            for object_id in range(1, size)
+        ]
+        rows += [
+            'trailer',
+            f'<< /Size {size} /Root {self.CATALOG_ID} 0 R >>',
+            'startxref',
+            str(self._position),
+            '%%EOF',
+        ]
+        return ('\n'.join(rows) + '\n').encode('ascii')
+
+
+SHOPPING_LIST_EXPORTERS = {
+    'txt': ShoppingListExporter,
+    'csv': CsvShoppingListExporter,
+    'pdf': PdfShoppingListExporter,
+}
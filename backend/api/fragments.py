@@ -0,0 +1,77 @@
+"""
+Кэш сериализованных фрагментов рецептов.
+
+Представление рецепта (состав, текст, автор, картинки) одинаково для
+всех пользователей, кроме флагов is_favorited, is_in_shopping_cart и
+author.is_subscribed. Фрагмент без учёта пользователя кладётся в кэш
+под ключом из версий рецепта и автора (те же, что у кэша ответов),
+поэтому после изменения рецепта или профиля автора старый фрагмент
+просто перестаёт находиться. Флаги заполняются на каждый запрос.
+
+Страница рецептов обходится двумя запросами к кэшу (версии и
+фрагменты); в БД и сериализатор идут только промахи.
+FRAGMENT_CACHE_TTL ограничивает жизнь фрагмента на случай гонок;
+как и кэш ответов, без общего кэша (CACHE_URL) он выключен.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .response_cache import (
+    AUTHOR_VERSION_KEY,
+    EPOCH_KEY,
+    RECIPE_VERSION_KEY,
+)
+
+FRAGMENT_KEY = "api:fragment:recipe:{}:{}:{}:{}:{}"
+
+
+def _host_digest(request):
+    # В фрагменте абсолютные URL картинок, они зависят от хоста
+    if request is None:
+        return ""
+    return hashlib.md5(
+        f"{request.scheme}://{request.get_host()}".encode("utf-8")
+    ).hexdigest()[:12]
+
+
+def cached_fragments(request, recipes, build):
+    """
+    Возвращает {recipe.pk: фрагмент} для рецептов.
+
+    `build(recipes)` строит фрагменты промахов и возвращает их списком
+    в том же порядке; они сразу кладутся в кэш.
+    """
+    ttl = settings.FRAGMENT_CACHE_TTL
+    if ttl <= 0:
+        return dict(zip((recipe.pk for recipe in recipes), build(recipes)))
+
+    version_keys = [EPOCH_KEY]
+    for recipe in recipes:
+        version_keys.append(RECIPE_VERSION_KEY.format(recipe.pk))
+        version_keys.append(AUTHOR_VERSION_KEY.format(recipe.author_id))
+    versions = cache.get_many(version_keys)
+    epoch = versions.get(EPOCH_KEY, 0)
+    host = _host_digest(request)
+    keys = {
+        recipe.pk: FRAGMENT_KEY.format(
+            host, epoch, recipe.pk,
+            versions.get(RECIPE_VERSION_KEY.format(recipe.pk), 0),
+            versions.get(AUTHOR_VERSION_KEY.format(recipe.author_id), 0),
+        )
+        for recipe in recipes
+    }
+    cached = cache.get_many(keys.values())
+    fragments = {
+        pk: cached[key] for pk, key in keys.items() if key in cached
+    }
+
+    missing = [recipe for recipe in recipes if recipe.pk not in fragments]
+    if missing:
+        built = dict(zip((recipe.pk for recipe in missing), build(missing)))
+        cache.set_many(
+            {keys[pk]: fragment for pk, fragment in built.items()}, ttl
+        )
+        fragments.update(built)
+    return fragments
@@ -0,0 +1,149 @@
+"""
+Фоновая нарезка изображений на варианты размеров.
+
+Запрос сохраняет только оригинал загруженного файла. Миниатюра, средний
+размер и WebP-копия строятся в пуле потоков после коммита транзакции,
+а их пути записываются в JSON-поле модели (`image_variants` у рецепта,
+`avatar_variants` у пользователя) вместе с именем исходника, из которого
+они сделаны. Сериализаторы отдают эту карту, чтобы списки и админка
+грузили маленькие картинки; читают её хелперы recipes.image_variants.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from recipes.image_variants import image_fields
+from recipes.models import Recipe
+
+from . import response_cache
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS = {
+    "thumbnail": {"size": (150, 150), "format": None},
+    "medium": {"size": (600, 600), "format": None},
+    "webp": {"size": None, "format": "WEBP"},
+}
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                thread_name_prefix="image-variants",
+            )
+        return _executor
+
+
+def render_variant(data, spec):
+    """Возвращает (байты, расширение) варианта по спецификации."""
+    with Image.open(BytesIO(data)) as source:
+        image_format = spec["format"] or source.format or "PNG"
+        image = ImageOps.exif_transpose(source)
+        if spec["size"]:
+            image.thumbnail(spec["size"])
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = BytesIO()
+        image.save(buffer, image_format, quality=85)
+    return buffer.getvalue(), FORMAT_EXTENSIONS.get(image_format, "png")
+
+
+def variant_path(source_name, variant, extension):
+    source = PurePosixPath(source_name)
+    return str(source.parent / "variants" / f"{source.stem}_{variant}.{extension}")
+
+
+def delete_variant_files(storage, variants):
+    for variant, path in variants.items():
+        if variant != "source" and path:
+            storage.delete(path)
+
+
+def generate_variants(model, pk, source_name, old_variants):
+    """Строит все варианты для `source_name` и записывает их в модель."""
+    file_field, variants_field = image_fields()[model]
+    storage = model._meta.get_field(file_field).storage
+    with storage.open(source_name) as source:
+        data = source.read()
+
+    variants = {"source": source_name}
+    for variant, spec in IMAGE_VARIANTS.items():
+        content, extension = render_variant(data, spec)
+        variants[variant] = storage.save(
+            variant_path(source_name, variant, extension),
+            ContentFile(content),
+        )
+
+    updated = model.objects.filter(
+        pk=pk, **{file_field: source_name}
+    ).update(**{variants_field: variants})
+    if updated:
+        if model is Recipe:
+            response_cache.recipe_changed(pk)
+        else:
+            response_cache.author_changed(pk)
+    # Пока мы работали, картинку могли заменить — тогда наши файлы лишние.
+    delete_variant_files(storage, old_variants if updated else variants)
+
+
+def _generate_logged(model, pk, source_name, old_variants):
+    """
+    generate_variants() без исключений наружу: данные уже сохранены,
+    а без вариантов API отдаёт оригинал.
+    """
+    try:
+        generate_variants(model, pk, source_name, old_variants)
+    except Exception:
+        logger.exception(
+            "Не удалось построить варианты %s для %s#%s",
+            source_name, model.__name__, pk,
+        )
+
+
+def _run_in_worker(model, pk, source_name, old_variants):
+    try:
+        _generate_logged(model, pk, source_name, old_variants)
+    finally:
+        connection.close()
+
+
+def schedule_variants(model, pk, source_name, old_variants):
+    if settings.IMAGE_PROCESSING_WORKERS <= 0:
+        _generate_logged(model, pk, source_name, old_variants)
+        return
+    get_executor().submit(_run_in_worker, model, pk, source_name, old_variants)
+
+
+def on_image_saved(sender, instance, **kwargs):
+    """post_save: ставит нарезку в очередь, если исходник сменился."""
+    file_field, variants_field = image_fields()[sender]
+    source_name = getattr(instance, file_field).name or ""
+    variants = getattr(instance, variants_field) or {}
+    if variants.get("source", "") == source_name:
+        return
+
+    if not source_name:
+        storage = sender._meta.get_field(file_field).storage
+        sender.objects.filter(pk=instance.pk).update(**{variants_field: {}})
+        setattr(instance, variants_field, {})
+        delete_variant_files(storage, variants)
+        return
+
+    transaction.on_commit(
+        lambda: schedule_variants(sender, instance.pk, source_name, variants)
+    )
+
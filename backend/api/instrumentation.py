@@ -0,0 +1,126 @@
+"""
+Замеры запроса: SQL, сериализация, рендеринг.
+
+RequestMetrics живёт в contextvar на время запроса. SQL считается
+обёрткой execute_wrapper на всех соединениях (работает и без DEBUG),
+время сериализаторов — примесью к корневым сериализаторам API, время
+рендеринга — в middleware вокруг response.render().
+
+Запросы к таблицам DatabaseCache (CACHE_URL=db://) — это обращения
+к кэшу, а не работа вью: они идут в отдельную метрику cache-db и не
+расходуют бюджет SQL. BEGIN, который SQLite шлёт отдельным запросом
+(на PostgreSQL его нет), входит во время БД, но не в число запросов.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework import serializers
+
+_current = ContextVar("request_metrics", default=None)
+
+# Управление транзакцией, которое не считается запросом вью: точки
+# сохранения появляются от одного того, что вызов обёрнут во внешний
+# atomic (тесты, откатываемые прогоны бенчмарков).
+TRANSACTION_SQL = frozenset({"BEGIN", "COMMIT", "ROLLBACK"})
+SAVEPOINT_SQL = ("SAVEPOINT ", "RELEASE SAVEPOINT ", "ROLLBACK TO SAVEPOINT ")
+
+
+def is_transaction_sql(sql):
+    return sql in TRANSACTION_SQL or sql.startswith(SAVEPOINT_SQL)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Вью сделала больше SQL-запросов, чем объявлено в query_budgets."""
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.db_time = 0.0
+        self.timings = {}
+        self._depth = {}
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            if is_cache_sql(sql, context["connection"]):
+                self.add("cache-db", duration)
+            else:
+                self.db_time += duration
+                if not is_transaction_sql(sql):
+                    self.queries.append((duration, sql))
+
+    @contextmanager
+    def measure(self, name):
+        """Копит время блока под именем; вложенные замеры не удваиваются."""
+        depth = self._depth.get(name, 0)
+        self._depth[name] = depth + 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth[name] = depth
+            if not depth:
+                self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def top_queries(self, limit):
+        return sorted(self.queries, key=lambda query: -query[0])[:limit]
+
+
+def is_cache_sql(sql, connection):
+    """Обращается ли SQL к таблице DatabaseCache."""
+    return any(
+        connection.ops.quote_name(options["LOCATION"]) in sql
+        for options in settings.CACHES.values()
+        if options["BACKEND"].endswith(".DatabaseCache")
+    )
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def collect_metrics():
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def measure(name):
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.measure(name):
+        yield
+
+
+class TimedSerializerMixin:
+    """Засчитывает построение `.data` в метрику serialize."""
+
+    @property
+    def data(self):
+        with measure("serialize"):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
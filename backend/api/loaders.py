@@ -0,0 +1,32 @@
+from django.db.models import Prefetch, prefetch_related_objects
+
+from recipes.models import Recipe
+
+
+def parse_recipes_limit(request):
+    """Достаёт `recipes_limit` из query-параметров, None если не задан."""
+    recipes_limit = request.query_params.get("recipes_limit")
+    if recipes_limit and recipes_limit.isdigit():
+        return int(recipes_limit)
+    return None
+
+
+def attach_limited_recipes(authors, recipes_limit=None):
+    """
+    Пакетно подгружает авторам их последние рецепты в `limited_recipes`.
+
+    Срез внутри Prefetch Django превращает в один запрос с
+    ROW_NUMBER() OVER (PARTITION BY author_id ORDER BY pub_date DESC),
+    поэтому стоимость не зависит ни от числа авторов, ни от лимита.
+    """
+    recipes = Recipe.objects.only(
+        "id", "name", "image", "image_variants", "cooking_time",
+        "author_id", "pub_date",
+    ).order_by("-pub_date", "-id")
+    if recipes_limit is not None:
+        recipes = recipes[:recipes_limit]
+    prefetch_related_objects(
+        authors,
+        Prefetch("recipes", queryset=recipes, to_attr="limited_recipes"),
+    )
+    return authors
@@ -0,0 +1,120 @@
+import json
+import tempfile
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from api.benchmark import run_benchmark, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк всех маршрутов API на сгенерированных данных во временной "
+        "тестовой БД (движок — из DB_ENGINE). Печатает JSON с p50/p95 "
+        "и числом SQL-запросов по каждому сценарию"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--recipes", type=int, default=1000)
+        parser.add_argument("--ingredients", type=int, default=500)
+        parser.add_argument("--favorites", type=int, default=20,
+                            help="Избранных рецептов на пользователя.")
+        parser.add_argument("--carts", type=int, default=5,
+                            help="Рецептов в корзине на пользователя.")
+        parser.add_argument("--follows", type=int, default=10,
+                            help="Подписок на пользователя.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--iterations", type=int, default=20,
+                            help="Замеров на сценарий.")
+        parser.add_argument("--warmup", type=int, default=3,
+                            help="Прогревочных запросов на сценарий.")
+        parser.add_argument(
+            "--only", action="append",
+            help="Гонять только сценарии, в имени которых есть подстрока.",
+        )
+        parser.add_argument(
+            "--disable-caches", action="store_true",
+            help="Выключить кэш ответов и фрагментов рецептов "
+                 "(без CACHE_URL он выключен и так).",
+        )
+        parser.add_argument("--keepdb", action="store_true",
+                            help="Не удалять тестовую БД после прогона.")
+        parser.add_argument("--output", help="Записать отчёт в файл.")
+
+    def handle(self, *args, **options):
+        overrides = {
+            # Картинки из сценариев — во временный каталог, нарезка и
+            # раскладка по лентам в запросе: фоновые потоки мешали бы
+            # замерам и тестовой БД.
+            "MEDIA_ROOT": tempfile.mkdtemp(prefix="foodgram-benchmark-"),
+            "IMAGE_PROCESSING_WORKERS": 0,
+            "FEED_FANOUT_WORKERS": 0,
+            # Бюджеты SQL проверяются самой командой: превышения
+            # собираются в отчёт (over_budget) и роняют её в конце,
+            # а не обрывают сценарий на середине.
+            "QUERY_BUDGET_ENFORCE": False,
+        }
+        if options["disable_caches"]:
+            overrides.update(RESPONSE_CACHE_TTL=0, FRAGMENT_CACHE_TTL=0)
+
+        dataset = {
+            "users": options["users"],
+            "recipes": options["recipes"],
+            "ingredients": options["ingredients"],
+            "favorites_per_user": options["favorites"],
+            "carts_per_user": options["carts"],
+            "follows_per_user": options["follows"],
+            "seed": options["seed"],
+        }
+        setup_test_environment()
+        runner = DiscoverRunner(
+            verbosity=0, interactive=False, keepdb=options["keepdb"])
+        old_config = runner.setup_databases()
+        try:
+            with override_settings(**overrides):
+                self.stderr.write("Генерация данных...")
+                seed_dataset(**dataset)
+                self.stderr.write("Замеры...")
+                report = run_benchmark(
+                    iterations=options["iterations"],
+                    warmup=options["warmup"],
+                    only=options["only"],
+                )
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        report = {
+            "meta": {
+                "database": connection.vendor,
+                "django": django.get_version(),
+                "json_engine": settings.API_JSON_ENGINE,
+                "caches": not options["disable_caches"],
+                "iterations": options["iterations"],
+                "warmup": options["warmup"],
+                "dataset": dataset,
+            },
+            **report,
+        }
+        rendered = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                output.write(rendered + "\n")
+        else:
+            self.stdout.write(rendered)
+        if report["over_budget"]:
+            raise CommandError(
+                "Превышены бюджеты SQL: " + ", ".join(
+                    f"{name} ({excess})"
+                    for name, excess in report["over_budget"].items()
+                )
+            )
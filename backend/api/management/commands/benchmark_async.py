@@ -0,0 +1,110 @@
+import json
+import tempfile
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from api.async_benchmark import run_async_benchmark
+from api.benchmark import benchmark_context, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает синхронные DRF-вью и их async-версии (API_ASYNC_VIEWS) "
+        "во временной тестовой БД: проверяет, что ответы совпадают, и "
+        "гоняет конкурентную нагрузку — потоки против корутин"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--recipes", type=int, default=500)
+        parser.add_argument("--ingredients", type=int, default=300)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--requests", type=int, default=200,
+                            help="Задач на сценарий и стек.")
+        parser.add_argument(
+            "--workers", type=int, default=4,
+            help="Потоков синхронного стека (воркеров gunicorn).",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=32,
+            help="Одновременных запросов асинхронного стека. Не больше "
+                 "--users, иначе переключатели избранного пересекутся.",
+        )
+        parser.add_argument(
+            "--db-latency", type=float, default=0,
+            help="Задержка перед каждым SQL, мс (сеть до БД).",
+        )
+        parser.add_argument(
+            "--only", action="append",
+            help="Гонять только сценарии, в имени которых есть подстрока.",
+        )
+        parser.add_argument("--keepdb", action="store_true",
+                            help="Не удалять тестовую БД после прогона.")
+        parser.add_argument("--output", help="Записать отчёт в файл.")
+
+    def handle(self, *args, **options):
+        overrides = {
+            "MEDIA_ROOT": tempfile.mkdtemp(prefix="foodgram-benchmark-"),
+            "IMAGE_PROCESSING_WORKERS": 0,
+            "FEED_FANOUT_WORKERS": 0,
+        }
+        dataset = {
+            "users": options["users"],
+            "recipes": options["recipes"],
+            "ingredients": options["ingredients"],
+            "seed": options["seed"],
+        }
+        setup_test_environment()
+        runner = DiscoverRunner(
+            verbosity=0, interactive=False, keepdb=options["keepdb"])
+        old_config = runner.setup_databases()
+        try:
+            with override_settings(**overrides):
+                self.stderr.write("Генерация данных...")
+                seed_dataset(**dataset)
+                self.stderr.write("Замеры...")
+                report = run_async_benchmark(
+                    benchmark_context(),
+                    requests=options["requests"],
+                    workers=options["workers"],
+                    concurrency=options["concurrency"],
+                    latency=options["db_latency"] / 1000,
+                    only=options["only"],
+                )
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        report = {
+            "meta": {
+                "database": connection.vendor,
+                "django": django.get_version(),
+                "requests": options["requests"],
+                "workers": options["workers"],
+                "concurrency": options["concurrency"],
+                "db_latency_ms": options["db_latency"],
+                "dataset": dataset,
+            },
+            **report,
+        }
+        rendered = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                output.write(rendered + "\n")
+        else:
+            self.stdout.write(rendered)
+
+        mismatches = report["parity"]["mismatches"]
+        if mismatches:
+            raise CommandError(
+                f"Ответы async-вью расходятся с синхронными: "
+                f"{len(mismatches)} из {report['parity']['checked']}"
+            )
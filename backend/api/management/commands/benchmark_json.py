@@ -0,0 +1,132 @@
+import io
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from api.renderers import ORJSONParser, ORJSONRenderer
+from api.serializers import RecipeDetailSerializer
+from recipes.models import Recipe
+
+ENGINES = {
+    "stdlib": (JSONRenderer, JSONParser),
+    "orjson": (ORJSONRenderer, ORJSONParser),
+}
+
+
+def _median_us(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1e6
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает штатный JSONRenderer/JSONParser DRF с orjson "
+        "на страницах RecipeDetailSerializer из текущей БД"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-size", type=int, default=api_settings.PAGE_SIZE,
+            help="Рецептов на странице.",
+        )
+        parser.add_argument(
+            "--pages", type=int, default=20,
+            help="Сколько страниц сериализовать.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=50,
+            help="Повторов замера на каждую страницу.",
+        )
+        parser.add_argument(
+            "--json", action="store_true",
+            help="Вывести результат в JSON.",
+        )
+
+    def handle(self, *args, **options):
+        page_size = options["page_size"]
+        recipes = list(
+            Recipe.objects
+            .select_related("author")
+            .prefetch_related("recipe_ingredients__ingredient")
+            .defer("search_vector")
+            .order_by("-pub_date", "-id")[:page_size * options["pages"]]
+        )
+        if not recipes:
+            raise CommandError(
+                "В БД нет рецептов: сначала загрузите данные.")
+        pages = [
+            {
+                "count": len(recipes),
+                "next": None,
+                "previous": None,
+                "results": RecipeDetailSerializer(
+                    recipes[start:start + page_size], many=True
+                ).data,
+            }
+            for start in range(0, len(recipes), page_size)
+        ]
+
+        results = {}
+        rendered = {}
+        for engine, (renderer_class, parser_class) in ENGINES.items():
+            renderer, parser = renderer_class(), parser_class()
+            rendered[engine] = [renderer.render(page) for page in pages]
+            results[engine] = {
+                "render_us": statistics.median(
+                    _median_us(lambda page=page: renderer.render(page),
+                               options["repeat"])
+                    for page in pages
+                ),
+                "parse_us": statistics.median(
+                    _median_us(
+                        lambda body=body: parser.parse(io.BytesIO(body)),
+                        options["repeat"],
+                    )
+                    for body in rendered[engine]
+                ),
+                "bytes": statistics.median(
+                    len(body) for body in rendered[engine]),
+            }
+
+        identical = all(
+            json.loads(stdlib) == json.loads(fast)
+            for stdlib, fast in zip(rendered["stdlib"], rendered["orjson"])
+        )
+        report = {
+            "pages": len(pages),
+            "page_size": page_size,
+            "identical_output": identical,
+            "engines": results,
+            "render_speedup": round(
+                results["stdlib"]["render_us"]
+                / results["orjson"]["render_us"], 2),
+            "parse_speedup": round(
+                results["stdlib"]["parse_us"]
+                / results["orjson"]["parse_us"], 2),
+        }
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"Страниц: {len(pages)} по {page_size} рецептов, "
+            f"вывод совпадает: {'да' if identical else 'НЕТ'}"
+        )
+        for engine, row in results.items():
+            self.stdout.write(
+                f"{engine:>7}: рендер {row['render_us']:9.1f} мкс, "
+                f"разбор {row['parse_us']:9.1f} мкс, {row['bytes']} байт"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Ускорение: рендер ×{report['render_speedup']}, "
+            f"разбор ×{report['parse_speedup']}"
+        ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from api.images import generate_variants
+from recipes.image_variants import image_fields
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит миниатюры, средний размер и WebP для уже загруженных "
+        "фото рецептов и аватаров"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Пересобрать варианты, даже если они актуальны.",
+        )
+
+    def handle(self, *args, **options):
+        for model, (file_field, variants_field) in image_fields().items():
+            built = 0
+            objects = (
+                model.objects
+                .exclude(**{file_field: ""})
+                .exclude(**{f"{file_field}__isnull": True})
+                .values_list("pk", file_field, variants_field)
+            )
+            for pk, source_name, variants in objects.iterator():
+                variants = variants or {}
+                if not options["force"] and variants.get("source") == source_name:
+                    continue
+                try:
+                    generate_variants(model, pk, source_name, variants)
+                except Exception as exc:
+                    self.stderr.write(f"{model.__name__}#{pk}: {exc}")
+                    continue
+                built += 1
+            self.stdout.write(self.style.SUCCESS(
+                f"{model._meta.verbose_name_plural}: обработано {built}."
+            ))
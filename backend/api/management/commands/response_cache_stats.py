@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from api import response_cache
+
+
+class Command(BaseCommand):
+    help = "Показывает попадания и промахи кэша ответов рецептов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Обнулить счётчики после вывода.",
+        )
+
+    def handle(self, *args, **options):
+        counts = response_cache.stats()
+        total = counts["hits"] + counts["misses"]
+        ratio = counts["hits"] / total if total else 0
+        self.stdout.write(
+            f"Попаданий: {counts['hits']}, промахов: {counts['misses']}, "
+            f"доля попаданий: {ratio:.1%}"
+        )
+        if options["reset"]:
+            response_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Счётчики обнулены."))
@@ -0,0 +1,210 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.db import connections
+
+from .instrumentation import (
+    QueryBudgetExceeded,
+    collect_metrics,
+    current_metrics,
+)
+
+logger = logging.getLogger("api.timing")
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.1f}"
+
+
+def pool_stats():
+    """[(алиас, статистика psycopg_pool)] соединений с пулом."""
+    result = []
+    for connection in connections.all():
+        if not hasattr(connection, "pool_stats"):
+            continue
+        stats = connection.pool_stats()
+        if stats:
+            result.append((connection.alias, stats))
+    return result
+
+
+def _pool_usage(stats):
+    busy = stats["pool_size"] - stats["pool_available"]
+    return (
+        f"busy {busy}/{stats['pool_size']} max {stats['pool_max']}, "
+        f"waiting {stats['requests_waiting']}"
+    )
+
+
+def view_query_budget(view_func, method):
+    """(имя, лимит) из query_budgets вьюсета для метода или None."""
+    view_class = getattr(view_func, "cls", None)
+    actions = getattr(view_func, "actions", None) or {}
+    budgets = getattr(view_class, "query_budgets", None)
+    action = actions.get(method.lower())
+    if budgets and action in budgets:
+        return f"{view_class.__name__}.{action}", budgets[action]
+    return None
+
+
+class ServerTimingMiddleware:
+    """
+    Пишет в Server-Timing число SQL-запросов и время БД, сериализации,
+    рендеринга и всего запроса, время получения соединения (db-connect)
+    и загрузку пула соединений (db-pool); медленные запросы логирует
+    с самыми долгими SQL и статистикой пула.
+
+    Вьюсеты могут объявить `query_budgets = {действие: лимит}`. При
+    превышении лимита запрос падает с QueryBudgetExceeded, если включён
+    QUERY_BUDGET_ENFORCE (по умолчанию выключен; включают бенчмарки
+    и CI), иначе превышение только пишется в лог.
+
+    Работает и под ASGI без перехода в синхронный режим: там SQL
+    выполняется в потоке sync_to_async запроса, поэтому обёртки
+    соединений ставятся и снимаются в нём же.
+
+    У потоковых ответов (выгрузка списка покупок) основные запросы идут
+    уже при отдаче тела, когда заголовки отправлены. Server-Timing для
+    них показывает только работу до начала потока (desc db помечен
+    «before stream»), а замер продолжается в обёртке над телом: после
+    последнего фрагмента по всем SQL, включая потоковые, проверяются
+    порог медленного запроса и бюджет. Превышение бюджета здесь только
+    логируется: исключение оборвало бы уже начатое тело.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with collect_metrics() as metrics, ExitStack() as stack:
+            self.wrap_connections(stack, metrics)
+            response = self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        with collect_metrics() as metrics:
+            stack = ExitStack()
+            await sync_to_async(self.wrap_connections)(stack, metrics)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        return self.finish(request, response, metrics)
+
+    @staticmethod
+    def wrap_connections(stack, metrics):
+        for connection in connections.all():
+            stack.enter_context(
+                connection.execute_wrapper(metrics.execute_wrapper))
+
+    def finish(self, request, response, metrics):
+        total = metrics.total
+        streaming = response.streaming and not response.is_async
+        queries = f"{len(metrics.queries)} SQL"
+        if streaming:
+            queries += " before stream"
+        entries = [
+            f'db;dur={_ms(metrics.db_time)};desc="{queries}"',
+            *(
+                f"{name};dur={_ms(duration)}"
+                for name, duration in metrics.timings.items()
+            ),
+            f"total;dur={_ms(total)}",
+        ]
+        pools = pool_stats()
+        entries.extend(
+            f'db-pool;desc="{alias}: {_pool_usage(stats)}"'
+            for alias, stats in pools
+        )
+        response["Server-Timing"] = ", ".join(entries)
+        if streaming:
+            response.streaming_content = self.measure_stream(
+                request, response.streaming_content, metrics)
+            return response
+        self.report(request, metrics, pools)
+        return response
+
+    def measure_stream(self, request, content, metrics):
+        """Тело потокового ответа с замером SQL, выполненных при отдаче."""
+        with ExitStack() as stack:
+            self.wrap_connections(stack, metrics)
+            yield from content
+        self.report(request, metrics, pool_stats(), enforce=False)
+
+    def report(self, request, metrics, pools, enforce=True):
+        """
+        Лог медленного запроса и проверка бюджета; с enforce=False
+        превышение бюджета только логируется.
+        """
+        total = metrics.total
+        if total * 1000 >= settings.SLOW_REQUEST_MS:
+            logger.warning(
+                "Медленный запрос %s %s: %s мс, %d SQL за %s мс\n%s",
+                request.method, request.get_full_path(), _ms(total),
+                len(metrics.queries), _ms(metrics.db_time),
+                "\n".join([
+                    *(
+                        f"  {_ms(duration)} мс: {sql}"
+                        for duration, sql in metrics.top_queries(
+                            settings.SLOW_REQUEST_TOP_QUERIES)
+                    ),
+                    *(
+                        f"  пул {alias}: {_pool_usage(stats)}, ожидали "
+                        f"{stats.get('requests_queued', 0)} из "
+                        f"{stats.get('requests_num', 0)} запросов, всего "
+                        f"{stats.get('requests_wait_ms', 0)} мс, "
+                        f"таймаутов {stats.get('requests_errors', 0)}"
+                        for alias, stats in pools
+                    ),
+                ]),
+            )
+        self.check_budget(request, metrics, enforce)
+
+    def process_template_response(self, request, response):
+        # Вызывается до render(): рендеринг засекаем отсюда
+        # до post-render callback.
+        metrics = current_metrics()
+        if metrics is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: metrics.add(
+                    "render", time.perf_counter() - started)
+            )
+        return response
+
+    @staticmethod
+    def query_budget(request):
+        """(имя, лимит) для действия вьюсета из query_budgets или None."""
+        match = getattr(request, "resolver_match", None)
+        view_func = match.func if match is not None else None
+        return view_query_budget(view_func, request.method)
+
+    def check_budget(self, request, metrics, enforce=True):
+        budget = self.query_budget(request)
+        if budget is None:
+            return
+        view_name, budget = budget
+        if len(metrics.queries) <= budget:
+            return
+        message = (
+            f"{view_name}: {len(metrics.queries)} SQL-запросов "
+            f"при бюджете {budget} ({request.method} "
+            f"{request.get_full_path()})"
+        )
+        if enforce and settings.QUERY_BUDGET_ENFORCE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
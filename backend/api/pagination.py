@@ -0,0 +1,165 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class RecipeKeysetPagination(BasePagination):
+    """
+    Keyset-пагинация ленты рецептов по паре (pub_date, id).
+
+    Вместо OFFSET страница выбирается условием
+    (pub_date, id) < (курсор), которое обслуживается составным индексом,
+    поэтому N-я страница стоит столько же, сколько первая.
+    Общее количество не считается по умолчанию: `?count=exact`
+    делает COUNT(*), `?count=estimate` берёт оценку планировщика
+    PostgreSQL.
+    """
+
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    count_query_param = 'count'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        position, reverse = self.decode_cursor(request)
+
+        self.count = self.get_count(queryset, request)
+        results = self.fetch_page(queryset, position, reverse, self.limit + 1)
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = results
+        return results
+
+    def fetch_page(self, queryset, position, reverse, size):
+        """До `size` рецептов после курсора в порядке выдачи курсора."""
+        if position is not None:
+            pub_date, pk = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+                )
+        ordering = ('pub_date', 'pk') if reverse else ('-pub_date', '-pk')
+        return list(queryset.order_by(*ordering)[:size])
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(limit, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            position = (datetime.fromisoformat(payload['d']), int(payload['i']))
+            return position, bool(payload.get('r'))
+        except (ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, recipe, reverse=False):
+        payload = {'d': recipe.pub_date.isoformat(), 'i': recipe.pk}
+        if reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':')).encode()
+        ).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.order_by().count()
+        if mode == 'estimate':
+            return self.estimate_count(queryset)
+        return None
+
+    @staticmethod
+    def estimate_count(queryset):
+        """Оценка числа строк из EXPLAIN; None вне PostgreSQL."""
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            payload = {'count': self.count, **payload}
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {
+                    'type': 'string', 'nullable': True, 'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+
+class FeedKeysetPagination(RecipeKeysetPagination):
+    """
+    Та же keyset-пагинация, но страницы берутся из ленты подписок
+    (recipes.feed.Timeline) вместо QuerySet. Общее количество не
+    отдаётся: ради него пришлось бы сливать ленту с fan-out on read.
+    """
+
+    def fetch_page(self, timeline, position, reverse, size):
+        return timeline.page(position, reverse, size)
+
+    def get_count(self, timeline, request):
+        return None
@@ -0,0 +1,85 @@
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follow
+
+
+class RelationSnapshot:
+    """
+    Снимок связей текущего пользователя с объектами ответа.
+
+    Избранное, корзина и подписки подгружаются пачкой только для тех
+    рецептов и авторов, которые попали в ответ, после чего флаги
+    is_favorited / is_in_shopping_cart / is_subscribed проверяются
+    по множествам без дополнительных запросов.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.favorite_ids = set()
+        self.cart_ids = set()
+        self.following_ids = set()
+        self._loaded_recipe_ids = set()
+        self._loaded_author_ids = set()
+
+    @property
+    def is_active(self):
+        return bool(self.user and self.user.is_authenticated)
+
+    def load_recipes(self, recipe_ids):
+        """Подгружает избранное и корзину для ещё не известных рецептов."""
+        missing = set(recipe_ids) - self._loaded_recipe_ids
+        if not missing or not self.is_active:
+            return
+        self.favorite_ids.update(
+            Favorite.objects
+            .filter(user=self.user, recipe_id__in=missing)
+            .values_list('recipe_id', flat=True)
+        )
+        self.cart_ids.update(
+            ShoppingCart.objects
+            .filter(user=self.user, recipe_id__in=missing)
+            .values_list('recipe_id', flat=True)
+        )
+        self._loaded_recipe_ids |= missing
+
+    def load_authors(self, author_ids):
+        """Подгружает подписки для ещё не известных авторов."""
+        missing = set(author_ids) - self._loaded_author_ids
+        if not missing or not self.is_active:
+            return
+        self.following_ids.update(
+            Follow.objects
+            .filter(user=self.user, author_id__in=missing)
+            .order_by()
+            .values_list('author_id', flat=True)
+        )
+        self._loaded_author_ids |= missing
+
+    def is_favorited(self, recipe):
+        self.load_recipes((recipe.pk,))
+        return recipe.pk in self.favorite_ids
+
+    def is_in_shopping_cart(self, recipe):
+        self.load_recipes((recipe.pk,))
+        return recipe.pk in self.cart_ids
+
+    def is_subscribed(self, author):
+        self.load_authors((author.pk,))
+        return author.pk in self.following_ids
+
+
+def get_relation_snapshot(context):
+    """
+    Возвращает снимок связей, общий для всех сериализаторов запроса.
+
+    Снимок хранится на объекте запроса, поэтому вложенные и соседние
+    сериализаторы одного ответа используют одни и те же данные.
+    Без авторизованного пользователя возвращает None.
+    """
+    request = context.get('request')
+    if not request or not request.user.is_authenticated:
+        return None
+    snapshot = getattr(request, '_relation_snapshot', None)
+    if snapshot is None or snapshot.user != request.user:
+        snapshot = RelationSnapshot(request.user)
+        request._relation_snapshot = snapshot
+    return snapshot
@@ -0,0 +1,74 @@
+"""
+Рендерер и парсер JSON на orjson.
+
+orjson сериализует dict/list/str/datetime/UUID на C и сразу отдаёт
+байты, без промежуточной str и без вызова JSONEncoder.default на
+каждое Decimal. Вывод совпадает с JSONRenderer DRF: UTF-8 без
+экранирования, компактный, U+2028/U+2029 экранированы. Если в данных
+встретился тип, который orjson не знает (не строковые ключи словаря,
+произвольные итерируемые объекты), или клиент просит отступы, ответ
+рендерится штатным JSONRenderer.
+
+Включаются в settings через API_JSON_ENGINE=orjson.
+"""
+import datetime
+from decimal import Decimal
+
+import orjson
+from django.conf import settings
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+DUMPS_OPTIONS = orjson.OPT_UTC_Z
+
+# JSON допускает эти символы в строках, а JavaScript — нет
+LINE_SEPARATORS = (
+    (b"\xe2\x80\xa8", b"\\u2028"),
+    (b"\xe2\x80\xa9", b"\\u2029"),
+)
+
+
+def _default(obj):
+    """Типы, которые orjson не сериализует сам; как JSONEncoder в DRF."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    raise TypeError
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            # Отступы просят только при отладке, orjson умеет лишь 2 пробела
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            rendered = orjson.dumps(data, default=_default, option=DUMPS_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in rendered:
+                rendered = rendered.replace(raw, escaped)
+        return rendered
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            content = stream.read()
+            if encoding.lower().replace("-", "") != "utf8":
+                content = content.decode(encoding)
+            return orjson.loads(content)
+        except (orjson.JSONDecodeError, UnicodeDecodeError) as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -0,0 +1,141 @@
+"""
+Кэш ответов списка и карточки рецептов для анонимных GET-запросов.
+
+Ключ — вид ответа, хост со схемой (в ответе абсолютные URL картинок)
+и нормализованная строка запроса. Рядом с данными хранятся версии,
+от которых ответ зависит:
+
+* карточка — версия рецепта и версия его автора;
+* список — общая версия списка, которая растёт при любом сохранении
+  или удалении рецепта и при изменении профиля любого автора.
+
+Версии лежат в кэше под отдельными ключами и увеличиваются после
+коммита изменения. Запись, чьи версии устарели, считается промахом,
+так что инвалидация точечная и не требует перебора ключей. Смена
+каталога ингредиентов сдвигает общую эпоху — она входит во все ключи.
+RESPONSE_CACHE_TTL ограничивает жизнь записи на случай гонок.
+Версии повышает процесс, сделавший изменение, а читают все воркеры,
+поэтому кэш включается только с общим бэкендом (CACHE_URL).
+
+Попадания и промахи считаются в кэше (`response_cache_stats`),
+а ответ помечается заголовком X-Cache.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+RESPONSE_KEY = "api:response_cache:{}:{}:{}"
+EPOCH_KEY = "api:response_cache:epoch"
+LIST_VERSION_KEY = "api:response_cache:list"
+RECIPE_VERSION_KEY = "api:response_cache:recipe:{}"
+AUTHOR_VERSION_KEY = "api:response_cache:author:{}"
+HITS_KEY = "api:response_cache:hits"
+MISSES_KEY = "api:response_cache:misses"
+
+# Поля пользователя, которых нет в ответах с рецептами
+HIDDEN_USER_FIELDS = frozenset({"last_login", "password"})
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def _versions(keys):
+    values = cache.get_many(keys)
+    return {key: values.get(key, 0) for key in keys}
+
+
+def bump(*keys):
+    """Увеличивает версии после коммита текущей транзакции."""
+    transaction.on_commit(lambda: [_incr(key) for key in keys])
+
+
+def recipe_changed(recipe_id):
+    bump(RECIPE_VERSION_KEY.format(recipe_id), LIST_VERSION_KEY)
+
+
+def author_changed(user_id):
+    bump(AUTHOR_VERSION_KEY.format(user_id), LIST_VERSION_KEY)
+
+
+def stats():
+    counts = _versions([HITS_KEY, MISSES_KEY])
+    return {"hits": counts[HITS_KEY], "misses": counts[MISSES_KEY]}
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def normalized_query(request):
+    """Строка запроса с отсортированными параметрами и значениями."""
+    return urlencode(sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    ))
+
+
+def cached_response(request, kind, view, version_keys, data_version_keys=None):
+    """
+    Отдаёт ответ из кэша или строит его через `view()` и кэширует.
+
+    Версии `version_keys` читаются до построения ответа: если данные
+    поменяются во время запроса, запись сразу окажется устаревшей.
+    `data_version_keys(data)` добавляет версии, известные только
+    по готовому ответу (например, автор рецепта).
+    """
+    ttl = settings.RESPONSE_CACHE_TTL
+    if ttl <= 0 or request.method != "GET" or request.user.is_authenticated:
+        return view()
+
+    digest = hashlib.md5(
+        f"{request.scheme}://{request.get_host()}?{normalized_query(request)}"
+        .encode("utf-8")
+    ).hexdigest()
+    key = RESPONSE_KEY.format(cache.get(EPOCH_KEY, 0), kind, digest)
+
+    entry = cache.get(key)
+    if entry is not None and _versions(list(entry["versions"])) == entry["versions"]:
+        _incr(HITS_KEY)
+        return Response(entry["data"], headers={"X-Cache": "HIT"})
+
+    _incr(MISSES_KEY)
+    versions = _versions(version_keys)
+    response = view()
+    if response.status_code == 200:
+        if data_version_keys is not None:
+            versions.update(_versions(data_version_keys(response.data)))
+        cache.set(key, {"versions": versions, "data": response.data}, ttl)
+    response["X-Cache"] = "MISS"
+    return response
+
+
+def on_recipe_changed(sender, instance, **kwargs):
+    recipe_changed(instance.pk)
+
+
+def on_recipe_ingredients_changed(sender, recipe_id, **kwargs):
+    recipe_changed(recipe_id)
+
+
+def on_user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and HIDDEN_USER_FIELDS.issuperset(update_fields):
+        return
+    author_changed(instance.pk)
+
+
+def on_ingredient_changed(sender, **kwargs):
+    bump(EPOCH_KEY)
+
+
+def on_bulk_data_loaded(sender, **kwargs):
+    bump(EPOCH_KEY, LIST_VERSION_KEY)
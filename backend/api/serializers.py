@@ -1,21 +1,74 @@
 from __future__ import annotations
 
 from django.contrib.auth import get_user_model
+from django.db import models
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserSerializer as BaseUserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from api.constants import MIN_VALUE, MAX_VALUE
+from api.constants import BULK_RELATION_MAX_RECIPES, MIN_VALUE, MAX_VALUE
+from api.fragments import cached_fragments
+from api.instrumentation import TimedListSerializer, TimedSerializerMixin
+from api.loaders import parse_recipes_limit
+from api.relations import get_relation_snapshot
+from recipes.image_variants import variant_urls
 from recipes.models import (
     Ingredient,
     Recipe,
     RecipeIngredient,
 )
+from recipes.signals import track_recipe_ingredients
 
 CustomUser = get_user_model()
 
 
-class UserAvatarSerializer(serializers.Serializer):
+class RelationPrimingListSerializer(TimedListSerializer):
+    """
+    Списочный сериализатор, который до сериализации элементов
+    одним пакетом подгружает связи пользователя со всеми объектами страницы.
+    """
+
+    def to_representation(self, data):
+        items = list(
+            data.all() if isinstance(data, models.manager.BaseManager)
+            else data
+        )
+        snapshot = get_relation_snapshot(self.context)
+        if snapshot is not None:
+            self.child.prime_relations(snapshot, items)
+        if hasattr(self.child, 'represent_many'):
+            return self.child.represent_many(items)
+        return super().to_representation(items)
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Карта готовых вариантов картинки {вариант: абсолютный URL}.
+    Пока варианты для текущего файла не построены, карта пустая.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        urls = variant_urls(
+            getattr(instance, self.image_field),
+            getattr(instance, f'{self.image_field}_variants'),
+        )
+        request = self.context.get('request')
+        if request is None:
+            return urls
+        return {
+            variant: request.build_absolute_uri(url)
+            for variant, url in urls.items()
+        }
+
+
+class UserAvatarSerializer(TimedSerializerMixin, serializers.Serializer):
     """Сериализатор для загрузки аватарки пользователя."""
     avatar = Base64ImageField(required=True, allow_empty_file=False)
 
@@ -25,32 +78,40 @@ class UserAvatarSerializer(serializers.Serializer):
         return value
 
 
-class ExtendedUserSerializer(BaseUserSerializer):
+class ExtendedUserSerializer(TimedSerializerMixin, BaseUserSerializer):
     """Расширенный сериализатор пользователя с аватаром и подписками."""
 
     avatar = serializers.ImageField(read_only=True)
+    avatar_variants = ImageVariantsField('avatar')
     is_subscribed = serializers.SerializerMethodField(
         method_name='check_subscription_status')
 
     class Meta(BaseUserSerializer.Meta):
-        fields = (*BaseUserSerializer.Meta.fields, "avatar", "is_subscribed")
+        fields = (*BaseUserSerializer.Meta.fields,
+                  "avatar", "avatar_variants", "is_subscribed")
+        list_serializer_class = RelationPrimingListSerializer
+
+    @staticmethod
+    def prime_relations(snapshot, users):
+        snapshot.load_authors(user.pk for user in users)
 
     def check_subscription_status(self, target_user):
         """Проверяет, подписан ли текущий пользователь на данного автора."""
-        request = self.context.get("request")
-        if not request or not request.user.is_authenticated:
+        snapshot = get_relation_snapshot(self.context)
+        if snapshot is None:
             return False
-        current_user = request.user
-        return current_user.following.filter(author=target_user).exists()
+        return snapshot.is_subscribed(target_user)
 
 
-class IngredientDataSerializer(serializers.ModelSerializer):
+class IngredientDataSerializer(TimedSerializerMixin,
+                               serializers.ModelSerializer):
     """Сериализатор для отображения данных ингредиента."""
 
     class Meta:
         model = Ingredient
         fields = ("id", "name", "measurement_unit")
         read_only_fields = ("id", "name", "measurement_unit")
+        list_serializer_class = TimedListSerializer
 
 
 class RecipeIngredientDetailSerializer(serializers.ModelSerializer):
@@ -69,7 +130,8 @@ class RecipeIngredientDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "name", "measurement_unit", "amount")
 
 
-class RecipeDetailSerializer(serializers.ModelSerializer):
+class RecipeDetailSerializer(TimedSerializerMixin,
+                             serializers.ModelSerializer):
     """Детальный сериализатор рецепта для чтения."""
 
     author = ExtendedUserSerializer(read_only=True)
@@ -77,6 +139,7 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
         many=True, source="recipe_ingredients", read_only=True
     )
     image = serializers.ImageField(read_only=True)
+    image_variants = ImageVariantsField('image')
     is_favorited = serializers.SerializerMethodField(
         method_name='check_favorite_status')
     is_in_shopping_cart = serializers.SerializerMethodField(
@@ -86,28 +149,111 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = (
             "id", "author", "ingredients", "is_favorited",
-            "is_in_shopping_cart", "name", "image", "text", "cooking_time",
+            "is_in_shopping_cart", "name", "image", "image_variants",
+            "text", "cooking_time",
         )
         read_only_fields = (
             "id", "author", "ingredients", "is_favorited",
-            "is_in_shopping_cart", "name", "image", "text", "cooking_time",
+            "is_in_shopping_cart", "name", "image", "image_variants",
+            "text", "cooking_time",
         )
+        list_serializer_class = RelationPrimingListSerializer
+
+    # Флаги текущего пользователя: в кэш фрагментов не попадают
+    user_fields = ("is_favorited", "is_in_shopping_cart")
+
+    @staticmethod
+    def prime_relations(snapshot, recipes):
+        snapshot.load_recipes(recipe.pk for recipe in recipes)
+        snapshot.load_authors(recipe.author_id for recipe in recipes)
+
+    def to_representation(self, recipe_obj):
+        return self.represent_many([recipe_obj])[0]
+
+    def represent_many(self, recipes):
+        """
+        Представления рецептов: общая для всех часть берётся из кэша
+        фрагментов, флаги пользователя вычисляются заново.
+        """
+        fragments = cached_fragments(
+            self.context.get('request'), recipes, self.build_fragments)
+        return [
+            self.with_user_fields(recipe, fragments[recipe.pk])
+            for recipe in recipes
+        ]
+
+    def build_fragments(self, recipes):
+        """Сериализует промахи кэша, подгрузив их составы одним запросом."""
+        prefetch_related_objects(recipes, 'recipe_ingredients__ingredient')
+        fragment_fields = RecipeDetailSerializer.Meta.fields
+        fragments = []
+        for recipe in recipes:
+            data = super().to_representation(recipe)
+            fragments.append({name: data[name] for name in fragment_fields})
+        return fragments
+
+    def with_user_fields(self, recipe, fragment):
+        """Дополняет фрагмент флагами и полями, которых в нём нет."""
+        data = dict(fragment)
+        for field in self._readable_fields:
+            name = field.field_name
+            if name in self.user_fields or name not in fragment:
+                attribute = field.get_attribute(recipe)
+                data[name] = (
+                    None if attribute is None
+                    else field.to_representation(attribute)
+                )
+        data['author'] = {
+            **fragment['author'],
+            'is_subscribed': self.fields['author'].check_subscription_status(
+                recipe.author),
+        }
+        return data
 
     def check_favorite_status(self, recipe_obj):
         """Проверяет, добавлен ли рецепт в избранное."""
-        request = self.context.get("request")
-        if not request or not request.user.is_authenticated:
+        snapshot = get_relation_snapshot(self.context)
+        if snapshot is None:
             return False
-        current_user = request.user
-        return current_user.favorites.filter(recipe=recipe_obj).exists()
+        return snapshot.is_favorited(recipe_obj)
 
     def check_cart_status(self, recipe_obj):
         """Проверяет, добавлен ли рецепт в корзину покупок."""
-        request = self.context.get("request")
-        if not request or not request.user.is_authenticated:
+        snapshot = get_relation_snapshot(self.context)
+        if snapshot is None:
             return False
-        current_user = request.user
-        return current_user.carts.filter(recipe=recipe_obj).exists()
+        return snapshot.is_in_shopping_cart(recipe_obj)
+
+
+class PantryRecipeSerializer(RecipeDetailSerializer):
+    """Рецепт с долей ингредиентов, которые уже есть у пользователя."""
+
+    coverage = serializers.FloatField(read_only=True)
+    missing_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeDetailSerializer.Meta):
+        fields = (*RecipeDetailSerializer.Meta.fields,
+                  "coverage", "missing_count")
+        read_only_fields = fields
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетного избранного и корзины."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RELATION_MAX_RECIPES,
+        error_messages={
+            'empty': 'Передайте хотя бы один рецепт.',
+            'max_length': (
+                f'Не больше {BULK_RELATION_MAX_RECIPES} рецептов за раз.'),
+        },
+    )
+
+    def validate_recipes(self, value):
+        # Повторы убираем, порядок сохраняем — по нему строится ответ.
+        return list(dict.fromkeys(value))
 
 
 class RecipeIngredientInputSerializer(serializers.Serializer):
@@ -129,7 +275,8 @@ class RecipeIngredientInputSerializer(serializers.Serializer):
     )
 
 
-class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
+class RecipeCreateUpdateSerializer(TimedSerializerMixin,
+                                   serializers.ModelSerializer):
     """Сериализатор для создания и обновления рецептов."""
 
     ingredients = RecipeIngredientInputSerializer(many=True, write_only=True)
@@ -198,7 +345,8 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         """Создание нового рецепта."""
         ingredients_data = validated_data.pop("ingredients")
         new_recipe = super().create(validated_data)
-        self.create_recipe_ingredients(new_recipe, ingredients_data)
+        with track_recipe_ingredients(new_recipe):
+            self.create_recipe_ingredients(new_recipe, ingredients_data)
         return new_recipe
 
     def update(self, recipe_instance, validated_data):
@@ -207,7 +355,9 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         updated_recipe = super().update(recipe_instance, validated_data)
 
         if ingredients_data is not None:
-            self.create_recipe_ingredients(updated_recipe, ingredients_data)
+            with track_recipe_ingredients(updated_recipe):
+                self.create_recipe_ingredients(
+                    updated_recipe, ingredients_data)
         return updated_recipe
 
     def to_representation(self, recipe_instance):
@@ -218,22 +368,35 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         ).data
 
 
-class RecipeSummarySerializer(serializers.ModelSerializer):
+class RecipeSummarySerializer(TimedSerializerMixin,
+                              serializers.ModelSerializer):
     """Краткий сериализатор рецепта для списков."""
 
+    image_variants = ImageVariantsField('image')
+
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
-        read_only_fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_variants", "cooking_time")
+        read_only_fields = (
+            "id", "name", "image", "image_variants", "cooking_time")
+        list_serializer_class = TimedListSerializer
+
+
+class SimilarRecipeSerializer(RecipeSummarySerializer):
+    """Краткий рецепт с коэффициентом Жаккара по ингредиентам."""
+
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSummarySerializer.Meta):
+        fields = (*RecipeSummarySerializer.Meta.fields, "similarity")
+        read_only_fields = fields
 
 
 class UserWithRecipesSerializer(ExtendedUserSerializer):
     """Сериализатор пользователя с его рецептами и их количеством."""
 
     recipes = serializers.SerializerMethodField(method_name='get_user_recipes')
-    recipes_count = serializers.IntegerField(
-        source="recipes.count", read_only=True
-    )
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(ExtendedUserSerializer.Meta):
         fields = (*ExtendedUserSerializer.Meta.fields,
@@ -241,15 +404,15 @@ class UserWithRecipesSerializer(ExtendedUserSerializer):
 
     def get_user_recipes(self, user_obj):
         """Получение рецептов пользователя с учетом лимита."""
-        recipes_limit = self.context["request"].query_params.get(
-            "recipes_limit")
-        user_recipes = user_obj.recipes.all()
-
-        if recipes_limit and recipes_limit.isdigit():
-            user_recipes = user_recipes[:int(recipes_limit)]
+        user_recipes = getattr(user_obj, "limited_recipes", None)
+        if user_recipes is None:
+            user_recipes = user_obj.recipes.all()
+            recipes_limit = parse_recipes_limit(self.context["request"])
+            if recipes_limit is not None:
+                user_recipes = user_recipes[:recipes_limit]
 
         return RecipeSummarySerializer(
             user_recipes,
             many=True,
             context=self.context
-        ).data
\ No newline at end of file
+        ).data
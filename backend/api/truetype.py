@@ -0,0 +1,198 @@
+"""
+Минимальный разбор TrueType для встраивания шрифта в PDF.
+
+Читает из файла то, что нужно CIDFontType2 с /Identity-H: соответствие
+символ → глиф (cmap формата 4), ширины глифов и метрики, — и собирает
+подмножество шрифта: таблица glyf сохраняет только использованные
+глифы (с компонентами составных), остальные становятся пустыми.
+Номера глифов не меняются, поэтому в PDF хватает /CIDToGIDMap
+/Identity.
+"""
+import struct
+from functools import lru_cache
+
+# Таблицы, которых достаточно шрифту внутри PDF (FontFile2)
+SUBSET_TABLES = (
+    b"cmap", b"cvt ", b"fpgm", b"glyf", b"head", b"hhea", b"hmtx",
+    b"loca", b"maxp", b"prep",
+)
+UNICODE_CMAPS = ((3, 1), (0, 3))
+
+# Флаги компонента составного глифа
+ARG_1_AND_2_ARE_WORDS = 0x0001
+WE_HAVE_A_SCALE = 0x0008
+MORE_COMPONENTS = 0x0020
+WE_HAVE_AN_X_AND_Y_SCALE = 0x0040
+WE_HAVE_A_TWO_BY_TWO = 0x0080
+
+
+def _checksum(data):
+    data += b"\0" * (-len(data) % 4)
+    return sum(struct.unpack(f">{len(data) // 4}I", data)) & 0xFFFFFFFF
+
+
+class TrueTypeFont:
+    """Шрифт TrueType, прочитанный из файла целиком."""
+
+    def __init__(self, data):
+        count = struct.unpack_from(">H", data, 4)[0]
+        self.tables = {}
+        for index in range(count):
+            tag, _, offset, length = struct.unpack_from(
+                ">4sIII", data, 12 + 16 * index)
+            self.tables[tag] = data[offset:offset + length]
+
+        head = self.tables[b"head"]
+        self.units_per_em = struct.unpack_from(">H", head, 18)[0]
+        self.bbox = struct.unpack_from(">4h", head, 36)
+        long_loca = struct.unpack_from(">h", head, 50)[0]
+        glyph_count = struct.unpack_from(">H", self.tables[b"maxp"], 4)[0]
+        hhea = self.tables[b"hhea"]
+        self.ascent, self.descent = struct.unpack_from(">hh", hhea, 4)
+
+        loca = self.tables[b"loca"]
+        if long_loca:
+            self._loca = struct.unpack_from(f">{glyph_count + 1}I", loca)
+        else:
+            self._loca = [
+                offset * 2 for offset in
+                struct.unpack_from(f">{glyph_count + 1}H", loca)
+            ]
+
+        metrics = struct.unpack_from(">H", hhea, 34)[0]
+        advances = struct.unpack_from(
+            f">{2 * metrics}H", self.tables[b"hmtx"])[::2]
+        # Глифы после последней пары hmtx наследуют её ширину
+        self.advances = list(advances) + [advances[-1]] * (
+            glyph_count - metrics)
+        self.cmap = self._read_cmap()
+
+    def _read_cmap(self):
+        """Символы BMP из юникодной подтаблицы формата 4."""
+        cmap = self.tables[b"cmap"]
+        count = struct.unpack_from(">H", cmap, 2)[0]
+        for index in range(count):
+            platform, encoding, offset = struct.unpack_from(
+                ">HHI", cmap, 4 + 8 * index)
+            if ((platform, encoding) in UNICODE_CMAPS
+                    and struct.unpack_from(">H", cmap, offset)[0] == 4):
+                break
+        else:
+            raise ValueError("В шрифте нет юникодной cmap формата 4")
+
+        segments = struct.unpack_from(">H", cmap, offset + 6)[0] // 2
+        ends_at = offset + 14
+        starts_at = ends_at + 2 * segments + 2
+        deltas_at = starts_at + 2 * segments
+        ranges_at = deltas_at + 2 * segments
+        ends = struct.unpack_from(f">{segments}H", cmap, ends_at)
+        starts = struct.unpack_from(f">{segments}H", cmap, starts_at)
+        deltas = struct.unpack_from(f">{segments}h", cmap, deltas_at)
+        ranges = struct.unpack_from(f">{segments}H", cmap, ranges_at)
+
+        mapping = {}
+        for index in range(segments):
+            for code in range(starts[index], ends[index] + 1):
+                if code == 0xFFFF:
+                    continue
+                if ranges[index]:
+                    at = (ranges_at + 2 * index + ranges[index]
+                          + 2 * (code - starts[index]))
+                    glyph = struct.unpack_from(">H", cmap, at)[0]
+                    if glyph:
+                        glyph = (glyph + deltas[index]) & 0xFFFF
+                else:
+                    glyph = (code + deltas[index]) & 0xFFFF
+                if glyph:
+                    mapping[code] = glyph
+        return mapping
+
+    def glyph(self, char):
+        """Номер глифа символа; 0 (.notdef), если его нет в шрифте."""
+        return self.cmap.get(ord(char), 0)
+
+    def width(self, glyph):
+        """Ширина глифа в тысячных долях кегля, как ждёт PDF."""
+        return round(self.advances[glyph] * 1000 / self.units_per_em)
+
+    def _glyph_data(self, glyph):
+        return self.tables[b"glyf"][self._loca[glyph]:self._loca[glyph + 1]]
+
+    def _components(self, glyph):
+        data = self._glyph_data(glyph)
+        if len(data) < 10 or struct.unpack_from(">h", data, 0)[0] >= 0:
+            return
+        at = 10
+        while True:
+            flags, component = struct.unpack_from(">HH", data, at)
+            yield component
+            at += 4 + (4 if flags & ARG_1_AND_2_ARE_WORDS else 2)
+            if flags & WE_HAVE_A_SCALE:
+                at += 2
+            elif flags & WE_HAVE_AN_X_AND_Y_SCALE:
+                at += 4
+            elif flags & WE_HAVE_A_TWO_BY_TWO:
+                at += 8
+            if not flags & MORE_COMPONENTS:
+                return
+
+    def subset(self, glyphs):
+        """Файл шрифта, в котором контуры есть только у `glyphs`."""
+        keep = {0}
+        pending = list(glyphs)
+        while pending:
+            glyph = pending.pop()
+            if glyph not in keep:
+                keep.add(glyph)
+                pending.extend(self._components(glyph))
+
+        glyf, loca = [], [0]
+        for glyph in range(len(self._loca) - 1):
+            data = self._glyph_data(glyph) if glyph in keep else b""
+            data += b"\0" * (-len(data) % 4)
+            glyf.append(data)
+            loca.append(loca[-1] + len(data))
+
+        tables = {
+            tag: self.tables[tag] for tag in SUBSET_TABLES
+            if tag in self.tables
+        }
+        tables[b"glyf"] = b"".join(glyf)
+        tables[b"loca"] = struct.pack(f">{len(loca)}I", *loca)
+        # Длинный формат loca и обнулённый checkSumAdjustment
+        head = bytearray(tables[b"head"])
+        head[8:12] = b"\0\0\0\0"
+        head[50:52] = struct.pack(">h", 1)
+        tables[b"head"] = bytes(head)
+
+        font, offsets = self._assemble(tables)
+        adjustment = (0xB1B0AFBA - _checksum(font)) & 0xFFFFFFFF
+        head_at = offsets[b"head"]
+        return (font[:head_at + 8] + struct.pack(">I", adjustment)
+                + font[head_at + 12:])
+
+    @staticmethod
+    def _assemble(tables):
+        count = len(tables)
+        power = 1 << (count.bit_length() - 1)
+        header = struct.pack(
+            ">IHHHH", 0x00010000, count, power * 16,
+            power.bit_length() - 1, (count - power) * 16)
+        directory, body, offsets = [], [], {}
+        offset = 12 + 16 * count
+        for tag in sorted(tables):
+            data = tables[tag]
+            directory.append(struct.pack(
+                ">4sIII", tag, _checksum(data), offset, len(data)))
+            offsets[tag] = offset
+            data += b"\0" * (-len(data) % 4)
+            body.append(data)
+            offset += len(data)
+        return header + b"".join(directory) + b"".join(body), offsets
+
+
+@lru_cache(maxsize=None)
+def load_font(path):
+    """Шрифт из файла; читается один раз на процесс."""
+    with open(path, "rb") as font_file:
+        return TrueTypeFont(font_file.read())
@@ -1,6 +1,13 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .async_views import (async_api_view,
+                          ingredient_list,
+                          recipe_detail,
+                          recipe_favorite,
+                          recipe_shopping_cart,
+                          user_subscribe)
 from .views import (CustomUserViewSet,
                     IngredientListViewSet,
                     RecipeManagementViewSet)
@@ -10,7 +17,26 @@ router.register(r"users", CustomUserViewSet, basename="users")
 router.register(r"ingredients", IngredientListViewSet)
 router.register(r"recipes", RecipeManagementViewSet)
 
+# Асинхронные версии горячих эндпоинтов (под ASGI). Стоят перед
+# роутером и без имён, поэтому reverse() по-прежнему ведёт на вью
+# роутера, а остальные методы тех же URL отдаются ей же.
+sync_views = {url.name: url.callback for url in router.urls if url.name}
+async_urlpatterns = [
+    path("ingredients/", async_api_view(
+        ingredient_list, sync_views["ingredient-list"], {"GET"})),
+    path("recipes/<int:pk>/", async_api_view(
+        recipe_detail, sync_views["recipe-detail"], {"GET"})),
+    path("recipes/<int:pk>/favorite/", async_api_view(
+        recipe_favorite, sync_views["recipe-favorite"], {"POST", "DELETE"})),
+    path("recipes/<int:pk>/shopping_cart/", async_api_view(
+        recipe_shopping_cart, sync_views["recipe-shopping-cart"],
+        {"POST", "DELETE"})),
+    path("users/<int:id>/subscribe/", async_api_view(
+        user_subscribe, sync_views["users-subscribe"], {"POST", "DELETE"})),
+]
+
 urlpatterns = [
+    *(async_urlpatterns if settings.API_ASYNC_VIEWS else ()),
     path("", include(router.urls)),
     path("auth/", include("djoser.urls.authtoken")),
     path("recipes/<int:pk>/",
@@ -1,31 +1,56 @@
 import re
 from datetime import datetime
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import FileResponse
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404, HttpResponseRedirect, StreamingHttpResponse
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 
 from djoser.views import UserViewSet as BaseUserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import (
     AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly,
 )
 from rest_framework.response import Response
 
-from recipes.models import Ingredient, Recipe, Favorite, ShoppingCart
+from recipes import bulk_relations, short_links
+from recipes.feed import Timeline
+from recipes.ingredient_index import ingredient_index
+from recipes.ingredient_postings import (
+    filter_by_ingredients,
+    ingredient_postings,
+)
+from recipes.search import search_recipes
+from recipes.similarity import similar_recipes
+from recipes.models import (
+    Ingredient, Recipe, Favorite, ShoppingCart, ShoppingListItem,
+)
 from users.models import Follow
+from api import response_cache
+from api.constants import (
+    PANTRY_MIN_COVERAGE,
+    SIMILAR_RECIPES_LIMIT,
+    SIMILAR_RECIPES_MAX_LIMIT,
+)
+from api.pagination import FeedKeysetPagination, RecipeKeysetPagination
 from api.permissions import IsAuthorOrReadOnly
 from api.serializers import (
     UserAvatarSerializer,
     IngredientDataSerializer,
+    PantryRecipeSerializer,
     RecipeDetailSerializer,
     RecipeSummarySerializer,
     RecipeCreateUpdateSerializer,
+    RecipeIdsSerializer,
+    SimilarRecipeSerializer,
     UserWithRecipesSerializer,
 )
+from api.exporters import ITERATOR_CHUNK_SIZE, SHOPPING_LIST_EXPORTERS
 from api.filters import IngredientFilter
+from api.loaders import attach_limited_recipes, parse_recipes_limit
 
 CustomUser = get_user_model()
 
@@ -38,15 +63,76 @@ class IngredientListViewSet(viewsets.ReadOnlyModelViewSet):
 
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    # Токен и пересборка индекса (список) или сам ингредиент
+    query_budgets = {'list': 2, 'retrieve': 2}
+
+    def list(self, request, *args, **kwargs):
+        """Поиск по префиксу из процессного индекса, без запроса в БД."""
+        return Response(
+            ingredient_index.search(request.query_params.get('name', ''))
+        )
 
 
 class RecipeManagementViewSet(viewsets.ModelViewSet):
     """ViewSet для управления рецептами с полным функционалом."""
 
+    # Составы подгружает сериализатор, и только для промахов кэша фрагментов
     queryset = (Recipe.objects
                 .select_related('author')
-                .prefetch_related('recipe_ingredients__ingredient'))
+                .defer('search_vector'))
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
+    # Лимиты SQL-запросов на действие (см. ServerTimingMiddleware):
+    # максимум из benchmark_api на непустых данных с токеном в заголовке,
+    # плюс условные запросы, которых в бенчмарке нет
+    query_budgets = {
+        # +2 на пересборку инвертированного индекса при ?ingredients=
+        'list': 10,
+        'retrieve': 7,
+        'pantry': 9,
+        # Токен, проверка рецепта, его корзины, кандидаты, составы и
+        # in_bulk найденных; без кандидатов — на один меньше
+        'similar': 6,
+        # +1 на рецепты авторов выше FEED_FANOUT_MAX_FOLLOWERS
+        'feed': 9,
+        'get_link': 2,
+        'favorite': 7,
+        'shopping_cart': 13,
+        'favorite_bulk': 4,
+        'shopping_cart_bulk': 10,
+        'download_shopping_cart': 3,
+    }
+
+    @property
+    def paginator(self):
+        """Keyset-пагинация ленты, если клиент передал параметр `cursor`."""
+        if (
+            not hasattr(self, '_paginator')
+            and self.action == 'list'
+            and RecipeKeysetPagination.cursor_query_param
+            in self.request.query_params
+        ):
+            self._paginator = RecipeKeysetPagination()
+        return super().paginator
+
+    def list(self, request, *args, **kwargs):
+        return response_cache.cached_response(
+            request, 'list',
+            lambda: super(RecipeManagementViewSet, self).list(
+                request, *args, **kwargs),
+            [response_cache.LIST_VERSION_KEY],
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_field]
+        return response_cache.cached_response(
+            request, f'recipe:{pk}',
+            lambda: super(RecipeManagementViewSet, self).retrieve(
+                request, *args, **kwargs),
+            [response_cache.RECIPE_VERSION_KEY.format(pk)],
+            lambda data: [
+                response_cache.AUTHOR_VERSION_KEY.format(data['author']['id'])
+            ],
+        )
 
     def get_serializer_class(self):
         """Выбор сериализатора в зависимости от типа запроса."""
@@ -65,6 +151,7 @@ class RecipeManagementViewSet(viewsets.ModelViewSet):
         ).data
         return Response(serialized_data, status=status_code)
 
+    @transaction.atomic
     def handle_recipe_relation_toggle(self, relation_model, target_recipe):
         """Универсальный обработчик для добавления/удаления рецепта из избранного/корзины."""
         current_request = self.request
@@ -101,6 +188,77 @@ class RecipeManagementViewSet(viewsets.ModelViewSet):
         """Добавление/удаление рецепта в корзину покупок."""
         return self.handle_recipe_relation_toggle(ShoppingCart, self.get_object())
 
+    def handle_bulk_relation(self, relation_model):
+        """
+        Пакетно добавляет (POST) или удаляет (DELETE) рецепты из
+        `{"recipes": [id, ...]}` одной транзакцией и возвращает
+        результат по каждому id: added/exists, removed/absent или
+        not_found.
+        """
+        serializer = RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_variants', 'cooking_time'
+        ).in_bulk(recipe_ids)
+        found_ids = [pk for pk in recipe_ids if pk in recipes]
+        user_id = self.request.user.pk
+
+        if self.request.method == 'POST':
+            changed = bulk_relations.add_recipes(
+                relation_model, user_id, found_ids)
+            statuses = ('added', 'exists')
+        else:
+            changed = bulk_relations.remove_recipes(
+                relation_model, user_id, found_ids)
+            statuses = ('removed', 'absent')
+
+        summaries = {
+            item['id']: item
+            for item in RecipeSummarySerializer(
+                [recipes[pk] for pk in found_ids],
+                many=True,
+                context={'request': self.request},
+            ).data
+        }
+        return Response([
+            {
+                'id': pk,
+                'status': statuses[pk not in changed],
+                'recipe': summaries[pk],
+            }
+            if pk in recipes else {'id': pk, 'status': 'not_found'}
+            for pk in recipe_ids
+        ])
+
+    @action(detail=False, methods=('post', 'delete'), url_path='favorite/bulk',
+            permission_classes=[IsAuthenticated])
+    def favorite_bulk(self, request):
+        """Пакетное добавление/удаление рецептов в избранное."""
+        return self.handle_bulk_relation(Favorite)
+
+    @action(detail=False, methods=('post', 'delete'),
+            url_path='shopping_cart/bulk',
+            permission_classes=[IsAuthenticated])
+    def shopping_cart_bulk(self, request):
+        """Пакетное добавление/удаление рецептов в корзину покупок."""
+        return self.handle_bulk_relation(ShoppingCart)
+
+    def parse_ingredient_ids(self):
+        """id ингредиентов из `?ingredients=1,2,3` (можно повторять параметр)."""
+        raw_values = self.request.query_params.getlist('ingredients')
+        try:
+            return [
+                int(value)
+                for raw in raw_values
+                for value in raw.split(',')
+                if value.strip()
+            ]
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': 'Ожидаются id ингредиентов через запятую.'}
+            )
+
     def get_queryset(self):
         """Фильтрация рецептов по различным параметрам."""
         base_queryset = super().get_queryset()
@@ -110,6 +268,18 @@ class RecipeManagementViewSet(viewsets.ModelViewSet):
         if author_id:
             base_queryset = base_queryset.filter(author_id=author_id)
 
+        ingredient_ids = self.parse_ingredient_ids()
+        if ingredient_ids:
+            base_queryset = filter_by_ingredients(
+                base_queryset,
+                ingredient_ids,
+                match_all=request_params.get('ingredients_match') != 'any',
+            )
+
+        search_text = request_params.get('search')
+        if search_text:
+            base_queryset = search_recipes(base_queryset, search_text)
+
         current_user = self.request.user
         if current_user.is_authenticated:
             if request_params.get('is_favorited') == '1':
@@ -122,70 +292,155 @@ class RecipeManagementViewSet(viewsets.ModelViewSet):
 
         return base_queryset
 
+    @action(detail=False, methods=('get',), url_path='pantry')
+    def pantry(self, request):
+        """
+        Что приготовить из имеющегося: рецепты, покрытые ингредиентами
+        `?ingredients=` хотя бы на `?min_coverage=` (доля от 0 до 1),
+        по убыванию покрытия и времени приготовления.
+        """
+        ingredient_ids = self.parse_ingredient_ids()
+        if not ingredient_ids:
+            raise ValidationError(
+                {'ingredients': 'Укажите хотя бы один ингредиент.'})
+        try:
+            min_coverage = float(
+                request.query_params.get('min_coverage', PANTRY_MIN_COVERAGE))
+        except ValueError:
+            min_coverage = -1
+        if not 0 < min_coverage <= 1:
+            raise ValidationError(
+                {'min_coverage': 'Ожидается число от 0 до 1.'})
+
+        ranked = ingredient_postings.rank_by_coverage(
+            ingredient_ids, min_coverage)
+        page = self.paginate_queryset(ranked)
+        recipes = super().get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page])
+        page_recipes = []
+        for recipe_id, coverage, missing_count in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.coverage = round(coverage, 4)
+            recipe.missing_count = missing_count
+            page_recipes.append(recipe)
+
+        serializer = PantryRecipeSerializer(
+            page_recipes, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=('get',), url_path='feed',
+            permission_classes=[IsAuthenticated],
+            pagination_class=FeedKeysetPagination)
+    def feed(self, request):
+        """
+        Лента рецептов авторов, на которых подписан пользователь, от
+        новых к старым; листается курсором `next`/`previous`.
+        """
+        page = self.paginate_queryset(Timeline(request.user))
+        serializer = RecipeDetailSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=('get',), url_path='similar')
+    def similar(self, request, pk=None):
+        """
+        Рецепты с похожим составом (коэффициент Жаккара по ингредиентам),
+        найденные через корзины LSH без перебора всех рецептов.
+        """
+        if not pk.isdigit() or not Recipe.objects.filter(pk=pk).exists():
+            raise NotFound('Рецепт не найден.')
+        limit = request.query_params.get('limit', '')
+        limit = min(
+            int(limit) if limit.isdigit() else SIMILAR_RECIPES_LIMIT,
+            SIMILAR_RECIPES_MAX_LIMIT,
+        )
+        ranked = similar_recipes(int(pk), limit)
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_variants', 'cooking_time',
+        ).in_bulk([recipe_id for recipe_id, _ in ranked])
+        similar = []
+        for recipe_id, similarity in ranked:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.similarity = round(similarity, 4)
+            similar.append(recipe)
+        return Response(SimilarRecipeSerializer(
+            similar, many=True, context=self.get_serializer_context()).data)
+
     @action(detail=True, methods=('get',), url_path='get-link')
     def get_link(self, request, pk=None):
-        """Получение короткой ссылки на рецепт."""
-        try:
-            recipe = self.get_object()
-            short_url = request.build_absolute_uri(f'/api/recipes/{pk}/')
-            return Response({'short-link': short_url})
-        except Exception as e:
-            return Response(
-                {'error': 'Ошибка при создании ссылки'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        """Получение короткой ссылки на рецепт без загрузки самого рецепта."""
+        if not pk.isdigit() or not short_links.recipe_links.exists(int(pk)):
+            raise NotFound('Рецепт не найден.')
+        short_url = request.build_absolute_uri(
+            reverse('short-link', args=(short_links.encode(int(pk)),))
+        )
+        return Response({'short-link': short_url})
 
     @action(detail=False, methods=('get',), url_path='download_shopping_cart',
             permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
-        """Скачивание списка покупок в текстовом формате."""
-        shopping_ingredients = (
-            Ingredient.objects
-            .filter(ingredient_recipes__recipe__in_carts__user=request.user)
-            .values('name', 'measurement_unit')
-            .annotate(total_amount=Sum('ingredient_recipes__amount'))
-            .order_by('name')
+        """Потоковое скачивание списка покупок (txt, csv или pdf)."""
+        exporter_class = SHOPPING_LIST_EXPORTERS.get(
+            request.query_params.get('filetype', 'txt')
         )
+        if exporter_class is None:
+            raise ValidationError({
+                'filetype': 'Доступные форматы: '
+                            + ', '.join(SHOPPING_LIST_EXPORTERS)
+            })
 
-        current_datetime = datetime.now()
-        report_lines = [
-            f"Список покупок пользователя {request.user.username}",
-            f"Дата создания: {current_datetime.strftime('%Y-%m-%d %H:%M:%S')}",
-            "",
-            "=== ПРОДУКТЫ ===",
-        ]
-
-        for index, ingredient in enumerate(shopping_ingredients, start=1):
-            product_line = (
-                f"{index}. {ingredient['name'].title()} "
-                f"({ingredient['measurement_unit']}) — {ingredient['total_amount']}"
-            )
-            report_lines.append(product_line)
-
-        report_lines.extend([
-            "",
-            "=== РЕЦЕПТЫ ===",
-        ])
+        shopping_ingredients = (
+            ShoppingListItem.objects
+            .filter(user=request.user)
+            .values('total_amount',
+                    name=F('ingredient__name'),
+                    measurement_unit=F('ingredient__measurement_unit'))
+            .order_by('ingredient__name')
+            .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+        )
+        cart_recipes = (
+            Recipe.objects
+            .filter(in_carts__user=request.user)
+            .select_related('author')
+            .only('name', 'author__username')
+            .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+        )
 
-        cart_recipes = Recipe.objects.filter(in_carts__user=request.user)
-        for recipe in cart_recipes:
-            recipe_line = f"• {recipe.name} (автор: {recipe.author.username})"
-            report_lines.append(recipe_line)
+        exporter = exporter_class(request.user.username, datetime.now())
+        response = StreamingHttpResponse(
+            exporter.stream(shopping_ingredients, cart_recipes),
+            content_type=exporter.content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{exporter.filename()}"'
+        )
+        return response
 
-        final_report = '\n'.join(report_lines)
 
-        return FileResponse(
-            final_report.encode('utf-8'),
-            filename=f"shopping_list_{current_datetime.strftime('%Y%m%d_%H%M%S')}.txt",
-            as_attachment=True,
-            content_type='text/plain; charset=utf-8'
-        )
+def short_link_redirect(request, code):
+    """Редирект с короткой ссылки на страницу рецепта во фронтенде."""
+    recipe_id = short_links.recipe_links.resolve(code)
+    if recipe_id is None:
+        raise Http404('Рецепт не найден.')
+    return HttpResponseRedirect(f'/recipes/{recipe_id}/')
 
 
 class CustomUserViewSet(BaseUserViewSet):
     """Расширенный ViewSet для управления пользователями."""
 
     lookup_field = 'id'
+    query_budgets = {
+        'list': 4,
+        'retrieve': 3,
+        'me': 2,
+        'subscriptions': 5,
+        # С FEED_FANOUT_WORKERS=0 дозаполнение ленты идёт прямо в запросе
+        'subscribe': 12,
+    }
 
     @action(detail=False, methods=('get',), permission_classes=[IsAuthenticated])
     def me(self, request, *args, **kwargs):
@@ -218,10 +473,13 @@ class CustomUserViewSet(BaseUserViewSet):
     def subscriptions(self, request):
         """Получение списка подписок пользователя."""
         subscribed_authors = CustomUser.objects.filter(
-            following__user=request.user
+            followers__user=request.user
         )
 
-        paginated_authors = self.paginate_queryset(subscribed_authors)
+        paginated_authors = attach_limited_recipes(
+            self.paginate_queryset(subscribed_authors),
+            parse_recipes_limit(request),
+        )
         subscription_serializer = self.get_serializer(
             paginated_authors,
             many=True,
@@ -236,6 +494,7 @@ class CustomUserViewSet(BaseUserViewSet):
     serializer_class=UserWithRecipesSerializer,
     permission_classes=[IsAuthenticated],
 )
+    @transaction.atomic
     def subscribe(self, request, id=None):
         """Подписаться / отписаться от автора (id берём из URL)."""
         author = self.get_object()          
@@ -249,6 +508,7 @@ class CustomUserViewSet(BaseUserViewSet):
                 raise ValidationError({'errors': 'Подписка уже существует'})
             user.following.create(author=author)
 
+            attach_limited_recipes([author], parse_recipes_limit(request))
             serializer = self.get_serializer(author)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -0,0 +1,107 @@
+"""
+Прогрев процесса до первых запросов.
+
+gunicorn.conf.py вызывает warm_up() в мастере перед форком воркеров
+(preload_app), а без preload — в каждом воркере после загрузки
+приложения. Прогреваются:
+  * резолвер URL — импорт urlconf и компиляция всех шаблонов;
+  * сериализаторы — поля всех сериализаторов API и djoser, а заодно
+    кэши _meta моделей и ленивые импорты настроек DRF/djoser;
+  * каталог ингредиентов — процессный индекс автодополнения и
+    инвертированный индекс ингредиент → рецепты.
+Построенное в мастере достаётся воркерам копией при записи, поэтому
+ни один воркер не платит за это на своих первых запросах.
+
+Соединения с БД и кэшем в конце закрываются, пул psycopg
+(DB_CONNECTION_MODE=pool) — тоже: открытый сокет и потоки пула нельзя
+делить между процессами после форка, воркер откроет свой пул.
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
+from djoser.conf import settings as djoser_settings
+from rest_framework import serializers
+
+from recipes.ingredient_index import ingredient_index
+from recipes.ingredient_postings import ingredient_postings
+
+from . import serializers as api_serializers
+
+logger = logging.getLogger(__name__)
+
+
+def serializer_classes():
+    """Сериализаторы api.serializers и djoser из настроек."""
+    own = [
+        value for value in vars(api_serializers).values()
+        if isinstance(value, type)
+        and issubclass(value, serializers.BaseSerializer)
+        and not issubclass(value, serializers.ListSerializer)
+        and value.__module__ == api_serializers.__name__
+    ]
+    djoser = [
+        getattr(djoser_settings.SERIALIZERS, name)
+        for name in djoser_settings.SERIALIZERS
+    ]
+    return list(dict.fromkeys(own + djoser))
+
+
+def _warm_urls():
+    return len(get_resolver().reverse_dict)
+
+
+def _warm_serializers():
+    classes = serializer_classes()
+    for serializer_class in classes:
+        serializer_class(context={}).fields
+    return len(classes)
+
+
+def _warm_ingredients():
+    # Пустой запрос к инвертированному индексу только строит его.
+    ingredient_postings.match(())
+    return len(ingredient_index.search())
+
+
+STEPS = (
+    ("urls", _warm_urls),
+    ("serializers", _warm_serializers),
+    ("ingredients", _warm_ingredients),
+)
+
+
+@contextmanager
+def _closing_connections():
+    try:
+        yield
+    finally:
+        connections.close_all()
+        for connection in connections.all(initialized_only=True):
+            if getattr(connection, "pool", None) is not None:
+                connection.close_pool()
+        caches.close_all()
+
+
+def warm_up():
+    """
+    Выполняет шаги прогрева и возвращает {шаг: (размер, мс)}. Шаг,
+    упавший на БД, пропускается с предупреждением: сервер должен
+    подняться, даже если база ещё недоступна.
+    """
+    report = {}
+    with _closing_connections():
+        for name, step in STEPS:
+            started = time.perf_counter()
+            try:
+                size = step()
+            except DatabaseError:
+                logger.warning("Прогрев «%s» пропущен: БД недоступна", name,
+                               exc_info=True)
+                continue
+            report[name] = (
+                size, round((time.perf_counter() - started) * 1000, 1))
+    return report
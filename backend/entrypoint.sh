@@ -10,8 +10,15 @@ echo "✅ postgres is ready"
 echo "applying migrations"
 python manage.py migrate --noinput
 
+# Таблица для CACHE_URL=db://; с другими бэкендами команда ничего не делает
+python manage.py createcachetable
+
 echo " loading components"
 python manage.py create_data
 
-echo "starting gunicorn"
-exec gunicorn foodgram.wsgi:application --bind 0.0.0.0:8000
+echo "building similar-recipe signatures"
+python manage.py build_recipe_signatures
+
+# Режим, число и класс воркеров, preload и прогрев — в gunicorn.conf.py
+echo "starting gunicorn (${SERVER_MODE:-asgi})"
+exec gunicorn -c gunicorn.conf.py
@@ -3,5 +3,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+# Настройки проверяют, что режим соединений с БД совместим с ASGI
+os.environ['SERVER_MODE'] = 'asgi'
 
 application = get_asgi_application()
@@ -0,0 +1,33 @@
+"""
+Бэкенд PostgreSQL с замерами соединений.
+
+Обычный django.db.backends.postgresql, который дополнительно:
+  * засчитывает в метрики запроса (Server-Timing `db-connect`) время
+    получения соединения — новое подключение или ожидание свободного
+    соединения в пуле;
+  * отдаёт статистику пула psycopg (DB_CONNECTION_MODE=pool).
+"""
+import time
+
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        from api.instrumentation import current_metrics
+
+        started = time.perf_counter()
+        try:
+            return super().get_new_connection(conn_params)
+        finally:
+            metrics = current_metrics()
+            if metrics is not None:
+                metrics.add("db-connect", time.perf_counter() - started)
+
+    def pool_stats(self):
+        """Статистика psycopg_pool или None, если пул не включён."""
+        pool = self.pool
+        if pool is None:
+            return None
+        return pool.get_stats()
@@ -1,6 +1,8 @@
 from pathlib import Path
+from urllib.parse import urlsplit
 import os
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv()
 
@@ -40,6 +42,7 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,19 +70,72 @@ TEMPLATES = [
     },
 ]
 
+# postgresql (по умолчанию) или sqlite — например, для бенчмарков без сервера БД
 DATABASE_ENGINE = os.getenv('DB_ENGINE', 'postgresql').lower()
 
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('POSTGRES_DB', 'foodgram_db'),
-        'USER': os.getenv('POSTGRES_USER', 'foodgram_user'),
-        'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'foodgram_password'),
-        'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
-        'PORT': os.getenv('POSTGRES_PORT', '5432'),
+if DATABASE_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'foodgram.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'foodgram_db'),
+            'USER': os.getenv('POSTGRES_USER', 'foodgram_user'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'foodgram_password'),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        }
+    }
+
+# Соединения с PostgreSQL (DB_CONNECTION_MODE):
+#   none       — новое соединение на каждый запрос;
+#   persistent — соединение живёт DB_CONN_MAX_AGE секунд и проверяется
+#                перед повторным использованием; только для WSGI: под
+#                ASGI (SERVER_MODE=asgi, его выставляет foodgram/asgi.py)
+#                у каждого запроса свой поток и своё соединение, и Django
+#                не советует держать их открытыми — такое сочетание
+#                отклоняется;
+#   pool       — пул psycopg на процесс: от DB_POOL_MIN_SIZE до
+#                DB_POOL_MAX_SIZE соединений, ожидание свободного не
+#                дольше DB_POOL_TIMEOUT секунд, простаивающие закрываются
+#                через DB_POOL_MAX_IDLE, любые — через DB_POOL_MAX_LIFETIME.
+# Время получения соединения и загрузка пула — в Server-Timing.
+DB_CONNECTION_MODE = os.getenv('DB_CONNECTION_MODE', 'none').lower()
+DB_CONNECTION_MODES = ('none', 'persistent', 'pool')
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi').lower()
+if DB_CONNECTION_MODE not in DB_CONNECTION_MODES:
+    raise ImproperlyConfigured(
+        f'DB_CONNECTION_MODE: неизвестный режим «{DB_CONNECTION_MODE}», '
+        f'доступны: {", ".join(DB_CONNECTION_MODES)}'
+    )
+if DB_CONNECTION_MODE == 'persistent' and SERVER_MODE == 'asgi':
+    raise ImproperlyConfigured(
+        'DB_CONNECTION_MODE=persistent не поддерживается под ASGI: '
+        'используйте pool или none'
+    )
+
+if DATABASE_ENGINE != 'sqlite' and DB_CONNECTION_MODE == 'persistent':
+    DATABASES['default'].update(
+        CONN_MAX_AGE=int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        CONN_HEALTH_CHECKS=True,
+    )
+elif DATABASE_ENGINE != 'sqlite' and DB_CONNECTION_MODE == 'pool':
+    DATABASES['default'].update(
+        CONN_MAX_AGE=0,
+        CONN_HEALTH_CHECKS=True,
+        OPTIONS={'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+            'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),
+        }},
+    )
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -116,6 +172,22 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'users.User'
 
+# Движок JSON для API: stdlib (штатный DRF) или orjson (быстрый, api.renderers)
+API_JSON_ENGINE = os.getenv('API_JSON_ENGINE', 'stdlib').lower()
+JSON_RENDERER_CLASSES = {
+    'orjson': ('api.renderers.ORJSONRenderer', 'api.renderers.ORJSONParser'),
+    'stdlib': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.parsers.JSONParser',
+    ),
+}
+if API_JSON_ENGINE not in JSON_RENDERER_CLASSES:
+    raise ImproperlyConfigured(
+        f'API_JSON_ENGINE: неизвестный движок «{API_JSON_ENGINE}», '
+        f'доступны: {", ".join(JSON_RENDERER_CLASSES)}'
+    )
+JSON_RENDERER, JSON_PARSER = JSON_RENDERER_CLASSES[API_JSON_ENGINE]
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
@@ -132,10 +204,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', '10')),
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        JSON_RENDERER,
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        JSON_PARSER,
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FormParser',
     ],
@@ -167,3 +239,100 @@ DJOSER_CONFIG = {
 }
 
 DJOSER = DJOSER_CONFIG
+
+# Общий для всех процессов кэш: через него воркеры узнают о версиях
+# индексов ингредиентов, журнале изменений рецептов, кэше ответов и
+# фрагментов. CACHE_URL — redis://host:6379/0 или db://<таблица>
+# (таблицу создаёт manage.py createcachetable). Без него кэш —
+# LocMemCache одного процесса: инвалидация не доходит до соседних
+# воркеров, поэтому кэш ответов и фрагментов выключен, а gunicorn
+# запускает один воркер.
+CACHE_URL = os.getenv('CACHE_URL', '')
+_cache_url = urlsplit(CACHE_URL)
+if not CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+elif _cache_url.scheme in ('redis', 'rediss'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+elif _cache_url.scheme == 'db':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': _cache_url.netloc or 'django_cache',
+        }
+    }
+else:
+    raise ImproperlyConfigured(
+        f'CACHE_URL: неизвестная схема «{_cache_url.scheme}», '
+        'ожидается redis://, rediss:// или db://'
+    )
+SHARED_CACHE = bool(CACHE_URL)
+
+# Как часто (сек) процессный индекс ингредиентов перечитывает каталог
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', '300'))
+
+# Инвертированный индекс ингредиент → рецепты: период полной пересборки (сек)
+# и сколько id рецептов ещё передаём в IN, а не считаем фильтр в БД
+INGREDIENT_POSTINGS_TTL = int(os.getenv('INGREDIENT_POSTINGS_TTL', '600'))
+INGREDIENT_FILTER_MAX_IDS = int(
+    os.getenv('INGREDIENT_FILTER_MAX_IDS', '20000'))
+
+# Сколько id рецептов держит процессный LRU коротких ссылок и сколько
+# секунд запись живёт без перепроверки в БД
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', '10000'))
+SHORT_LINK_CACHE_TTL = int(os.getenv('SHORT_LINK_CACHE_TTL', '300'))
+
+# Потоков для фоновой нарезки картинок; 0 — нарезать прямо в запросе
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', '2'))
+
+# Лента подписок: новый рецепт раскладывается по лентам подписчиков
+# в FEED_FANOUT_WORKERS потоках (0 — прямо в запросе). Рецепты авторов,
+# у которых подписчиков больше FEED_FANOUT_MAX_FOLLOWERS, не
+# раскладываются, а подмешиваются при чтении. При подписке в ленту
+# добавляются последние FEED_BACKFILL_RECIPES рецептов автора.
+FEED_FANOUT_WORKERS = int(os.getenv('FEED_FANOUT_WORKERS', '2'))
+FEED_FANOUT_MAX_FOLLOWERS = int(
+    os.getenv('FEED_FANOUT_MAX_FOLLOWERS', '10000'))
+FEED_BACKFILL_RECIPES = int(os.getenv('FEED_BACKFILL_RECIPES', '100'))
+
+# Сколько секунд живёт кэш ответов рецептов для анонимов; 0 — выключен.
+# Без общего кэша (CACHE_URL) включить нельзя: воркер, не видевший
+# изменения, отдавал бы устаревший ответ до конца TTL.
+RESPONSE_CACHE_TTL = int(
+    os.getenv('RESPONSE_CACHE_TTL', '300' if SHARED_CACHE else '0'))
+
+# Сколько секунд живут закэшированные представления рецептов; 0 — выключено.
+# Как и кэш ответов, требует CACHE_URL.
+FRAGMENT_CACHE_TTL = int(
+    os.getenv('FRAGMENT_CACHE_TTL', '600' if SHARED_CACHE else '0'))
+
+for _name, _ttl in (('RESPONSE_CACHE_TTL', RESPONSE_CACHE_TTL),
+                    ('FRAGMENT_CACHE_TTL', FRAGMENT_CACHE_TTL)):
+    if _ttl > 0 and not SHARED_CACHE:
+        raise ImproperlyConfigured(
+            f'{_name} требует общего кэша: задайте CACHE_URL '
+            '(redis:// или db://) или выключите кэш значением 0'
+        )
+
+# Server-Timing: запросы дольше SLOW_REQUEST_MS логируются вместе
+# с SLOW_REQUEST_TOP_QUERIES самыми долгими SQL
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', '500'))
+SLOW_REQUEST_TOP_QUERIES = int(os.getenv('SLOW_REQUEST_TOP_QUERIES', '5'))
+# Превышение query_budgets вьюсета роняет запрос. Бюджеты — диагностика,
+# поэтому по умолчанию превышение только пишется в лог; включают
+# проверку бенчмарки (benchmark_api, benchmark_async) и CI
+QUERY_BUDGET_ENFORCE = os.getenv(
+    'QUERY_BUDGET_ENFORCE', 'false').lower() in ('1', 'true', 'yes')
+
+# Асинхронные версии поиска ингредиентов, карточки рецепта и
+# переключателей избранного/корзины/подписки (имеет смысл под ASGI)
+API_ASYNC_VIEWS = os.getenv(
+    'API_ASYNC_VIEWS', 'false').lower() in ('1', 'true', 'yes')
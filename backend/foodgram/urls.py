@@ -4,8 +4,11 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from api.views import short_link_redirect
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('s/<str:code>/', short_link_redirect, name='short-link'),
     path('api/', include('api.urls')),
     path("api/", include("djoser.urls.authtoken")),
 ]
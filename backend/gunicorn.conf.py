@@ -0,0 +1,84 @@
+"""
+Профиль gunicorn для продакшена.
+
+Приложение загружается и прогревается в мастере (api.warmup), после
+чего воркеры форкаются и делят прогретую память копией при записи.
+Режим и размеры берутся из окружения:
+  SERVER_MODE        asgi (по умолчанию; uvicorn-воркеры) или wsgi;
+  GUNICORN_WORKERS   число воркеров; по умолчанию по числу доступных
+                     CPU (cpu для asgi, 2 * cpu + 1 для wsgi), если
+                     задан общий кэш CACHE_URL, и 1 без него:
+                     процессные кэши и версии инвалидации в
+                     LocMem у каждого воркера свои;
+  GUNICORN_THREADS   потоков на wsgi-воркер (больше 1 — gthread);
+  GUNICORN_TIMEOUT   таймаут воркера, с;
+  GUNICORN_PRELOAD   0 — загружать и прогревать в каждом воркере.
+"""
+import gc
+import os
+
+
+def available_cpus():
+    """CPU, доступные процессу (учитывает cpuset контейнера)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _flag(name, default):
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+server_mode = os.getenv("SERVER_MODE", "asgi").lower()
+cpus = available_cpus()
+shared_cache = bool(os.getenv("CACHE_URL"))
+
+
+def _workers(per_cpu):
+    return int(os.getenv("GUNICORN_WORKERS", per_cpu if shared_cache else 1))
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+preload_app = _flag("GUNICORN_PRELOAD", "true")
+
+if server_mode == "asgi":
+    wsgi_app = "foodgram.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    workers = _workers(cpus)
+    # Приложение читает флаг при импорте urlconf, то есть уже после
+    # этого файла.
+    os.environ.setdefault("API_ASYNC_VIEWS", "true")
+else:
+    wsgi_app = "foodgram.wsgi:application"
+    threads = int(os.getenv("GUNICORN_THREADS", "1"))
+    worker_class = "gthread" if threads > 1 else "sync"
+    workers = _workers(2 * cpus + 1)
+
+
+def _warm_up(log):
+    from api.warmup import warm_up
+
+    for step, (size, duration) in warm_up().items():
+        log.info("Прогрев %s: %s за %s мс", step, size, duration)
+
+
+def on_starting(server):
+    if not shared_cache and server.cfg.workers > 1:
+        server.log.warning(
+            "CACHE_URL не задан, а воркеров %s: инвалидация кэшей "
+            "не дойдёт до соседних процессов", server.cfg.workers)
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    _warm_up(server.log)
+    # Объекты мастера больше не трогает сборщик мусора, и страницы
+    # с ними не копируются в воркерах.
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        _warm_up(worker.log)
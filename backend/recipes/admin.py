@@ -3,6 +3,7 @@ from django.contrib import admin
 from django.db.models import Count
 from django.utils.html import format_html
 
+from .image_variants import variant_url
 from .models import (
     Ingredient,
     Recipe,
@@ -10,6 +11,7 @@ from .models import (
     Favorite,
     ShoppingCart,
 )
+from .signals import track_recipe_ingredients
 
 
 @admin.register(Ingredient)
@@ -75,7 +77,9 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = (RecipeIngredientInline, FavoriteInline, ShoppingCartInline)
     save_on_top = True
     list_per_page = 30
-    readonly_fields = ("favorites_count", "image_preview")
+    readonly_fields = (
+        "favorites_count", "carts_count", "image_preview", "pub_date",
+    )
     empty_value_display = "—"
 
     fieldsets = (
@@ -93,21 +97,22 @@ class RecipeAdmin(admin.ModelAdmin):
             "Изображение",
             {"fields": ("image", "image_preview")},
         ),
-        ("Служебные", {"fields": ("pub_date",)}),
+        (
+            "Служебные",
+            {"fields": ("pub_date", ("favorites_count", "carts_count"))},
+        ),
     )
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(fav_cnt=Count("favorites"))
-
-    def favorites_count(self, obj):
-        return obj.fav_cnt
+    def save_related(self, request, form, formsets, change):
+        with track_recipe_ingredients(form.instance):
+            super().save_related(request, form, formsets, change)
 
     def image_preview(self, obj):
         if obj.image:
             return format_html(
                 '<img src="{}" width="75" height="75" '
                 'style="object-fit: cover; border-radius: 4px;" />',
-                obj.image.url,
+                variant_url(obj, "thumbnail"),
             )
         return "—"
 
@@ -121,6 +126,19 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
     list_per_page = 50
     empty_value_display = "—"
 
+    def save_model(self, request, obj, form, change):
+        with track_recipe_ingredients(obj.recipe):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with track_recipe_ingredients(obj.recipe):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for recipe_id in set(queryset.values_list("recipe_id", flat=True)):
+            with track_recipe_ingredients(Recipe(pk=recipe_id)):
+                queryset.filter(recipe_id=recipe_id).delete()
+
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
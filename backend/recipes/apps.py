@@ -1,7 +1,103 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_delete
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "recipes"
     verbose_name = "База"
+
+    def ready(self):
+        from users.models import Follow
+
+        from . import (
+            counters, feed, ingredient_postings, shopping_list, similarity,
+        )
+        from .ingredient_index import invalidate_ingredient_index
+        from .models import Favorite, Ingredient, Recipe, ShoppingCart
+        from .short_links import forget_recipe_link
+        from .signals import recipe_ingredients_changed
+
+        post_save.connect(
+            invalidate_ingredient_index,
+            sender=Ingredient,
+            dispatch_uid="ingredient_index_on_save",
+        )
+        post_delete.connect(
+            invalidate_ingredient_index,
+            sender=Ingredient,
+            dispatch_uid="ingredient_index_on_delete",
+        )
+        post_save.connect(
+            shopping_list.on_cart_saved,
+            sender=ShoppingCart,
+            dispatch_uid="shopping_list_on_cart_save",
+        )
+        pre_delete.connect(
+            shopping_list.on_cart_deleted,
+            sender=ShoppingCart,
+            dispatch_uid="shopping_list_on_cart_delete",
+        )
+        recipe_ingredients_changed.connect(
+            shopping_list.on_recipe_ingredients_changed,
+            dispatch_uid="shopping_list_on_ingredients_change",
+        )
+        recipe_ingredients_changed.connect(
+            similarity.on_recipe_ingredients_changed,
+            dispatch_uid="similarity_on_ingredients_change",
+        )
+        recipe_ingredients_changed.connect(
+            ingredient_postings.on_recipe_changed,
+            dispatch_uid="ingredient_postings_on_ingredients_change",
+        )
+        post_save.connect(
+            ingredient_postings.on_recipe_changed,
+            sender=Recipe,
+            dispatch_uid="ingredient_postings_on_recipe_save",
+        )
+        post_delete.connect(
+            ingredient_postings.on_recipe_changed,
+            sender=Recipe,
+            dispatch_uid="ingredient_postings_on_recipe_delete",
+        )
+        for relation in (Favorite, ShoppingCart):
+            post_save.connect(
+                counters.on_relation_saved,
+                sender=relation,
+                dispatch_uid=f"counters_on_{relation.__name__}_save",
+            )
+            post_delete.connect(
+                counters.on_relation_deleted,
+                sender=relation,
+                dispatch_uid=f"counters_on_{relation.__name__}_delete",
+            )
+        post_save.connect(
+            counters.on_recipe_saved,
+            sender=Recipe,
+            dispatch_uid="counters_on_recipe_save",
+        )
+        post_delete.connect(
+            counters.on_recipe_deleted,
+            sender=Recipe,
+            dispatch_uid="counters_on_recipe_delete",
+        )
+        post_save.connect(
+            feed.on_recipe_saved,
+            sender=Recipe,
+            dispatch_uid="feed_on_recipe_save",
+        )
+        post_save.connect(
+            feed.on_follow_saved,
+            sender=Follow,
+            dispatch_uid="feed_on_follow_save",
+        )
+        post_delete.connect(
+            feed.on_follow_deleted,
+            sender=Follow,
+            dispatch_uid="feed_on_follow_delete",
+        )
+        post_delete.connect(
+            forget_recipe_link,
+            sender=Recipe,
+            dispatch_uid="short_links_on_recipe_delete",
+        )
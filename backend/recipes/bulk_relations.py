@@ -0,0 +1,93 @@
+"""
+Пакетное добавление и удаление рецептов в избранном и корзине.
+
+Один INSERT … ON CONFLICT DO NOTHING или один DELETE … WHERE recipe_id
+IN вместо запроса на рецепт. Оба возвращают через RETURNING только те
+строки, которые действительно вставили или удалили, поэтому при двух
+одновременных одинаковых запросах каждую связь засчитывает ровно один
+из них. Сигналы моделей при этом не срабатывают, так что счётчики и
+материализованный список покупок правятся здесь же — одним UPDATE на
+каждый.
+"""
+from django.db import connection, transaction
+from django.db.models import F, Sum
+
+from . import shopping_list
+from .counters import RELATION_COUNTERS
+from .models import Recipe, RecipeIngredient, ShoppingCart
+
+
+def _returning_recipe_ids(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def _columns(model):
+    quote = connection.ops.quote_name
+    return (
+        quote(model._meta.db_table),
+        quote(model._meta.get_field("user").column),
+        quote(model._meta.get_field("recipe").column),
+    )
+
+
+def _recipes_amounts(recipe_ids):
+    """Суммарный состав рецептов: {ingredient_id: amount}."""
+    return dict(
+        RecipeIngredient.objects
+        .filter(recipe_id__in=recipe_ids)
+        .order_by()
+        .values("ingredient_id")
+        .annotate(total=Sum("amount"))
+        .values_list("ingredient_id", "total")
+    )
+
+
+def _apply(model, user_id, recipe_ids, sign):
+    field = RELATION_COUNTERS[model]
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        **{field: F(field) + sign})
+    if model is ShoppingCart:
+        shopping_list.apply_deltas(
+            (user_id,),
+            {
+                ingredient_id: sign * amount
+                for ingredient_id, amount
+                in _recipes_amounts(recipe_ids).items()
+            },
+        )
+
+
+@transaction.atomic
+def add_recipes(model, user_id, recipe_ids):
+    """Добавляет рецепты; возвращает множество id, которых ещё не было."""
+    if not recipe_ids:
+        return set()
+    table, user_column, recipe_column = _columns(model)
+    added = _returning_recipe_ids(
+        f"INSERT INTO {table} ({user_column}, {recipe_column}) "
+        f"VALUES {', '.join(['(%s, %s)'] * len(recipe_ids))} "
+        f"ON CONFLICT DO NOTHING RETURNING {recipe_column}",
+        [value for pk in recipe_ids for value in (user_id, pk)],
+    )
+    if added:
+        _apply(model, user_id, added, 1)
+    return added
+
+
+@transaction.atomic
+def remove_recipes(model, user_id, recipe_ids):
+    """Удаляет рецепты; возвращает множество id, которые были в списке."""
+    if not recipe_ids:
+        return set()
+    table, user_column, recipe_column = _columns(model)
+    removed = _returning_recipe_ids(
+        f"DELETE FROM {table} WHERE {user_column} = %s "
+        f"AND {recipe_column} IN ({', '.join(['%s'] * len(recipe_ids))}) "
+        f"RETURNING {recipe_column}",
+        [user_id, *recipe_ids],
+    )
+    if removed:
+        _apply(model, user_id, removed, -1)
+    return removed
@@ -0,0 +1,240 @@
+"""
+Потоковый идемпотентный импорт справочника ингредиентов.
+
+Файл — JSON-массив объектов {"name": ..., "unit": ...}. Он читается
+кусками и разбирается по одному элементу через raw_decode, так что в
+памяти не лежит ни весь текст, ни весь список объектов — только ключи
+уже увиденных записей (для дублей и поиска устаревших).
+
+Записи обрабатываются пачками. На пачку один SELECT по именам, затем:
+  * (name, unit) уже есть — без изменений;
+  * у имени в БД есть единица, которой нет в файле, а в файле у него
+    новая единица — запись обновляется на месте (ссылки из рецептов
+    сохраняются);
+  * иначе — вставка с ON CONFLICT DO NOTHING по unique_ingredient,
+    чтобы параллельный импорт не уронил команду; добавленными
+    считаются только строки, которые вернул RETURNING.
+Записи одного имени в пачке не разрываются, поэтому смену единицы
+видно и на границе пачек, если файл отсортирован по имени.
+
+Если SHA-256 файла совпадает с последним успешным импортом, работа
+пропускается целиком: entrypoint.sh запускает create_data при каждом
+старте контейнера.
+"""
+import hashlib
+import json
+
+from django.db import connection, transaction
+
+from .ingredient_index import ingredient_index
+from .models import CatalogImport, Ingredient
+from .signals import bulk_data_loaded
+
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 1000
+NUMBER_TERMINATORS = frozenset(",] \t\r\n")
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as stream:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_json_array(stream, chunk_size=CHUNK_SIZE):
+    """Элементы JSON-массива верхнего уровня, по одному."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    def skip_blank():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            fill()
+
+    skip_blank()
+    if buffer[position:position + 1] != "[":
+        raise ValueError("ожидался JSON-массив")
+    position += 1
+    skip_blank()
+    if buffer[position:position + 1] == "]":
+        return
+    while True:
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Элемент мог оборваться на границе куска — дочитываем.
+                if eof:
+                    raise
+                fill()
+                continue
+            # Число на границе куска может оказаться обрезанным
+            # ("3" из "3.5"): верим элементу, только когда за ним
+            # уже виден разделитель.
+            if not eof and (
+                end == len(buffer)
+                or buffer[end] not in NUMBER_TERMINATORS
+            ):
+                fill()
+                continue
+            break
+        position = end
+        yield item
+        skip_blank()
+        separator = buffer[position:position + 1]
+        position += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(
+                f"ожидалась запятая или ], получено {separator!r}")
+        skip_blank()
+
+
+def _group_by_name(items, batch_size):
+    """Пачки {имя: [единицы]} без разрыва подряд идущих записей имени."""
+    batch = {}
+    size = 0
+    for name, unit in items:
+        if size >= batch_size and name not in batch:
+            yield batch
+            batch, size = {}, 0
+        batch.setdefault(name, []).append(unit)
+        size += 1
+    if batch:
+        yield batch
+
+
+def _insert_new(keys):
+    """Вставляет пары (имя, единица); возвращает, сколько строк добавлено."""
+    quote = connection.ops.quote_name
+    meta = Ingredient._meta
+    added = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(keys), BATCH_SIZE):
+            rows = keys[start:start + BATCH_SIZE]
+            cursor.execute(
+                f"INSERT INTO {quote(meta.db_table)} "
+                f"({quote(meta.get_field('name').column)}, "
+                f"{quote(meta.get_field('measurement_unit').column)}) "
+                f"VALUES {', '.join(['(%s, %s)'] * len(rows))} "
+                f"ON CONFLICT DO NOTHING RETURNING {quote(meta.pk.column)}",
+                [value for key in rows for value in key],
+            )
+            added += len(cursor.fetchall())
+    return added
+
+
+def _import_batch(batch, seen, stats):
+    """`seen` — все ключи файла до конца этой пачки включительно."""
+    existing = {}
+    for ingredient in Ingredient.objects.filter(name__in=batch):
+        existing.setdefault(ingredient.name, {})[
+            ingredient.measurement_unit] = ingredient
+
+    to_create, to_update = [], []
+    for name, units in batch.items():
+        stored = existing.get(name, {})
+        stale = [
+            ingredient for unit, ingredient in stored.items()
+            if (name, unit) not in seen
+        ]
+        for unit in units:
+            if unit in stored:
+                stats["unchanged"] += 1
+            elif stale:
+                ingredient = stale.pop()
+                ingredient.measurement_unit = unit
+                to_update.append(ingredient)
+            else:
+                to_create.append((name, unit))
+
+    with transaction.atomic():
+        if to_update:
+            Ingredient.objects.bulk_update(to_update, ["measurement_unit"])
+        added = _insert_new(to_create)
+    stats["updated"] += len(to_update)
+    stats["added"] += added
+    # Строку успел вставить параллельный импорт — она уже есть в БД
+    stats["unchanged"] += len(to_create) - added
+
+
+def _prune(seen):
+    """Удаляет отсутствующие в файле ингредиенты, на которые нет ссылок."""
+    stale_ids = [
+        pk for pk, name, unit in Ingredient.objects.filter(
+            ingredient_recipes__isnull=True,
+            shopping_list_items__isnull=True,
+        ).values_list("pk", "name", "measurement_unit").iterator()
+        if (name, unit) not in seen
+    ]
+    deleted = 0
+    for start in range(0, len(stale_ids), BATCH_SIZE):
+        deleted += Ingredient.objects.filter(
+            pk__in=stale_ids[start:start + BATCH_SIZE]).delete()[0]
+    return deleted
+
+
+def import_ingredients(path, batch_size=BATCH_SIZE, prune=False,
+                       force=False):
+    """
+    Импортирует справочник и возвращает счётчики added, updated,
+    unchanged, invalid, duplicates, removed и флаг skipped (файл не
+    менялся с прошлого импорта).
+    """
+    stats = dict.fromkeys(
+        ("added", "updated", "unchanged", "invalid", "duplicates",
+         "removed"), 0)
+    source = path.name
+    checksum = file_checksum(path)
+    if not (force or prune) and CatalogImport.objects.filter(
+            source=source, checksum=checksum).exists():
+        return {**stats, "skipped": True}
+
+    seen = set()
+
+    def valid_items(stream):
+        for item in iter_json_array(stream):
+            name = isinstance(item, dict) and item.get("name")
+            unit = isinstance(item, dict) and item.get("unit")
+            if not (isinstance(name, str) and isinstance(unit, str)
+                    and name.strip() and unit.strip()):
+                stats["invalid"] += 1
+                continue
+            key = (name.strip(), unit.strip())
+            if key in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(key)
+            yield key
+
+    with open(path, encoding="utf-8") as stream:
+        for batch in _group_by_name(valid_items(stream), batch_size):
+            _import_batch(batch, seen, stats)
+    if prune:
+        stats["removed"] = _prune(seen)
+
+    if stats["added"] or stats["updated"] or stats["removed"]:
+        # bulk-операции не шлют post_save: индекс ингредиентов и кэш
+        # ответов сбрасываем сами.
+        ingredient_index.invalidate()
+        bulk_data_loaded.send(sender=Ingredient)
+    CatalogImport.objects.update_or_create(
+        source=source, defaults={"checksum": checksum})
+    return {**stats, "skipped": False}
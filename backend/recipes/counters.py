@@ -0,0 +1,74 @@
+"""
+Денормализованные счётчики популярности.
+
+Recipe.favorites_count / carts_count и User.recipes_count меняются
+атомарным UPDATE с F() по сигналам создания и удаления связей, поэтому
+админка и сериализаторы читают готовые числа вместо Count().
+Массовые операции сигналов не шлют: после них нужен recount_counters.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Favorite, Recipe, ShoppingCart
+
+
+def change_counter(model, pk, field, delta):
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def count_subquery(model, field):
+    """Подзапрос COUNT(*) по `model`, где `field` ссылается на внешнюю строку."""
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("*"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount():
+    """Пересчитывает все счётчики с нуля."""
+    from users.models import Follow
+
+    Recipe.objects.update(
+        favorites_count=count_subquery(Favorite, "recipe"),
+        carts_count=count_subquery(ShoppingCart, "recipe"),
+    )
+    get_user_model().objects.update(
+        recipes_count=count_subquery(Recipe, "author"),
+        followers_count=count_subquery(Follow, "author"),
+        following_count=count_subquery(Follow, "user"),
+    )
+
+
+RELATION_COUNTERS = {
+    Favorite: "favorites_count",
+    ShoppingCart: "carts_count",
+}
+
+
+def on_relation_saved(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe, instance.recipe_id, RELATION_COUNTERS[sender], 1)
+
+
+def on_relation_deleted(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, RELATION_COUNTERS[sender], -1)
+
+
+def on_recipe_saved(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            get_user_model(), instance.author_id, "recipes_count", 1)
+
+
+def on_recipe_deleted(sender, instance, **kwargs):
+    change_counter(get_user_model(), instance.author_id, "recipes_count", -1)
@@ -0,0 +1,34 @@
+"""
+Пересборка производных данных после массовой загрузки.
+
+bulk_create и COPY не шлют сигналов, поэтому счётчики, списки покупок,
+ленты подписок, подписи похожих рецептов и процессные индексы
+ингредиентов после них надо восстановить явно.
+"""
+from . import counters, feed, shopping_list
+from .ingredient_index import ingredient_index
+from .ingredient_postings import IngredientPostings
+from .models import Recipe
+from .signals import bulk_data_loaded
+from .similarity import rebuild_signatures
+
+
+def refresh_derived_data(signatures=True, report=None):
+    """
+    `signatures=False` пропускает подписи похожих рецептов — на миллионах
+    рецептов это самый долгий шаг, его можно доделать командой
+    build_recipe_signatures. `report(шаг)` вызывается перед каждым шагом.
+    """
+    report = report or (lambda step: None)
+    report("счётчики")
+    counters.recount()
+    report("списки покупок")
+    shopping_list.rebuild()
+    report("ленты подписок")
+    feed.rebuild()
+    if signatures:
+        report("подписи похожих рецептов")
+        rebuild_signatures()
+    ingredient_index.invalidate()
+    IngredientPostings.invalidate()
+    bulk_data_loaded.send(sender=Recipe)
@@ -0,0 +1,287 @@
+"""
+Лента «рецепты авторов, на которых я подписан».
+
+Fan-out on write: новый рецепт после коммита раскладывается в
+TimelineEntry всех подписчиков автора (в пуле потоков, пачками
+bulk_create). Чтение ленты — один диапазонный проход по индексу
+(user, -pub_date, -recipe) с keyset-условием, без JOIN Follow → Recipe.
+
+Авторы, у которых подписчиков больше FEED_FANOUT_MAX_FOLLOWERS, не
+раскладываются: их рецепты подмешиваются при чтении (fan-out on read)
+отдельным запросом по индексу рецептов. Их старые записи в лентах,
+оставшиеся с тех пор, когда подписчиков было меньше, при чтении
+отбрасываются, а при падении ниже порога ленты подписчиков
+заполняются заново.
+
+При подписке в ленту добавляются последние FEED_BACKFILL_RECIPES
+рецептов автора, при отписке его записи удаляются.
+
+Раскладка и дозаполнение идут после коммита и могут отстать от
+отписки. Поэтому записи вставляются пачками подписчиков в транзакции,
+которая держит их строки Follow: отписка, удаляющая записи автора,
+ждёт её коммита и удаляет в том числе только что вставленное, а уже
+удалённой подписки в пачке нет.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from heapq import merge
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Recipe, TimelineEntry
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.FEED_FANOUT_WORKERS,
+                thread_name_prefix="feed-fanout",
+            )
+        return _executor
+
+
+def _run_in_worker(task, *args):
+    try:
+        task(*args)
+    except Exception:
+        logger.exception("Не удалось обновить ленты: %s%s",
+                         task.__name__, args)
+    finally:
+        connection.close()
+
+
+def schedule(task, *args):
+    """После коммита выполняет task в пуле (или сразу, если потоков 0)."""
+    def run():
+        if settings.FEED_FANOUT_WORKERS <= 0:
+            task(*args)
+        else:
+            get_executor().submit(_run_in_worker, task, *args)
+    transaction.on_commit(run)
+
+
+def _followers(author_id):
+    from users.models import Follow
+
+    # order_by(): сортировка Follow по умолчанию тянет JOIN на username
+    return Follow.objects.filter(author_id=author_id).order_by()
+
+
+def _is_pulled(author_id):
+    """Автор слишком популярен для fan-out on write."""
+    from django.contrib.auth import get_user_model
+
+    return get_user_model().objects.filter(
+        pk=author_id,
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def _write(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def _write_for_followers(author_id, entries_for, user_id=None):
+    """
+    Пишет entries_for(follower_id) в ленты подписчиков автора (или
+    только user_id, если он ещё подписан) пачками по BATCH_SIZE
+    подписчиков, каждую — под блокировкой их строк Follow.
+    """
+    last_id = 0
+    while True:
+        followers = _followers(author_id).filter(user_id__gt=last_id)
+        if user_id is not None:
+            followers = followers.filter(user_id=user_id)
+        with transaction.atomic():
+            batch = list(
+                followers.select_for_update(no_key=True)
+                .order_by("user_id")
+                .values_list("user_id", flat=True)[:BATCH_SIZE]
+            )
+            _write([
+                entry for follower_id in batch
+                for entry in entries_for(follower_id)
+            ])
+        if len(batch) < BATCH_SIZE:
+            return
+        last_id = batch[-1]
+
+
+def fan_out(recipe_id):
+    """Кладёт рецепт в ленты всех подписчиков автора."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        "author_id", "pub_date").first()
+    if recipe is None or _is_pulled(recipe.author_id):
+        return
+    _write_for_followers(recipe.author_id, lambda follower_id: [
+        TimelineEntry(user_id=follower_id, recipe_id=recipe.pk,
+                      author_id=recipe.author_id, pub_date=recipe.pub_date)
+    ])
+
+
+def _latest_recipes(author_id):
+    return Recipe.objects.filter(author_id=author_id).order_by(
+        "-pub_date", "-pk"
+    ).values_list("pk", "pub_date")[:settings.FEED_BACKFILL_RECIPES]
+
+
+def _entries_for(author_id, recipes):
+    return lambda follower_id: [
+        TimelineEntry(user_id=follower_id, recipe_id=pk,
+                      author_id=author_id, pub_date=pub_date)
+        for pk, pub_date in recipes
+    ]
+
+
+def backfill(user_id, author_id):
+    """Новая подписка: последние рецепты автора — в ленту подписчика."""
+    if _is_pulled(author_id):
+        return
+    _write_for_followers(
+        author_id, _entries_for(author_id, list(_latest_recipes(author_id))),
+        user_id=user_id,
+    )
+
+
+def backfill_followers(author_id):
+    """Автор опустился ниже порога: заполняем ленты всех подписчиков."""
+    if _is_pulled(author_id):
+        return
+    _write_for_followers(
+        author_id, _entries_for(author_id, list(_latest_recipes(author_id))))
+
+
+def rebuild():
+    """
+    Пересобирает все ленты одним INSERT … SELECT: последние
+    FEED_BACKFILL_RECIPES рецептов каждого не слишком популярного
+    автора — каждому его подписчику. Нужна после массовой загрузки.
+    """
+    from django.contrib.auth import get_user_model
+
+    from users.models import Follow
+
+    quote = connection.ops.quote_name
+    user_table = quote(get_user_model()._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        TimelineEntry.objects.all().delete()
+        cursor.execute(
+            f"""
+            INSERT INTO {quote(TimelineEntry._meta.db_table)}
+                (user_id, recipe_id, author_id, pub_date)
+            SELECT f.user_id, r.id, r.author_id, r.pub_date
+            FROM {quote(Follow._meta.db_table)} f
+            JOIN {user_table} u
+                ON u.id = f.author_id AND u.followers_count <= %s
+            JOIN (
+                SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+                    PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+                ) AS position
+                FROM {quote(Recipe._meta.db_table)}
+            ) r ON r.author_id = f.author_id AND r.position <= %s
+            """,
+            [settings.FEED_FANOUT_MAX_FOLLOWERS,
+             settings.FEED_BACKFILL_RECIPES],
+        )
+
+
+class Timeline:
+    """Лента пользователя для RecipeKeysetPagination.fetch_page."""
+
+    def __init__(self, user):
+        self.user = user
+
+    def pulled_author_ids(self):
+        return list(
+            self.user.following.filter(
+                author__followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+            ).order_by().values_list("author_id", flat=True)
+        )
+
+    def page(self, position, reverse, size):
+        """
+        До `size` рецептов после `position` = (pub_date, id), от новых
+        к старым (при reverse — от старых к новым).
+        """
+        pulled = self.pulled_author_ids()
+        entries = TimelineEntry.objects.filter(user=self.user)
+        if pulled:
+            entries = entries.exclude(author_id__in=pulled)
+        entries = _after(entries, position, reverse, "recipe_id")
+        direction = "" if reverse else "-"
+        recipes = [
+            entry.recipe for entry in entries.select_related(
+                "recipe__author"
+            ).defer("recipe__search_vector").order_by(
+                f"{direction}pub_date", f"{direction}recipe_id"
+            )[:size]
+        ]
+        if not pulled:
+            return recipes
+
+        pulled_recipes = _after(
+            Recipe.objects.filter(author_id__in=pulled),
+            position, reverse, "pk",
+        ).select_related("author").defer("search_vector").order_by(
+            f"{direction}pub_date", f"{direction}pk"
+        )[:size]
+        return list(merge(
+            recipes, pulled_recipes,
+            key=lambda recipe: (recipe.pub_date, recipe.pk),
+            reverse=not reverse,
+        ))[:size]
+
+
+def _after(queryset, position, reverse, pk_field):
+    if position is None:
+        return queryset
+    pub_date, pk = position
+    if reverse:
+        return queryset.filter(
+            Q(pub_date__gt=pub_date)
+            | Q(pub_date=pub_date, **{f"{pk_field}__gt": pk})
+        )
+    return queryset.filter(
+        Q(pub_date__lt=pub_date)
+        | Q(pub_date=pub_date, **{f"{pk_field}__lt": pk})
+    )
+
+
+def on_recipe_saved(sender, instance, created, **kwargs):
+    if created:
+        schedule(fan_out, instance.pk)
+
+
+def on_follow_saved(sender, instance, created, **kwargs):
+    if created:
+        schedule(backfill, instance.user_id, instance.author_id)
+
+
+def on_follow_deleted(sender, instance, **kwargs):
+    # Отписка убирает автора из ленты сразу, в той же транзакции.
+    TimelineEntry.objects.filter(
+        user_id=instance.user_id, author_id=instance.author_id).delete()
+    schedule(_after_unfollow, instance.author_id)
+
+
+def _after_unfollow(author_id):
+    from django.contrib.auth import get_user_model
+
+    # Ровно на пороге — значит, только что опустился с порога + 1.
+    if get_user_model().objects.filter(
+        pk=author_id, followers_count=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).exists():
+        backfill_followers(author_id)
@@ -0,0 +1,51 @@
+"""
+Чтение карты вариантов картинок из моделей.
+
+Варианты строит api.images и записывает в JSON-поле модели
+(`image_variants` у рецепта, `avatar_variants` у пользователя) вместе
+с именем исходника. Здесь — только выбор готовых вариантов и их URL,
+поэтому админка моделей не зависит от приложения api.
+"""
+from django.contrib.auth import get_user_model
+
+from .models import Recipe
+
+
+def image_fields():
+    """Модели с картинками: {модель: (поле файла, поле вариантов)}."""
+    return {
+        Recipe: ("image", "image_variants"),
+        get_user_model(): ("avatar", "avatar_variants"),
+    }
+
+
+def ready_variants(image, variants):
+    """
+    {вариант: путь} для текущего файла `image`; пусто, пока варианты
+    построены для другого исходника или не построены вовсе.
+    """
+    variants = variants or {}
+    if not image or variants.get("source") != image.name:
+        return {}
+    return {
+        variant: path for variant, path in variants.items()
+        if variant != "source" and path
+    }
+
+
+def variant_urls(image, variants):
+    """{вариант: URL} готовых вариантов в хранилище поля картинки."""
+    return {
+        variant: image.storage.url(path)
+        for variant, path in ready_variants(image, variants).items()
+    }
+
+
+def variant_url(obj, variant):
+    """URL варианта картинки объекта, либо оригинала, пока вариант не готов."""
+    file_field, variants_field = image_fields()[type(obj)]
+    image = getattr(obj, file_field)
+    if not image:
+        return None
+    path = ready_variants(image, getattr(obj, variants_field)).get(variant)
+    return image.storage.url(path) if path else image.url
@@ -0,0 +1,111 @@
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Ingredient
+
+VERSION_CACHE_KEY = "recipes:ingredient_index:version"
+
+
+class IngredientIndex:
+    """
+    Процессный индекс ингредиентов для автодополнения.
+
+    Хранит отсортированный по casefold-имени массив строк и ищет префикс
+    двоичным поиском, так что `/api/ingredients/?name=` обслуживается
+    без обращения к БД. Индекс перестраивается при смене версии в кэше
+    (её повышают сигналы модели и create_data) и не реже раза в TTL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = None
+        self._built_at = 0.0
+
+    @property
+    def ttl(self):
+        return getattr(settings, "INGREDIENT_INDEX_TTL", 300)
+
+    def build(self):
+        """Загружает каталог из БД и атомарно подменяет индекс."""
+        # Версия читается до выборки: инвалидация посреди загрузки
+        # оставит индекс со старой версией, и следующий запрос его
+        # перестроит.
+        version = cache.get(VERSION_CACHE_KEY)
+        rows = sorted(
+            Ingredient.objects.values("id", "name", "measurement_unit"),
+            key=lambda row: (row["name"].casefold(), row["measurement_unit"]),
+        )
+        keys = [row["name"].casefold() for row in rows]
+        with self._lock:
+            self._data = (keys, rows)
+            self._version = version
+            self._built_at = time.monotonic()
+        return self._data
+
+    def invalidate(self):
+        """Помечает индекс устаревшим во всех процессах с общим кэшем."""
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.set(VERSION_CACHE_KEY, 1, timeout=None)
+        with self._lock:
+            self._data = None
+
+    def _stale(self, data, version):
+        return (
+            data is None
+            or time.monotonic() - self._built_at > self.ttl
+            or version != self._version
+        )
+
+    def _current(self):
+        data = self._data
+        if self._stale(data, cache.get(VERSION_CACHE_KEY)):
+            data = self.build()
+        return data
+
+    async def _acurrent(self):
+        data = self._data
+        if self._stale(data, await cache.aget(VERSION_CACHE_KEY)):
+            data = await sync_to_async(self.build)()
+        return data
+
+    def search(self, prefix=""):
+        """
+        Ищет ингредиенты по началу названия без учёта регистра.
+
+        Точные совпадения идут первыми: в отсортированном массиве
+        ключ, равный префиксу, всегда предшествует его продолжениям.
+        """
+        return self._search(self._current(), prefix)
+
+    async def asearch(self, prefix=""):
+        """search() для async-вью: в БД идёт только при пересборке."""
+        return self._search(await self._acurrent(), prefix)
+
+    @staticmethod
+    def _search(data, prefix):
+        keys, rows = data
+        prefix = prefix.casefold()
+        if not prefix:
+            return list(rows)
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + "\U0010ffff", lo=start)
+        return rows[start:end]
+
+
+ingredient_index = IngredientIndex()
+
+
+def invalidate_ingredient_index(**kwargs):
+    # Версия растёт после коммита: иначе соседний воркер успеет собрать
+    # индекс из ещё незакоммиченного каталога и пометить его новой
+    # версией, и старые данные проживут до истечения TTL.
+    transaction.on_commit(ingredient_index.invalidate)
@@ -0,0 +1,255 @@
+"""
+Инвертированный индекс «ингредиент → рецепты».
+
+Для каждого ингредиента в памяти процесса лежит отсортированный массив
+id рецептов (posting list). Запрос «все из списка» пересекает массивы
+от самого короткого, «любой из списка» — объединяет их, так что
+фильтр по нескольким ингредиентам не требует JOIN/GROUP BY в БД.
+Рядом хранятся массивы, индексированные id рецепта: число ингредиентов
+и время приготовления — по ним считается покрытие рецептов «кладовой».
+
+Индекс строится лениво одним проходом по RecipeIngredient. Сохранения,
+изменения состава и удаления рецептов публикуются в журнал в кэше
+(версия + id рецепта под ключом этой версии). Каждый процесс перед
+запросом проигрывает пропущенные записи, перечитывая только эти рецепты. Если журнал вытеснен или отстал слишком сильно, индекс
+перестраивается целиком; раз в INGREDIENT_POSTINGS_TTL — тоже.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import chain
+from math import log2
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import RecipeIngredient
+
+VERSION_CACHE_KEY = "recipes:ingredient_postings:version"
+CHANGE_CACHE_KEY = "recipes:ingredient_postings:change:{}"
+# Дольше этого записи журнала не нужны: индекс всё равно перестроится по TTL
+CHANGE_LOG_TIMEOUT = 3600
+MAX_REPLAY = 500
+
+EMPTY = array("q")
+
+
+def _contains(posting, recipe_id):
+    position = bisect_left(posting, recipe_id)
+    return position < len(posting) and posting[position] == recipe_id
+
+
+def _put(values, recipe_id, value):
+    """Записывает значение по id рецепта, расширяя массив при нужде."""
+    if recipe_id >= len(values):
+        values.extend([0] * (recipe_id + 1 - len(values)))
+    values[recipe_id] = value
+
+
+def _intersect(smaller, larger):
+    """Пересечение отсортированных массивов в виде отсортированного массива."""
+    if not smaller or not larger:
+        return EMPTY
+    if len(smaller) * log2(len(larger) + 1) < len(larger):
+        return array(
+            "q", (item for item in smaller if _contains(larger, item))
+        )
+    return array("q", sorted(set(smaller).intersection(larger)))
+
+
+class IngredientPostings:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None
+        self._sizes = array("H")
+        self._cooking_times = array("I")
+        self._version = 0
+        self._built_at = 0.0
+
+    @property
+    def ttl(self):
+        return getattr(settings, "INGREDIENT_POSTINGS_TTL", 600)
+
+    def _build(self):
+        version = cache.get(VERSION_CACHE_KEY, 0)
+        postings = {}
+        # Время приготовления — из той же выборки: отдельный запрос мог
+        # не увидеть рецепт, удалённый между ними, и массивы разошлись бы.
+        rows = (
+            RecipeIngredient.objects
+            .order_by("ingredient_id", "recipe_id")
+            .values_list("ingredient_id", "recipe_id", "recipe__cooking_time")
+            .iterator(chunk_size=10000)
+        )
+        sizes = array("H")
+        cooking_times = array("I")
+        for ingredient_id, recipe_id, cooking_time in rows:
+            posting = postings.get(ingredient_id)
+            if posting is None:
+                posting = postings[ingredient_id] = array("q")
+            posting.append(recipe_id)
+            _put(sizes, recipe_id, (
+                sizes[recipe_id] if recipe_id < len(sizes) else 0) + 1)
+            _put(cooking_times, recipe_id, cooking_time)
+        self._postings = postings
+        self._sizes = sizes
+        self._cooking_times = cooking_times
+        self._version = version
+        self._built_at = time.monotonic()
+
+    def _replay(self, version):
+        keys = [
+            CHANGE_CACHE_KEY.format(step)
+            for step in range(self._version + 1, version + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return False
+        recipe_ids = set(changes.values())
+        for posting in self._postings.values():
+            for recipe_id in recipe_ids:
+                position = bisect_left(posting, recipe_id)
+                if position < len(posting) and posting[position] == recipe_id:
+                    del posting[position]
+        for recipe_id in recipe_ids:
+            _put(self._sizes, recipe_id, 0)
+            _put(self._cooking_times, recipe_id, 0)
+        rows = (
+            RecipeIngredient.objects
+            .filter(recipe_id__in=recipe_ids)
+            .values_list("ingredient_id", "recipe_id", "recipe__cooking_time")
+        )
+        for ingredient_id, recipe_id, cooking_time in rows:
+            insort(self._postings.setdefault(ingredient_id, array("q")),
+                   recipe_id)
+            self._sizes[recipe_id] += 1
+            self._cooking_times[recipe_id] = cooking_time
+        self._version = version
+        return True
+
+    def _sync(self):
+        if (
+            self._postings is None
+            or time.monotonic() - self._built_at > self.ttl
+        ):
+            self._build()
+            return
+        version = cache.get(VERSION_CACHE_KEY, 0)
+        if version == self._version:
+            return
+        if (
+            version < self._version
+            or version - self._version > MAX_REPLAY
+            or not self._replay(version)
+        ):
+            self._build()
+
+    def match(self, ingredient_ids, match_all=True):
+        """Отсортированный массив id рецептов с этими ингредиентами."""
+        with self._lock:
+            self._sync()
+            postings = sorted(
+                (self._postings.get(ingredient_id, EMPTY)
+                 for ingredient_id in set(ingredient_ids)),
+                key=len,
+            )
+            if not postings:
+                return EMPTY
+            if not match_all:
+                return array("q", sorted(set().union(*postings)))
+            result = postings[0]
+            for posting in postings[1:]:
+                if not result:
+                    break
+                result = _intersect(result, posting)
+            return array("q", result)
+
+    def rank_by_coverage(self, ingredient_ids, min_coverage):
+        """
+        Рецепты, чьи ингредиенты покрыты набором хотя бы на `min_coverage`.
+
+        Совпадения считаются одним Counter по склеенным posting lists
+        (цикл на C), затем доля делится на размер рецепта из массива.
+        Возвращает кортежи (recipe_id, coverage, missing) по убыванию
+        покрытия и возрастанию времени приготовления.
+        """
+        with self._lock:
+            self._sync()
+            hits = Counter(chain.from_iterable(
+                self._postings.get(ingredient_id, EMPTY)
+                for ingredient_id in set(ingredient_ids)
+            ))
+            sizes, cooking_times = self._sizes, self._cooking_times
+            ranked = [
+                (recipe_id, matched / sizes[recipe_id],
+                 sizes[recipe_id] - matched, cooking_times[recipe_id])
+                for recipe_id, matched in hits.items()
+                if matched >= min_coverage * sizes[recipe_id]
+            ]
+        ranked.sort(key=lambda row: (-row[1], row[3], -row[0]))
+        return [row[:3] for row in ranked]
+
+    @staticmethod
+    def _next_version():
+        try:
+            return cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+            return cache.incr(VERSION_CACHE_KEY)
+
+    @classmethod
+    def publish(cls, recipe_id):
+        """Записывает изменение рецепта в журнал для всех процессов."""
+        cache.set(
+            CHANGE_CACHE_KEY.format(cls._next_version()), recipe_id,
+            timeout=CHANGE_LOG_TIMEOUT,
+        )
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Заставляет все процессы перестроить индекс целиком — после
+        массовой загрузки в обход сигналов. Версия растёт без записи
+        в журнале, поэтому проиграть изменения не получится.
+        """
+        cls._next_version()
+
+
+ingredient_postings = IngredientPostings()
+
+
+def filter_by_ingredients(queryset, ingredient_ids, match_all=True):
+    """
+    Оставляет рецепты со всеми (или любым) из ингредиентов.
+
+    Если совпадений слишком много для IN-списка, тот же фильтр
+    выполняется в БД через GROUP BY/HAVING.
+    """
+    recipe_ids = ingredient_postings.match(ingredient_ids, match_all)
+    if len(recipe_ids) <= settings.INGREDIENT_FILTER_MAX_IDS:
+        return queryset.filter(pk__in=list(recipe_ids))
+
+    matching = (
+        RecipeIngredient.objects
+        .filter(ingredient_id__in=ingredient_ids)
+        .values("recipe_id")
+    )
+    if match_all:
+        matching = (
+            matching
+            .annotate(matched=Count("ingredient_id", distinct=True))
+            .filter(matched=len(set(ingredient_ids)))
+        )
+    return queryset.filter(pk__in=matching.values("recipe_id"))
+
+
+def on_recipe_changed(sender, recipe_id=None, instance=None, **kwargs):
+    """Публикует изменение или удаление рецепта после коммита."""
+    recipe_id = recipe_id if instance is None else instance.pk
+    transaction.on_commit(
+        lambda: IngredientPostings.publish(recipe_id)
+    )
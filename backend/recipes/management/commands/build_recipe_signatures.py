@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import rebuild_signatures
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит MinHash-подписи и корзины LSH для поиска похожих рецептов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Пересчитать подписи всех рецептов, а не только недостающие.",
+        )
+
+    def handle(self, *args, **options):
+        built = rebuild_signatures(force=options["force"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Подписи построены для {built} рецептов."
+        ))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+
+from recipes import shopping_list
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет материализованные списки покупок с живым агрегатом "
+        "по корзинам и пересобирает таблицу"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать расхождения, не пересобирая таблицу.",
+        )
+        parser.add_argument(
+            "--show",
+            type=int,
+            default=20,
+            help="Сколько расхождений вывести (по умолчанию 20).",
+        )
+
+    def handle(self, *args, **options):
+        live = shopping_list.live_totals()
+        stored = shopping_list.stored_totals()
+
+        missing = live.keys() - stored.keys()
+        extra = stored.keys() - live.keys()
+        mismatched = {
+            key for key in live.keys() & stored.keys()
+            if live[key] != stored[key]
+        }
+
+        for key in sorted(missing | extra | mismatched)[:options["show"]]:
+            user_id, ingredient_id = key
+            self.stdout.write(
+                f"user={user_id} ingredient={ingredient_id}: "
+                f"в таблице {stored.get(key, '—')}, "
+                f"по корзинам {live.get(key, '—')}"
+            )
+
+        summary = (
+            f"Позиций: {len(live)}, нет в таблице: {len(missing)}, "
+            f"лишних: {len(extra)}, с другой суммой: {len(mismatched)}."
+        )
+        if missing or extra or mismatched:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+        if not options["dry_run"]:
+            shopping_list.rebuild(live)
+            self.stdout.write(self.style.SUCCESS("Таблица пересобрана."))
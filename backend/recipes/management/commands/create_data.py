@@ -1,34 +1,58 @@
+from pathlib import Path
+
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-import json
-from pathlib import Path
 
-from recipes.models import Ingredient
+from recipes.catalog import BATCH_SIZE, import_ingredients
 
 
 class Command(BaseCommand):
-    help = "Импортирует ингредиенты из data/ingredients.json"
+    help = (
+        "Импортирует ингредиенты из data/ingredients.json: потоково, "
+        "пачками, с обновлением единиц измерения. Если файл не менялся "
+        "с прошлого импорта, ничего не делает"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            type=Path,
+            default=Path(settings.BASE_DIR) / "data" / "ingredients.json",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Удалить ингредиенты, которых нет в файле и которые "
+                 "не используются в рецептах (импорт выполняется даже "
+                 "при совпавшей контрольной сумме).",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Импортировать, даже если контрольная сумма совпала.",
+        )
 
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, **options):
         try:
-            raw = json.loads(
-                (Path(settings.BASE_DIR) / "data" /
-                 "ingredients.json").read_text(encoding="utf-8")
+            stats = import_ingredients(
+                options["path"],
+                batch_size=options["batch_size"],
+                prune=options["prune"],
+                force=options["force"],
             )
         except FileNotFoundError:
-            raise CommandError("Файл ingredients.json не найден.")
-        except json.JSONDecodeError as exc:
+            raise CommandError(f"Файл {options['path'].name} не найден.")
+        except (ValueError, UnicodeDecodeError) as exc:
+            # json.JSONDecodeError — подкласс ValueError.
             raise CommandError(f"Некорректный JSON: {exc}")
 
-        objs = [
-            Ingredient(name=i["name"], measurement_unit=i["unit"])
-            for i in raw
-            if i.get("name") and i.get("unit")
-        ]
-
-        added = Ingredient.objects.bulk_create(objs, ignore_conflicts=True)
-        self.stdout.write(
-            self.style.SUCCESS(
-                f"Добавлено {len(added)}, пропущено {len(objs) - len(added)}."
-            )
-        )
+        if stats["skipped"]:
+            self.stdout.write(self.style.SUCCESS(
+                "Файл не менялся с прошлого импорта, пропускаем."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Добавлено {stats['added']}, обновлено {stats['updated']}, "
+            f"без изменений {stats['unchanged']}, удалено {stats['removed']}, "
+            f"дублей {stats['duplicates']}, некорректных {stats['invalid']}."
+        ))
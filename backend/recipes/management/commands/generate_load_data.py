@@ -0,0 +1,201 @@
+import random
+import time
+from array import array
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.utils import timezone
+
+from recipes.derived import refresh_derived_data
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+from recipes.synthetic import (
+    RowWriter,
+    ZipfSampler,
+    activity,
+    placeholder_image,
+    random_pub_date,
+    recipe_name,
+    recipe_text,
+)
+from users.models import Follow
+
+User = get_user_model()
+
+# Потолок действий одного пользователя, чтобы хвост экспоненты
+# не дал аккаунт с сотней тысяч избранных
+ACTIVITY_LIMIT = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует пользователей, рецепты, составы, избранное, корзины и "
+        "подписки с популярностью по Ципфу (COPY в PostgreSQL, иначе "
+        "bulk_create), затем пересобирает счётчики и производные данные. "
+        "Ингредиенты берутся из БД — сначала выполните create_data"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--recipes", type=int, default=100000)
+        parser.add_argument(
+            "--ingredients-per-recipe", type=int, nargs=2, default=(3, 12),
+            metavar=("MIN", "MAX"),
+        )
+        parser.add_argument("--favorites", type=float, default=30,
+                            help="Среднее число избранных на пользователя.")
+        parser.add_argument("--carts", type=float, default=3,
+                            help="Среднее число рецептов в корзине.")
+        parser.add_argument("--follows", type=float, default=10,
+                            help="Среднее число подписок.")
+        parser.add_argument("--zipf", type=float, default=1.1,
+                            help="Показатель распределения популярности.")
+        parser.add_argument("--days", type=int, default=730,
+                            help="За сколько дней разбросать даты рецептов.")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--prefix", default="load",
+            help="Префикс логинов и почт созданных пользователей.",
+        )
+        parser.add_argument(
+            "--no-copy", action="store_true",
+            help="Писать через bulk_create даже в PostgreSQL.",
+        )
+        parser.add_argument(
+            "--skip-signatures", action="store_true",
+            help="Не строить подписи похожих рецептов (долгий шаг; "
+                 "можно позже запустить build_recipe_signatures).",
+        )
+
+    def progress(self, label, total=None):
+        started = time.monotonic()
+
+        def report(written):
+            rate = written / max(time.monotonic() - started, 1e-6)
+            of_total = f"/{total:,}" if total else ""
+            self.stdout.write(
+                f"\r  {label}: {written:,}{of_total} ({rate:,.0f} строк/с)",
+                ending="",
+            )
+            self.stdout.flush()
+        return report
+
+    def writer(self, model, fields, label, total=None):
+        return RowWriter(
+            model, fields, self.options["batch_size"],
+            use_copy=not self.options["no_copy"],
+            progress=self.progress(label, total),
+        )
+
+    def done(self, writer):
+        self.stdout.write("")
+        return writer.written
+
+    def handle(self, *args, **options):
+        self.options = options
+        prefix = options["prefix"]
+        ingredient_ids = list(
+            Ingredient.objects.order_by("pk").values_list("pk", flat=True))
+        if not ingredient_ids:
+            raise CommandError(
+                "Каталог ингредиентов пуст: сначала выполните create_data.")
+        if User.objects.filter(username__startswith=f"{prefix}_").exists():
+            raise CommandError(
+                f"Пользователи с префиксом «{prefix}» уже есть: "
+                "укажите другой --prefix.")
+
+        rng = random.Random(options["seed"])
+        now = timezone.now()
+        started = time.monotonic()
+        summary = {}
+
+        password = make_password(None)
+        with self.writer(
+            User,
+            ("username", "email", "first_name", "last_name", "password",
+             "is_superuser", "is_staff", "is_active", "date_joined",
+             "avatar_variants", "followers_count", "following_count",
+             "recipes_count"),
+            "пользователи", options["users"],
+        ) as writer:
+            for index in range(options["users"]):
+                writer.add(
+                    f"{prefix}_{index}", f"{prefix}_{index}@example.com",
+                    f"Имя{index}", f"Фамилия{index}", password,
+                    False, False, True,
+                    random_pub_date(rng, now, options["days"]),
+                    {}, 0, 0, 0,
+                )
+        summary["пользователей"] = self.done(writer)
+        user_ids = array("q", User.objects.filter(
+            username__startswith=f"{prefix}_"
+        ).order_by("pk").values_list("pk", flat=True))
+
+        image = placeholder_image(Recipe._meta.get_field("image").storage)
+        last_recipe_id = Recipe.objects.aggregate(last=Max("pk"))["last"] or 0
+        authors = ZipfSampler(user_ids, options["zipf"], rng)
+        with self.writer(
+            Recipe,
+            ("author_id", "name", "image", "image_variants", "text",
+             "cooking_time", "pub_date", "favorites_count", "carts_count"),
+            "рецепты", options["recipes"],
+        ) as writer:
+            for author_id in authors.sample(options["recipes"]):
+                writer.add(
+                    author_id, recipe_name(rng),
+                    image, {}, recipe_text(rng),
+                    rng.randint(5, 240),
+                    random_pub_date(rng, now, options["days"]), 0, 0,
+                )
+        summary["рецептов"] = self.done(writer)
+        recipe_ids = array("q", Recipe.objects.filter(
+            pk__gt=last_recipe_id
+        ).order_by("pk").values_list("pk", flat=True))
+
+        ingredients = ZipfSampler(ingredient_ids, options["zipf"], rng)
+        low, high = options["ingredients_per_recipe"]
+        with self.writer(
+            RecipeIngredient, ("recipe_id", "ingredient_id", "amount"),
+            "ингредиенты рецептов",
+        ) as writer:
+            for recipe_id in recipe_ids:
+                for ingredient_id in ingredients.distinct(
+                        rng.randint(low, high)):
+                    writer.add(recipe_id, ingredient_id, rng.randint(1, 500))
+        summary["ингредиентов в рецептах"] = self.done(writer)
+
+        recipes = ZipfSampler(recipe_ids, options["zipf"], rng)
+        for model, sampler, target, mean, label in (
+            (Favorite, recipes, "recipe_id", options["favorites"],
+             "избранное"),
+            (ShoppingCart, recipes, "recipe_id", options["carts"],
+             "корзины"),
+            (Follow, authors, "author_id", options["follows"], "подписки"),
+        ):
+            with self.writer(model, ("user_id", target), label) as writer:
+                for user_id in user_ids:
+                    for target_id in sampler.distinct(
+                        activity(rng, mean, ACTIVITY_LIMIT),
+                        exclude=user_id if model is Follow else None,
+                    ):
+                        writer.add(user_id, target_id)
+            summary[label] = self.done(writer)
+
+        refresh_derived_data(
+            signatures=not options["skip_signatures"],
+            report=lambda step: self.stdout.write(f"  пересборка: {step}..."),
+        )
+
+        for label, written in summary.items():
+            self.stdout.write(f"{label}: {written:,}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово за {time.monotonic() - started:.1f} с."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает денормализованные счётчики рецептов "
+        "и пользователей по исходным таблицам"
+    )
+
+    def handle(self, *args, **options):
+        recount()
+        self.stdout.write(self.style.SUCCESS("Счётчики пересчитаны."))
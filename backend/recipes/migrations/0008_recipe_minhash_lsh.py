@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-17 04:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeMinHash',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='minhash', serialize=False, to='recipes.recipe')),
+                ('signature', models.JSONField(verbose_name='Подпись')),
+            ],
+            options={
+                'verbose_name': 'MinHash рецепта',
+                'verbose_name_plural': 'MinHash рецептов',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeLshBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField(verbose_name='Полоса')),
+                ('bucket', models.BigIntegerField(verbose_name='Хэш полосы')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='recipes.recipe')),
+            ],
+            options={
+                'verbose_name': 'Корзина LSH',
+                'verbose_name_plural': 'Корзины LSH',
+                'indexes': [models.Index(fields=['bucket'], name='recipes_rec_bucket_28ee85_idx')],
+                'constraints': [models.UniqueConstraint(fields=('recipe', 'band'), name='unique_recipe_lsh_band')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-17 05:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_minhash_lsh'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=100, unique=True, verbose_name='Источник')),
+                ('checksum', models.CharField(max_length=64, verbose_name='SHA-256')),
+                ('imported_at', models.DateTimeField(auto_now=True, verbose_name='Импортирован')),
+            ],
+            options={
+                'verbose_name': 'Импорт справочника',
+                'verbose_name_plural': 'Импорты справочников',
+            },
+        ),
+    ]
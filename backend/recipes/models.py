@@ -1,6 +1,10 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
+from users.models import CounterFieldsMixin
+
 User = settings.AUTH_USER_MODEL
 
 
@@ -24,7 +28,7 @@ class Ingredient(models.Model):
         return f"{self.name} ({self.measurement_unit})"
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -37,6 +41,9 @@ class Recipe(models.Model):
         upload_to="recipes/images/",
         blank=True,
     )
+    image_variants = models.JSONField(
+        "Варианты фото", default=dict, blank=True, editable=False
+    )
     text = models.TextField("Описание")
     cooking_time = models.PositiveIntegerField("Время приготовления, мин")
     ingredients = models.ManyToManyField(
@@ -45,8 +52,24 @@ class Recipe(models.Model):
         verbose_name="Ингредиенты",
     )
     pub_date = models.DateTimeField("Дата публикации", auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        "В избранном", default=0, editable=False
+    )
+    carts_count = models.PositiveIntegerField(
+        "В корзинах", default=0, editable=False
+    )
+    # Заполняется триггером PostgreSQL из name и text (см. recipes.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    counter_fields = ("favorites_count", "carts_count")
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=["-pub_date", "-id"], name="recipe_pub_date_id_idx"
+            ),
+            GinIndex(fields=["search_vector"], name="recipe_search_vector_idx"),
+        ]
         ordering = ("-pub_date",)
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
@@ -132,3 +155,146 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f"{self.user} → {self.recipe}"
+
+
+class ShoppingListItem(models.Model):
+    """
+    Материализованный итог списка покупок: сколько ингредиента нужно
+    пользователю по всем рецептам в его корзине.
+    Поддерживается инкрементально (см. recipes.shopping_list).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_items",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_items",
+    )
+    total_amount = models.DecimalField(
+        "Количество", max_digits=12, decimal_places=2
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "ingredient"),
+                name="unique_shopping_list_item",
+            ),
+        ]
+        verbose_name = "Позиция списка покупок"
+        verbose_name_plural = "Позиции списков покупок"
+
+    def __str__(self):
+        return f"{self.user} → {self.ingredient}: {self.total_amount}"
+
+
+class RecipeMinHash(models.Model):
+    """MinHash-подпись множества ингредиентов рецепта."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="minhash",
+    )
+    signature = models.JSONField("Подпись")
+
+    class Meta:
+        verbose_name = "MinHash рецепта"
+        verbose_name_plural = "MinHash рецептов"
+
+    def __str__(self):
+        return f"MinHash {self.recipe_id}"
+
+
+class RecipeLshBucket(models.Model):
+    """Корзина LSH: рецепты с совпадающей полосой подписи — кандидаты в похожие."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="lsh_buckets",
+    )
+    band = models.PositiveSmallIntegerField("Полоса")
+    bucket = models.BigIntegerField("Хэш полосы")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("recipe", "band"),
+                name="unique_recipe_lsh_band",
+            ),
+        ]
+        indexes = [models.Index(fields=["bucket"])]
+        verbose_name = "Корзина LSH"
+        verbose_name_plural = "Корзины LSH"
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.band}/{self.bucket}"
+
+
+class CatalogImport(models.Model):
+    """Контрольная сумма последнего импортированного файла справочника."""
+
+    source = models.CharField("Источник", max_length=100, unique=True)
+    checksum = models.CharField("SHA-256", max_length=64)
+    imported_at = models.DateTimeField("Импортирован", auto_now=True)
+
+    class Meta:
+        verbose_name = "Импорт справочника"
+        verbose_name_plural = "Импорты справочников"
+
+    def __str__(self):
+        return f"{self.source}: {self.checksum[:12]}"
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписчика (fan-out при публикации)."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+        verbose_name="Владелец ленты",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+        verbose_name="Рецепт",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Автор",
+    )
+    # Копия Recipe.pub_date: лента листается по индексу этой таблицы
+    pub_date = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "recipe"),
+                name="unique_timeline_entry",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-recipe"],
+                name="timeline_user_pub_date_idx",
+            ),
+            models.Index(
+                fields=["user", "author"],
+                name="timeline_user_author_idx",
+            ),
+        ]
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи лент"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.recipe_id}"
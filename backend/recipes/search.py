@@ -0,0 +1,31 @@
+"""
+Полнотекстовый поиск по рецептам.
+
+В PostgreSQL поле Recipe.search_vector заполняется триггером
+(name с весом A, text с весом B, русский стеммер) и покрыто GIN-индексом,
+а результаты сортируются по ts_rank. На других СУБД, где tsvector нет,
+поиск деградирует до icontains.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+
+SEARCH_CONFIG = "russian"
+
+
+def search_recipes(queryset, text):
+    """Фильтрует рецепты по запросу и сортирует по релевантности."""
+    text = text.strip()
+    if not text:
+        return queryset
+    if connections[queryset.db].vendor != "postgresql":
+        return queryset.filter(
+            Q(name__icontains=text) | Q(text__icontains=text)
+        )
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+    return (
+        queryset
+        .filter(search_vector=query)
+        .annotate(search_rank=SearchRank(F("search_vector"), query))
+        .order_by("-search_rank", "-pub_date", "-id")
+    )
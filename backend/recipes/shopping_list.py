@@ -0,0 +1,153 @@
+"""
+Инкрементальное сопровождение материализованных списков покупок.
+
+ShoppingListItem хранит для каждого пользователя сумму ингредиентов по
+всем рецептам в его корзине. Вместо пересчёта
+ShoppingCart → Recipe → RecipeIngredient на каждое скачивание
+итоги правятся дельтами: при добавлении/удалении рецепта из корзины
+и при изменении состава рецепта, который уже лежит в чьих-то корзинах.
+"""
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+
+from .models import ShoppingCart, ShoppingListItem
+from .signals import recipe_amounts
+
+BATCH_SIZE = 1000
+
+
+def apply_deltas(user_ids, deltas):
+    """
+    Прибавляет `deltas` ({ingredient_id: amount}) к спискам пользователей.
+
+    Недостающие строки создаются с нулём, затем все суммы меняются одним
+    UPDATE с F(), а обнулившиеся позиции удаляются.
+    """
+    deltas = {
+        ingredient_id: amount
+        for ingredient_id, amount in deltas.items() if amount
+    }
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+
+    with transaction.atomic():
+        ShoppingListItem.objects.bulk_create(
+            [
+                ShoppingListItem(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    total_amount=0,
+                )
+                for user_id in user_ids
+                for ingredient_id in deltas
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        items = ShoppingListItem.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas
+        )
+        items.update(
+            total_amount=F("total_amount") + Case(
+                *(
+                    When(ingredient_id=ingredient_id, then=Value(amount))
+                    for ingredient_id, amount in deltas.items()
+                ),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+        items.filter(total_amount__lte=0).delete()
+
+
+def add_recipe(user_id, recipe_id):
+    apply_deltas((user_id,), recipe_amounts(recipe_id))
+
+
+def remove_recipe(user_id, recipe_id):
+    apply_deltas(
+        (user_id,),
+        {
+            ingredient_id: -amount
+            for ingredient_id, amount in recipe_amounts(recipe_id).items()
+        },
+    )
+
+
+def on_recipe_ingredients_changed(sender, recipe_id, old_amounts,
+                                  new_amounts, **kwargs):
+    """Применяет разницу составов ко всем, у кого рецепт в корзине."""
+    apply_deltas(
+        ShoppingCart.objects
+        .filter(recipe_id=recipe_id)
+        .values_list("user_id", flat=True),
+        {
+            ingredient_id: (
+                new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+            for ingredient_id in old_amounts.keys() | new_amounts.keys()
+        },
+    )
+
+
+def live_totals(user_ids=None):
+    """Итоги, посчитанные заново по корзинам: {(user_id, ingredient_id): amount}."""
+    carts = ShoppingCart.objects.all()
+    if user_ids is not None:
+        carts = carts.filter(user_id__in=user_ids)
+    rows = (
+        carts
+        .filter(recipe__recipe_ingredients__isnull=False)
+        .values("user_id", "recipe__recipe_ingredients__ingredient_id")
+        .annotate(total=Sum("recipe__recipe_ingredients__amount"))
+        .order_by()
+    )
+    return {
+        (row["user_id"], row["recipe__recipe_ingredients__ingredient_id"]):
+            row["total"]
+        for row in rows.iterator()
+    }
+
+
+def stored_totals(user_ids=None):
+    """Итоги из материализованной таблицы в том же формате."""
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    return {
+        (user_id, ingredient_id): total_amount
+        for user_id, ingredient_id, total_amount in items.values_list(
+            "user_id", "ingredient_id", "total_amount"
+        ).iterator()
+    }
+
+
+def rebuild(totals=None):
+    """Полностью пересобирает таблицу из живого агрегата."""
+    if totals is None:
+        totals = live_totals()
+    with transaction.atomic():
+        ShoppingListItem.objects.all().delete()
+        ShoppingListItem.objects.bulk_create(
+            [
+                ShoppingListItem(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    total_amount=total_amount,
+                )
+                for (user_id, ingredient_id), total_amount in totals.items()
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+
+def on_cart_saved(sender, instance, created, **kwargs):
+    if created:
+        add_recipe(instance.user_id, instance.recipe_id)
+
+
+def on_cart_deleted(sender, instance, **kwargs):
+    # pre_delete: при каскадном удалении рецепта его ингредиенты
+    # ещё на месте, поэтому вычитаемый состав известен.
+    remove_recipe(instance.user_id, instance.recipe_id)
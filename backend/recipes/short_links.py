@@ -0,0 +1,113 @@
+"""
+Короткие ссылки на рецепты.
+
+Код — это id рецепта в base62, поэтому для его выдачи и разбора не нужно
+ничего хранить. Наличие рецепта проверяется через процессный LRU-кэш:
+популярные ссылки резолвятся без обращения к БД. Удаление рецепта
+повышает версию в общем кэше, и каждый процесс при её смене сбрасывает
+свой LRU; записи старше SHORT_LINK_CACHE_TTL перепроверяются в любом
+случае.
+"""
+import string
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Recipe
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+VERSION_CACHE_KEY = 'recipes:short_links:version'
+
+
+def encode(number):
+    if number == 0:
+        return ALPHABET[0]
+    code = []
+    while number:
+        number, remainder = divmod(number, BASE)
+        code.append(ALPHABET[remainder])
+    return ''.join(reversed(code))
+
+
+def decode(code):
+    """id по коду; None, если код некорректен."""
+    if not code or len(code) > 11:
+        return None
+    number = 0
+    for char in code:
+        position = ALPHABET.find(char)
+        if position < 0:
+            return None
+        number = number * BASE + position
+    return number
+
+
+class RecipeLinkResolver:
+    """LRU-кэш существующих id рецептов для коротких ссылок."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._known = OrderedDict()
+        self._version = None
+
+    @property
+    def maxsize(self):
+        return getattr(settings, 'SHORT_LINK_CACHE_SIZE', 10000)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'SHORT_LINK_CACHE_TTL', 300)
+
+    def exists(self, recipe_id):
+        version = cache.get(VERSION_CACHE_KEY)
+        now = time.monotonic()
+        with self._lock:
+            if version != self._version:
+                self._known.clear()
+                self._version = version
+            checked_at = self._known.get(recipe_id)
+            if checked_at is not None and now - checked_at < self.ttl:
+                self._known.move_to_end(recipe_id)
+                return True
+        # Отсутствие не кэшируем: рецепт с таким id может появиться позже.
+        if not Recipe.objects.filter(pk=recipe_id).exists():
+            self.discard(recipe_id)
+            return False
+        with self._lock:
+            if version == self._version:
+                self._known[recipe_id] = now
+                self._known.move_to_end(recipe_id)
+                while len(self._known) > self.maxsize:
+                    self._known.popitem(last=False)
+        return True
+
+    def resolve(self, code):
+        """id рецепта по коду или None."""
+        recipe_id = decode(code)
+        if recipe_id is None or not self.exists(recipe_id):
+            return None
+        return recipe_id
+
+    def discard(self, recipe_id):
+        with self._lock:
+            self._known.pop(recipe_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._known.clear()
+
+
+recipe_links = RecipeLinkResolver()
+
+
+def forget_recipe_link(sender, instance, **kwargs):
+    """Сбрасывает LRU коротких ссылок во всех процессах с общим кэшем."""
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, timeout=None)
+    recipe_links.discard(instance.pk)
@@ -0,0 +1,48 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.dispatch import Signal
+
+from .models import Recipe, RecipeIngredient
+
+# Состав рецепта изменился. Аргументы: recipe_id, old_amounts, new_amounts
+# ({ingredient_id: amount}). Шлётся внутри транзакции изменения.
+recipe_ingredients_changed = Signal()
+
+# Данные загружены массово в обход сигналов моделей (bulk_create, COPY);
+# производные данные уже пересобраны, кэши пора сбросить.
+bulk_data_loaded = Signal()
+
+
+def recipe_amounts(recipe_id):
+    """Состав рецепта в виде {ingredient_id: amount}."""
+    return dict(
+        RecipeIngredient.objects
+        .filter(recipe_id=recipe_id)
+        .values_list("ingredient_id", "amount")
+    )
+
+
+@contextmanager
+def track_recipe_ingredients(recipe):
+    """
+    Оборачивает изменение состава рецепта.
+
+    Запоминает состав до блока, а после него, если состав поменялся,
+    шлёт recipe_ingredients_changed: по нему правятся списки покупок
+    и инвертированный индекс ингредиентов.
+    """
+    if recipe.pk is None:
+        yield
+        return
+    with transaction.atomic():
+        old_amounts = recipe_amounts(recipe.pk)
+        yield
+        new_amounts = recipe_amounts(recipe.pk)
+        if old_amounts != new_amounts:
+            recipe_ingredients_changed.send(
+                sender=Recipe,
+                recipe_id=recipe.pk,
+                old_amounts=old_amounts,
+                new_amounts=new_amounts,
+            )
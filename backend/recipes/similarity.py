@@ -0,0 +1,153 @@
+"""
+Похожие рецепты по составу: MinHash + LSH.
+
+Для каждого рецепта хранится MinHash-подпись множества его ингредиентов
+(NUM_PERMUTATIONS минимумов универсальных хэшей). Подпись режется на
+BANDS полос по ROWS_PER_BAND значений; хэш полосы — корзина LSH.
+Рецепты, совпавшие хотя бы в одной корзине, — кандидаты: их находит
+один запрос по индексу `bucket`, без перебора всех пар. Кандидаты
+ранжируются точным коэффициентом Жаккара по RecipeIngredient.
+
+При BANDS=16 и ROWS_PER_BAND=4 порог срабатывания около
+(1/16) ** (1/4) ≈ 0.5: рецепты с похожестью выше почти всегда
+попадают в кандидаты, сильно непохожие — почти никогда.
+
+Подпись пересчитывается при изменении состава рецепта
+(recipe_ingredients_changed), корзины удаляются каскадом вместе
+с рецептом.
+"""
+import hashlib
+import random
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Recipe, RecipeIngredient, RecipeLshBucket, RecipeMinHash
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+# Больше кандидатов точным Жаккаром не проверяем
+MAX_CANDIDATES = 200
+REBUILD_BATCH_SIZE = 500
+
+_PRIME = (1 << 61) - 1
+_random = random.Random(20240601)
+_PERMUTATIONS = [
+    (_random.randrange(1, _PRIME), _random.randrange(0, _PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def compute_signature(ingredient_ids):
+    """MinHash-подпись множества id ингредиентов."""
+    ingredient_ids = set(ingredient_ids)
+    if not ingredient_ids:
+        return []
+    return [
+        min((a * ingredient_id + b) % _PRIME for ingredient_id in ingredient_ids)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def band_buckets(signature):
+    """Хэши полос подписи; номер полосы входит в хэш, так что корзины
+    разных полос не пересекаются."""
+    buckets = []
+    for band in range(BANDS if signature else 0):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(
+            repr((band, rows)).encode("ascii"), digest_size=8
+        ).digest()
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
+
+
+def recipe_ingredient_sets(recipe_ids):
+    """{recipe_id: set(ingredient_id)} одним запросом."""
+    sets = defaultdict(set)
+    rows = (
+        RecipeIngredient.objects
+        .filter(recipe_id__in=recipe_ids)
+        .values_list("recipe_id", "ingredient_id")
+    )
+    for recipe_id, ingredient_id in rows:
+        sets[recipe_id].add(ingredient_id)
+    return sets
+
+
+def store_signatures(ingredient_sets):
+    """Перезаписывает подписи и корзины рецептов из {recipe_id: ингредиенты}."""
+    recipe_ids = list(ingredient_sets)
+    signatures, buckets = [], []
+    for recipe_id, ingredient_ids in ingredient_sets.items():
+        signature = compute_signature(ingredient_ids)
+        if not signature:
+            continue
+        signatures.append(
+            RecipeMinHash(recipe_id=recipe_id, signature=signature))
+        buckets += [
+            RecipeLshBucket(recipe_id=recipe_id, band=band, bucket=bucket)
+            for band, bucket in enumerate(band_buckets(signature))
+        ]
+    with transaction.atomic():
+        RecipeLshBucket.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeMinHash.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeMinHash.objects.bulk_create(signatures, batch_size=1000)
+        RecipeLshBucket.objects.bulk_create(buckets, batch_size=1000)
+
+
+def rebuild_signatures(force=False):
+    """
+    Строит подписи рецептов без подписи (или всех при `force`) пачками.
+    Возвращает число обработанных рецептов.
+    """
+    recipes = Recipe.objects.order_by("pk")
+    if not force:
+        recipes = recipes.filter(minhash__isnull=True)
+    recipe_ids = list(recipes.values_list("pk", flat=True))
+    for start in range(0, len(recipe_ids), REBUILD_BATCH_SIZE):
+        batch = recipe_ids[start:start + REBUILD_BATCH_SIZE]
+        sets = recipe_ingredient_sets(batch)
+        store_signatures({recipe_id: sets[recipe_id] for recipe_id in batch})
+    return len(recipe_ids)
+
+
+def similar_recipes(recipe_id, limit):
+    """
+    До `limit` похожих рецептов: [(recipe_id, jaccard)] по убыванию.
+
+    Кандидаты — рецепты с общими корзинами, сначала те, у кого их
+    больше; затем точный Жаккар по составам кандидатов.
+    """
+    buckets = list(
+        RecipeLshBucket.objects
+        .filter(recipe_id=recipe_id)
+        .values_list("bucket", flat=True)
+    )
+    if not buckets:
+        return []
+    candidates = list(
+        RecipeLshBucket.objects
+        .filter(bucket__in=buckets)
+        .exclude(recipe_id=recipe_id)
+        .values("recipe_id")
+        .annotate(shared=Count("id"))
+        .order_by("-shared", "-recipe_id")
+        .values_list("recipe_id", flat=True)[:MAX_CANDIDATES]
+    )
+    sets = recipe_ingredient_sets([recipe_id, *candidates])
+    own = sets[recipe_id]
+    ranked = []
+    for candidate in candidates:
+        other = sets[candidate]
+        union = len(own | other)
+        if union:
+            ranked.append((candidate, len(own & other) / union))
+    ranked.sort(key=lambda row: (-row[1], -row[0]))
+    return ranked[:limit]
+
+
+def on_recipe_ingredients_changed(sender, recipe_id, new_amounts, **kwargs):
+    store_signatures({recipe_id: set(new_amounts)})
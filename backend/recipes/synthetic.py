@@ -0,0 +1,199 @@
+"""
+Генерация синтетических данных продакшен-масштаба.
+
+Популярность авторов, рецептов и ингредиентов распределена по Ципфу:
+вес элемента ранга k пропорционален 1 / k ** s, а ранги раздаются
+по детерминированной перестановке, чтобы популярные объекты не были
+просто первыми по id. Активность пользователей (сколько избранного,
+корзин и подписок) — экспоненциальная вокруг заданного среднего.
+
+Строки пишутся пачками: в PostgreSQL через COPY FROM STDIN, иначе —
+через bulk_create. Все случайные решения берутся из одного
+random.Random(seed), так что при тех же параметрах данные совпадают.
+Все рецепты ссылаются на одну картинку-заглушку, которая один раз
+записывается в хранилище.
+"""
+import io
+import json
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image
+
+PLACEHOLDER_IMAGE = "recipes/images/synthetic.png"
+PLACEHOLDER_SIZE = (600, 400)
+PLACEHOLDER_COLOR = (222, 184, 135)
+
+DISH_WORDS = (
+    "суп", "салат", "рагу", "плов", "омлет", "пирог", "запеканка", "каша",
+    "котлеты", "паста", "ризотто", "блины", "оладьи", "гуляш", "жаркое",
+    "борщ", "щи", "солянка", "вареники", "пельмени", "шаурма", "лазанья",
+)
+ADJECTIVES = (
+    "домашний", "быстрый", "острый", "летний", "зимний", "сытный", "лёгкий",
+    "праздничный", "бабушкин", "деревенский", "пряный", "сливочный",
+    "овощной", "грибной", "рыбный", "куриный", "постный", "томатный",
+)
+STEPS = (
+    "Нарежьте овощи небольшими кубиками.",
+    "Разогрейте сковороду и добавьте масло.",
+    "Обжарьте лук до золотистого цвета.",
+    "Посолите и поперчите по вкусу.",
+    "Тушите под крышкой на медленном огне.",
+    "Доведите до кипения и уменьшите огонь.",
+    "Выложите в форму и запекайте в духовке.",
+    "Перемешайте и дайте настояться.",
+    "Подавайте горячим со свежей зеленью.",
+    "Взбейте яйца с молоком до однородности.",
+)
+
+
+class ZipfSampler:
+    """Выбор элементов с вероятностью, убывающей как 1 / ранг ** s."""
+
+    def __init__(self, items, exponent, rng):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(self.items) + 1)
+        ))
+        self.rng = rng
+
+    def sample(self, count):
+        return self.rng.choices(
+            self.items, cum_weights=self.cum_weights, k=count)
+
+    def distinct(self, count, exclude=None):
+        """До `count` разных элементов; повторы просто отбрасываются."""
+        chosen = set(self.sample(count))
+        chosen.discard(exclude)
+        return chosen
+
+
+def activity(rng, mean, limit):
+    """Сколько действий сделал пользователь: экспоненциально вокруг mean."""
+    if mean <= 0:
+        return 0
+    return min(limit, int(rng.expovariate(1 / mean)))
+
+
+def recipe_name(rng):
+    return f"{rng.choice(ADJECTIVES).capitalize()} {rng.choice(DISH_WORDS)}"
+
+
+def recipe_text(rng):
+    return " ".join(rng.sample(STEPS, rng.randint(3, 6)))
+
+
+def random_pub_date(rng, now, days):
+    return now - timedelta(seconds=rng.randrange(days * 24 * 3600))
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False)
+    elif hasattr(value, "isoformat"):
+        value = value.isoformat()
+    return (
+        str(value).replace("\\", "\\\\").replace("\t", "\\t")
+        .replace("\n", "\\n").replace("\r", "\\r")
+    )
+
+
+@contextmanager
+def _explicit_dates(model, fields):
+    """
+    bulk_create перетирает поля auto_now_add текущим временем;
+    на время вставки выключаем это у полей, которые мы заполняем сами.
+    """
+    patched = [
+        field for field in model._meta.concrete_fields
+        if field.name in fields and getattr(field, "auto_now_add", False)
+    ]
+    for field in patched:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in patched:
+            field.auto_now_add = True
+
+
+class RowWriter:
+    """
+    Пишет строки модели пачками по `batch_size`: COPY в PostgreSQL
+    или bulk_create на других СУБД (и при use_copy=False).
+    """
+
+    def __init__(self, model, fields, batch_size, use_copy=True,
+                 progress=None):
+        self.model = model
+        self.fields = fields
+        self.columns = [model._meta.get_field(name).column for name in fields]
+        self.batch_size = batch_size
+        self.use_copy = use_copy and connection.vendor == "postgresql"
+        self.progress = progress or (lambda written: None)
+        self.rows = []
+        self.written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, *values):
+        self.rows.append(values)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        with transaction.atomic():
+            if self.use_copy:
+                self._copy()
+            else:
+                with _explicit_dates(self.model, self.fields):
+                    self.model.objects.bulk_create(
+                        [
+                            self.model(**dict(zip(self.fields, values)))
+                            for values in self.rows
+                        ],
+                        batch_size=self.batch_size,
+                    )
+        self.written += len(self.rows)
+        self.rows = []
+        self.progress(self.written)
+
+    def _copy(self):
+        buffer = io.StringIO()
+        for values in self.rows:
+            buffer.write("\t".join(map(_copy_value, values)))
+            buffer.write("\n")
+        buffer.seek(0)
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ", ".join(map(connection.ops.quote_name, self.columns))
+        sql = f"COPY {table} ({columns}) FROM STDIN"
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, "copy_expert"):
+                raw.copy_expert(sql, buffer)
+            else:
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+
+def placeholder_image(storage):
+    """Пишет заглушку в хранилище, если её там нет; возвращает её имя."""
+    if storage.exists(PLACEHOLDER_IMAGE):
+        return PLACEHOLDER_IMAGE
+    buffer = io.BytesIO()
+    Image.new("RGB", PLACEHOLDER_SIZE, PLACEHOLDER_COLOR).save(buffer, "PNG")
+    return storage.save(PLACEHOLDER_IMAGE, ContentFile(buffer.getvalue()))
@@ -0,0 +1,157 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from recipes import catalog
+from recipes.catalog import iter_json_array
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+User = get_user_model()
+
+CHUNK_SIZES = (1, 7, catalog.CHUNK_SIZE)
+
+
+class IterJsonArrayTests(SimpleTestCase):
+    def parse(self, text, chunk_size):
+        return list(iter_json_array(io.StringIO(text), chunk_size=chunk_size))
+
+    def assertParses(self, text):
+        expected = json.loads(text)
+        for chunk_size in CHUNK_SIZES:
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse(text, chunk_size), expected)
+
+    def test_numbers_split_at_chunk_boundaries(self):
+        self.assertParses(
+            "[1, 23.5e1, -7,1000000, 0.125,3.5 ,  12345678901234567890]")
+
+    def test_every_boundary_of_a_number_list(self):
+        text = "[10,200,3.75,-4e2,5]"
+        for chunk_size in range(1, len(text) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(
+                    self.parse(text, chunk_size), [10, 200, 3.75, -400.0, 5])
+
+    def test_escapes(self):
+        self.assertParses(
+            r'["a\"b", "жё", "\\", "\/", "tab\tnew\nline",'
+            r' {"name": "\"соль\"", "unit": "г"}]'
+        )
+
+    def test_whitespace_around_items(self):
+        self.assertParses(
+            ' \n\t[ \r\n{"name": "соль", "unit": "г"} ,\n'
+            '\t{"nested": [1, {"x": 2}], "empty": {}} \r\n]\n  '
+        )
+
+    def test_empty_array(self):
+        for text in ("[]", "  [ \n ]  "):
+            self.assertParses(text)
+
+    def test_rejects_non_array(self):
+        for chunk_size in CHUNK_SIZES:
+            with self.subTest(chunk_size=chunk_size):
+                with self.assertRaises(ValueError):
+                    self.parse('{"name": "соль"}', chunk_size)
+
+    def test_rejects_truncated_or_malformed_array(self):
+        for text in ("[1, 2", '[{"name": "соль"}', "[1 2]", '["a",]', ""):
+            for chunk_size in CHUNK_SIZES:
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    with self.assertRaises(ValueError):
+                        self.parse(text, chunk_size)
+
+
+class ImportBatchTests(TestCase):
+    def setUp(self):
+        self.stats = dict.fromkeys(("added", "updated", "unchanged"), 0)
+
+    def test_replaces_unit_in_place(self):
+        salt = Ingredient.objects.create(name="соль", measurement_unit="кг")
+        catalog._import_batch({"соль": ["г"]}, {("соль", "г")}, self.stats)
+
+        salt.refresh_from_db()
+        self.assertEqual(salt.measurement_unit, "г")
+        self.assertEqual(Ingredient.objects.count(), 1)
+        self.assertEqual(
+            self.stats, {"added": 0, "updated": 1, "unchanged": 0})
+
+    def test_keeps_unit_still_present_in_file(self):
+        Ingredient.objects.create(name="соль", measurement_unit="кг")
+        catalog._import_batch(
+            {"соль": ["г"]}, {("соль", "г"), ("соль", "кг")}, self.stats)
+
+        self.assertEqual(
+            set(Ingredient.objects.values_list("measurement_unit", flat=True)),
+            {"г", "кг"},
+        )
+        self.assertEqual(
+            self.stats, {"added": 1, "updated": 0, "unchanged": 0})
+
+    def test_rows_inserted_concurrently_are_not_counted_as_added(self):
+        insert_new = catalog._insert_new
+
+        def racing_insert(keys):
+            Ingredient.objects.create(name="соль", measurement_unit="г")
+            return insert_new(keys)
+
+        with mock.patch.object(catalog, "_insert_new", racing_insert):
+            catalog._import_batch(
+                {"соль": ["г"], "перец": ["г"]},
+                {("соль", "г"), ("перец", "г")},
+                self.stats,
+            )
+
+        self.assertEqual(Ingredient.objects.count(), 2)
+        self.assertEqual(
+            self.stats, {"added": 1, "updated": 0, "unchanged": 1})
+
+
+class CreateDataCommandTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "ingredients.json"
+
+    def write(self, items):
+        self.path.write_text(
+            json.dumps(items, ensure_ascii=False), encoding="utf-8")
+
+    def create_data(self, *args):
+        output = io.StringIO()
+        call_command("create_data", "--path", str(self.path), *args,
+                     stdout=output)
+        return output.getvalue()
+
+    def test_import_is_skipped_when_file_did_not_change(self):
+        self.write([{"name": "соль", "unit": "г"}])
+        self.assertIn("Добавлено 1", self.create_data())
+        self.assertIn("не менялся", self.create_data())
+
+    def test_prune_removes_only_unused_missing_ingredients(self):
+        Ingredient.objects.bulk_create([
+            Ingredient(name="соль", measurement_unit="г"),
+            Ingredient(name="перец", measurement_unit="г"),
+            Ingredient(name="мука", measurement_unit="г"),
+        ])
+        author = User.objects.create_user(
+            username="author", email="author@example.com", password="x")
+        recipe = Recipe.objects.create(
+            author=author, name="Хлеб", text="Испечь", cooking_time=60)
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=Ingredient.objects.get(name="мука"),
+            amount=500,
+        )
+        self.write([{"name": "соль", "unit": "г"}])
+
+        self.assertIn("удалено 1", self.create_data("--prune"))
+        self.assertEqual(
+            set(Ingredient.objects.values_list("name", flat=True)),
+            {"соль", "мука"},
+        )
@@ -1,9 +1,11 @@
 # users/admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
-from django.db.models import Count, Q
+from django.db.models import Q
 from django.utils.html import format_html
 
+from recipes.image_variants import variant_url
+
 from .models import User, Follow
 
 
@@ -51,6 +53,7 @@ class UserAdmin(DjangoUserAdmin):
         "is_active",
         "followers_count",
         "following_count",
+        "recipes_count",
         "date_joined",
     )
     list_display_links = ("username", "email")
@@ -62,6 +65,7 @@ class UserAdmin(DjangoUserAdmin):
         "avatar_preview",
         "followers_count",
         "following_count",
+        "recipes_count",
         "last_login",
         "date_joined",
     )
@@ -72,7 +76,11 @@ class UserAdmin(DjangoUserAdmin):
             {"fields": ("username", "first_name", "last_name",
                         "avatar", "avatar_preview")},
         ),
-        ("Показатели", {"fields": ("followers_count", "following_count")}),
+        (
+            "Показатели",
+            {"fields": ("followers_count", "following_count",
+                        "recipes_count")},
+        ),
         (
             "Права доступа",
             {"fields": ("is_active", "is_staff", "is_superuser",
@@ -84,25 +92,12 @@ class UserAdmin(DjangoUserAdmin):
     save_on_top = True
     empty_value_display = "—"
 
-    def get_queryset(self, request):
-        return (
-            super()
-            .get_queryset(request)
-            .annotate(followers_total=Count("followers"), following_total=Count("following"))
-        )
-
-    def followers_count(self, obj):
-        return obj.followers_total
-
-    def following_count(self, obj):
-        return obj.following_total
-
     def avatar_thumb(self, obj):
         if obj.avatar:
             return format_html(
                 '<img src="{}" width="40" height="40" '
                 'style="object-fit: cover; border-radius: 50%;" />',
-                obj.avatar.url,
+                variant_url(obj, "thumbnail"),
             )
         return "—"
 
@@ -111,7 +106,7 @@ class UserAdmin(DjangoUserAdmin):
             return format_html(
                 '<img src="{}" width="120" height="120" '
                 'style="object-fit: cover; border-radius: 6px;" />',
-                obj.avatar.url,
+                variant_url(obj, "thumbnail"),
             )
         return "—"
 
@@ -1,7 +1,23 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class UsersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "users"
     verbose_name = "Пользователи"
+
+    def ready(self):
+        from .counters import on_follow_deleted, on_follow_saved
+        from .models import Follow
+
+        post_save.connect(
+            on_follow_saved,
+            sender=Follow,
+            dispatch_uid="counters_on_follow_save",
+        )
+        post_delete.connect(
+            on_follow_deleted,
+            sender=Follow,
+            dispatch_uid="counters_on_follow_delete",
+        )
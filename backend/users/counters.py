@@ -0,0 +1,19 @@
+from django.db.models import F
+
+from .models import User
+
+
+def _change_follow_counters(follow, delta):
+    User.objects.filter(pk=follow.author_id).update(
+        followers_count=F('followers_count') + delta)
+    User.objects.filter(pk=follow.user_id).update(
+        following_count=F('following_count') + delta)
+
+
+def on_follow_saved(sender, instance, created, **kwargs):
+    if created:
+        _change_follow_counters(instance, 1)
+
+
+def on_follow_deleted(sender, instance, **kwargs):
+    _change_follow_counters(instance, -1)
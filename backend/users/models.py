@@ -6,7 +6,42 @@ from django.db import models
 USERNAME_REGEX = r'^[\w.@+-]+$'
 
 
-class User(AbstractUser):
+class CounterFieldsMixin(models.Model):
+    """
+    Не даёт обычному save() перезаписать денормализованные счётчики.
+
+    Счётчики из `counter_fields` меняются только атомарным UPDATE с F()
+    (см. recipes.counters и users.counters). Экземпляр, загруженный до
+    такого UPDATE, держит в памяти старое значение, и полный save()
+    из сериализатора, админки или djoser вернул бы его в БД. Поэтому
+    при сохранении существующей строки счётчики исключаются из
+    update_fields, а пересчитываются только через recount_counters.
+    """
+
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if not self._state.adding:
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key
+                    and field.attname not in deferred
+                ]
+            update_fields = [
+                name for name in update_fields
+                if name not in self.counter_fields
+            ]
+            if not update_fields:
+                return
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class User(CounterFieldsMixin, AbstractUser):
     """
     Кастомный пользователь Foodgram.
     Авторизуемся по e-mail, а не по username.
@@ -17,6 +52,9 @@ class User(AbstractUser):
         blank=True,
         null=True,
     )
+    avatar_variants = models.JSONField(
+        'Варианты аватара', default=dict, blank=True, editable=False
+    )
     email = models.EmailField(
         'E-mail',
         max_length=254,
@@ -36,6 +74,17 @@ class User(AbstractUser):
     )
     first_name = models.CharField('Имя', max_length=150)
     last_name = models.CharField('Фамилия', max_length=150)
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков', default=0, editable=False
+    )
+    following_count = models.PositiveIntegerField(
+        'Подписок', default=0, editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов', default=0, editable=False
+    )
+
+    counter_fields = ('followers_count', 'following_count', 'recipes_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']